@@ -8,6 +8,7 @@ and data export with parallel processing capabilities.
 
 Usage:
     python app/freightos_matrix_runner.py --date 2025-06-18 --container container20 --delay-min 3 --delay-max 7
+    python app/freightos_matrix_runner.py --parallel --location-percentage 1.0 --shard 0/4 --seed 42
 """
 
 import asyncio
@@ -25,6 +26,8 @@ from app.utils.helpers import (
     print_summary_stats
 )
 from app.utils.freightos_locations import FREIGHTOS_LOCATIONS
+from app.tasks import run_with_screenshot_resources
+from app.utils.sharding import DEFAULT_SHARD_SEED, parse_shard, shard_checkpoint_dir
 
 
 def setup_logging(log_level: str = "INFO"):
@@ -75,6 +78,8 @@ Examples:
   python app/freightos_matrix_runner.py
   python app/freightos_matrix_runner.py --date 2025-12-25 --container container40
   python app/freightos_matrix_runner.py --delay-min 5 --delay-max 10 --log-level DEBUG
+  python app/freightos_matrix_runner.py --parallel --location-percentage 1.0 --seed 42 --shard 1/4
+  python merge_shard_checkpoints.py --checkpoint-dir freightos_checkpoints --output-prefix freightos_matrix
 
 Available locations ({len(FREIGHTOS_LOCATIONS)}):
 {', '.join(sorted(FREIGHTOS_LOCATIONS.keys()))}
@@ -147,6 +152,18 @@ This will process {len(FREIGHTOS_LOCATIONS) * (len(FREIGHTOS_LOCATIONS) - 1)} lo
         help="Use parallel processing for faster computation"
     )
     
+    parser.add_argument(
+        "--shard",
+        help="Process only shard i of N (i/N, 0-based) of the combinations; checkpoints go to "
+             "<checkpoint-dir>/shard_<i>_of_<N> (needs --parallel)"
+    )
+    
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help=f"Seed for the location sample; use the same seed on every shard (default with --shard: {DEFAULT_SHARD_SEED})"
+    )
+    
     parser.add_argument(
         "--processes",
         type=int,
@@ -211,6 +228,18 @@ This will process {len(FREIGHTOS_LOCATIONS) * (len(FREIGHTOS_LOCATIONS) - 1)} lo
         if args.delay_min > args.delay_max:
             raise ValueError("delay-min cannot be greater than delay-max")
         
+        shard = parse_shard(args.shard) if args.shard else None
+        seed = args.seed
+        if shard:
+            if not args.parallel:
+                raise ValueError("--shard needs --parallel")
+            if seed is None:
+                seed = DEFAULT_SHARD_SEED
+                logger.warning(f"--shard without --seed: using seed {seed}; every shard must use the same seed")
+            # Each shard checkpoints into its own namespace; merge_shard_checkpoints.py combines them
+            args.checkpoint_dir = shard_checkpoint_dir(args.checkpoint_dir, shard)
+            args.output_prefix = f"{args.output_prefix}_shard{shard[0]}of{shard[1]}"
+        
         # Show configuration
         locations = list(FREIGHTOS_LOCATIONS.keys())
         total_combinations = len(locations) * (len(locations) - 1)
@@ -233,6 +262,8 @@ This will process {len(FREIGHTOS_LOCATIONS) * (len(FREIGHTOS_LOCATIONS) - 1)} lo
             logger.info(f"Checkpoint interval: {args.checkpoint_interval} results")
             logger.info(f"Resume mode: {'Disabled' if args.no_resume else 'Enabled'}")
             logger.info(f"Checkpoint directory: {args.checkpoint_dir}")
+            if shard:
+                logger.info(f"🧩 Shard {shard[0]}/{shard[1]} (seed {seed})")
         
         if args.resume_from:
             logger.info(f"Resuming from combination: {args.resume_from}")
@@ -271,7 +302,9 @@ This will process {len(FREIGHTOS_LOCATIONS) * (len(FREIGHTOS_LOCATIONS) - 1)} lo
                 location_percentage=args.location_percentage,
                 checkpoint_interval=args.checkpoint_interval,
                 resume=not args.no_resume,
-                checkpoint_dir=args.checkpoint_dir
+                checkpoint_dir=args.checkpoint_dir,
+                seed=seed,
+                shard=shard
             )
         else:
             # For sequential processing, process each container type separately
@@ -340,4 +373,4 @@ This will process {len(FREIGHTOS_LOCATIONS) * (len(FREIGHTOS_LOCATIONS) - 1)} lo
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(run_with_screenshot_resources(main())) 
\ No newline at end of file
@@ -19,6 +19,7 @@ from app.providers.flight_quote_model import UserQuery
 from app.utils.city_regional_mapping import get_all_cities_flat
 from app.utils.flight_checkpoint_manager import FlightCheckpointManager
 from app.utils.helpers import generate_biased_monthly_dates
+from app.tasks import run_with_screenshot_resources
 
 # BASE DIRECTORY OF PROJECT
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
@@ -332,9 +333,9 @@ def process_flight_batch(batch_data: Dict[str, any]) -> List[Dict[str, any]]:
     asyncio.set_event_loop(loop)
     
     try:
-        results = loop.run_until_complete(
+        results = loop.run_until_complete(run_with_screenshot_resources(
             compute_flight_batch_async(tasks, batch_id, delay_range, checkpoint_manager)
-        )
+        ))
         print(f"✅ Worker {batch_id}: Completed {len(results)} searches with checkpointing")
         return results
     except Exception as e:
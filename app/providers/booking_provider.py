@@ -14,6 +14,14 @@ from app.providers.flight_quote_model import Quote, UserQuery
 from app.providers.booking_utils import serialize_booking_quotes
 from app.providers.flight_quote_model import FlightClass
 from app.providers.kiwi_utils import filter_quotes_by_departure
+from app.utils.http_retry import request_with_retry
+
+
+BOOKING_SEARCH_URL = "https://flights.booking.com/api/flights/"
+# flight_search gives both providers FLIGHT_SEARCH_TIMEOUT seconds: one short retry at most
+BOOKING_RETRY_ATTEMPTS = 2
+BOOKING_RETRY_BASE_DELAY = 0.5
+BOOKING_RETRY_AFTER_MAX = 5.0
 
 
 def convert_date_to_booking_format(date_str):
@@ -75,8 +83,16 @@ class BookingsProviderSearchToolRequest:
         try:
             async with httpx.AsyncClient(timeout=20) as client:
                 # config.logger.info("Making API request to Booking.com...")
-                r = await client.get("https://flights.booking.com/api/flights/", params=params)
-                r.raise_for_status()
+                async def send() -> httpx.Response:
+                    response = await client.get(BOOKING_SEARCH_URL, params=params)
+                    response.raise_for_status()
+                    return response
+
+                # 429s, 5xx and transport errors are retried (see app/utils/http_retry.py)
+                r = await request_with_retry(
+                    BOOKING_SEARCH_URL, send, max_attempts=BOOKING_RETRY_ATTEMPTS,
+                    base_delay=BOOKING_RETRY_BASE_DELAY, max_retry_after=BOOKING_RETRY_AFTER_MAX
+                )
         
                 quotes_data = serialize_booking_quotes(
                     payload=r.json(),
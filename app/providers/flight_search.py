@@ -6,15 +6,21 @@ from typing import List, Dict, Optional
 from app.providers.booking_provider import BookingsProviderSearchToolRequest
 from app.providers.flight_quote_model import Quote, UserQuery, FlightSearchProvider
 from app.providers.kiwi_provider import KiwiProviderSearchToolRequest
-from app.tasks import _go
+from app.tasks import capture_many
+from app.utils.screenshot_queue import enqueue_screenshot, queue_mode_enabled
 
 
 
-async def process_screenshots(all_quotes: List[Quote]) -> Dict[str, str]:
+# Seconds both providers together have to answer a flight search
+FLIGHT_SEARCH_TIMEOUT = 30.0
+
+
+async def process_screenshots(all_quotes: List[Quote]) -> Dict[str, Dict]:
     """
     Process screenshots for selected quotes from each provider.
-    Takes up to 2 quotes per provider for screenshots.
-    Returns a dictionary mapping quote IDs to screenshot URLs.
+    Takes up to 2 quotes per provider for screenshots and captures them in one batch.
+    Returns a dictionary mapping quote IDs to capture records (screenshot URL,
+    thumbnail URL and byte sizes).
     """
     screenshot_urls = {}
     
@@ -25,36 +31,51 @@ async def process_screenshots(all_quotes: List[Quote]) -> Dict[str, str]:
             quotes_by_provider[quote.provider] = []
         quotes_by_provider[quote.provider].append(quote)
     
-    # Take screenshots for selected quotes
+    # Select up to 2 quotes randomly per provider
+    selected_quotes: List[Quote] = []
     for provider, quotes in quotes_by_provider.items():
-        # Select up to 2 quotes randomly
         num_to_select = min(2, len(quotes))
         if num_to_select > 0:
-            selected_quotes = random.sample(quotes, num_to_select)
-            
-            for quote in selected_quotes:
-                try:
-                    # Set accept_cookies based on provider
-                    accept_cookies = False if quote.provider == FlightSearchProvider.BOOKING_COM else True
-                    
-                    # Use the async _go function directly
-                    screenshot_result = await _go(quote.url, accept_cookies=accept_cookies)
-                    print(f"Screenshot result for {quote.provider.value}")
-                    
-                    # Extract screenshot URL from the result
-                    if 'screenshot_url' in screenshot_result:
-                        screenshot_urls[quote.id] = screenshot_result['screenshot_url']
-                        print(f"Screenshot saved for quote")
-                    else:
-                        print(f"No screenshot URL returned for quote {quote.id}")
-                        
-                except Exception as e:
-                    print(f"Failed to take screenshot for quote {quote.id}: {e}")
+            selected_quotes.extend(random.sample(quotes, num_to_select))
+    
+    if not selected_quotes:
+        return screenshot_urls
+    
+    # Set accept_cookies based on provider
+    accept_cookies = [quote.provider != FlightSearchProvider.BOOKING_COM for quote in selected_quotes]
+    
+    if queue_mode_enabled():
+        # Captured by screenshot_worker.py; reconcile patches it in by booking_url
+        for quote, accept in zip(selected_quotes, accept_cookies):
+            await enqueue_screenshot(quote.url, quote.url, accept_cookies=accept)
+        return screenshot_urls
+    
+    # Capture all selected quotes together, several tabs per provider context
+    try:
+        screenshot_results = await capture_many(
+            [quote.url for quote in selected_quotes],
+            accept_cookies=accept_cookies
+        )
+    except Exception as e:
+        print(f"Failed to take screenshots: {e}")
+        return screenshot_urls
+    
+    for quote, screenshot_result in zip(selected_quotes, screenshot_results):
+        print(f"Screenshot result for {quote.provider.value}")
+        
+        # Extract screenshot URL from the result
+        if screenshot_result.get('screenshot_url'):
+            screenshot_urls[quote.id] = screenshot_result
+            print(f"Screenshot saved for quote")
+        elif 'error' in screenshot_result:
+            print(f"Failed to take screenshot for quote {quote.id}: {screenshot_result['error']}")
+        else:
+            print(f"No screenshot URL returned for quote {quote.id}")
     
     return screenshot_urls
 
 
-def format_quote_data(quote: Quote, screenshot_urls: Dict[str, str] = None, region_info: Dict[str, str] = None, user_query: UserQuery = None) -> Dict:
+def format_quote_data(quote: Quote, screenshot_urls: Dict[str, Dict] = None, region_info: Dict[str, str] = None, user_query: UserQuery = None) -> Dict:
     """
     Format quote data according to the specified structure.
     """
@@ -76,6 +97,9 @@ def format_quote_data(quote: Quote, screenshot_urls: Dict[str, str] = None, regi
     # Calculate total flight time from duration
     total_duration = quote.outbound.totalDuration
     
+    # Capture record of this quote, if it was one of the screenshotted ones
+    screenshot = (screenshot_urls or {}).get(quote.id) or {}
+    
     return {
         "departure_airport": departure_segment.departure.airportCode,
         "destination_airport": arrival_segment.arrival.airportCode,
@@ -99,7 +123,10 @@ def format_quote_data(quote: Quote, screenshot_urls: Dict[str, str] = None, regi
         "passenger_type": f"{user_query.num_adults}A_{user_query.num_children}C_{user_query.num_infants}I",
         "scraping_datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "source": quote.provider.value,
-        "screenshot_url": screenshot_urls.get(quote.id) if screenshot_urls else None,
+        "screenshot_url": screenshot.get("screenshot_url"),
+        "thumbnail_url": screenshot.get("thumbnail_url"),
+        "screenshot_bytes": screenshot.get("screenshot_bytes"),
+        "thumbnail_bytes": screenshot.get("thumbnail_bytes"),
         "booking_url": quote.url
     }
 
@@ -115,7 +142,7 @@ async def flight_search(
     try:
         results: List[List[Quote]] = await asyncio.wait_for(
             asyncio.gather(kiwi.run(), booking.run()),
-            timeout=30.0
+            timeout=FLIGHT_SEARCH_TIMEOUT
         )
 
         all_quotes = [quote for provider_quotes in results for quote in provider_quotes]
@@ -11,9 +11,15 @@ import httpx
 from app.providers.flight_quote_model import Quote, UserQuery
 # from app.core.config import config
 from app.providers.kiwi_utils import serialize_quotes, filter_quotes_by_departure
+from app.utils.http_retry import request_with_retry
 
 
 KIWI_API_KEY = os.getenv("KIWI_API_KEY")
+KIWI_SEARCH_URL = "https://api.tequila.kiwi.com/v2/search"
+# flight_search gives both providers FLIGHT_SEARCH_TIMEOUT seconds: one short retry at most
+KIWI_RETRY_ATTEMPTS = 2
+KIWI_RETRY_BASE_DELAY = 0.5
+KIWI_RETRY_AFTER_MAX = 5.0
 
 
 class KiwiProviderSearchToolRequest:
@@ -71,8 +77,16 @@ class KiwiProviderSearchToolRequest:
         try:
             async with httpx.AsyncClient(timeout=20) as client:
                 # config.logger.info("Making API request to Kiwi...")
-                r = await client.get("https://api.tequila.kiwi.com/v2/search", params=params, headers=headers)
-                r.raise_for_status()
+                async def send() -> httpx.Response:
+                    response = await client.get(KIWI_SEARCH_URL, params=params, headers=headers)
+                    response.raise_for_status()
+                    return response
+
+                # 429s, 5xx and transport errors are retried (see app/utils/http_retry.py)
+                r = await request_with_retry(
+                    KIWI_SEARCH_URL, send, max_attempts=KIWI_RETRY_ATTEMPTS,
+                    base_delay=KIWI_RETRY_BASE_DELAY, max_retry_after=KIWI_RETRY_AFTER_MAX
+                )
         
                 quotes_data = serialize_quotes(r.json())
 
@@ -8,6 +8,11 @@ and data export.
 
 Usage:
     python app/shipping_matrix_runner.py --date 2025-06-18 --container ST20 --delay-min 3 --delay-max 7
+    python app/shipping_matrix_runner.py --engine asyncio --max-in-flight 64 --city-percentage 1.0
+    python app/shipping_matrix_runner.py --parallel --cache-mode refresh
+    python app/shipping_matrix_runner.py --engine asyncio --sweep --city-percentage 0.1
+    python app/shipping_matrix_runner.py --engine asyncio --city-percentage 1.0 --shard 0/4 --seed 42
+    python app/shipping_matrix_runner.py --parallel --force-all
 """
 
 import asyncio
@@ -16,8 +21,12 @@ import sys
 import logging
 from datetime import datetime, timedelta
 
-from app.utils.helpers import compute_shipping_matrix, compute_shipping_matrix_parallel, compute_shipping_matrix_parallel_realtime, save_results_to_csv, save_results_to_json, save_results_to_excel, print_summary_stats
+from app.utils.helpers import SHIPPING_DATES, compute_shipping_matrix, compute_shipping_matrix_asyncio, compute_shipping_matrix_parallel, compute_shipping_matrix_parallel_realtime, save_results_to_csv, save_results_to_json, save_results_to_excel, print_summary_stats, sweep_date_passes
 from app.utils.city_point_dict import CITIES_TO_POINT_ID_MAP
+from app.tasks import run_with_screenshot_resources
+from app.utils.response_cache import CACHE_MODES, configure_response_cache
+from app.utils.route_health import configure_route_health
+from app.utils.sharding import DEFAULT_SHARD_SEED, parse_shard, shard_checkpoint_dir
 
 
 def setup_logging(log_level: str = "INFO"):
@@ -68,6 +77,11 @@ Examples:
   python app/shipping_matrix_runner.py
   python app/shipping_matrix_runner.py --date 2025-12-25 --container ST40
   python app/shipping_matrix_runner.py --delay-min 5 --delay-max 10 --log-level DEBUG
+  python app/shipping_matrix_runner.py --engine asyncio --max-in-flight 64
+  python app/shipping_matrix_runner.py --engine asyncio --sweep
+  python app/shipping_matrix_runner.py --parallel --realtime-checkpoint --sweep-dates 2025-09-01,2025-12-06,2026-03-05
+  python app/shipping_matrix_runner.py --engine asyncio --city-percentage 1.0 --seed 42 --shard 1/4
+  python merge_shard_checkpoints.py --checkpoint-dir checkpoints
 
 Available cities ({len(CITIES_TO_POINT_ID_MAP)}):
 {', '.join(sorted(CITIES_TO_POINT_ID_MAP.keys()))}
@@ -145,6 +159,58 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
         help="Use real-time checkpointing (checkpoints every N results, not when batches finish)"
     )
     
+    parser.add_argument(
+        "--engine",
+        choices=["process", "asyncio"],
+        default="process",
+        help="process: sequential, or one process per core with --parallel; "
+             "asyncio: the whole matrix as tasks in one event loop (default: process)"
+    )
+    
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        help="Combinations in flight with --engine asyncio (default: SEARATES_ASYNC_MAX_IN_FLIGHT or 64)"
+    )
+    
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        help="Searates response cache: use (read and write), refresh (write only) or off "
+             "(default: SEARATES_CACHE_MODE or use)"
+    )
+    
+    parser.add_argument(
+        "--force-all",
+        action="store_true",
+        help="Probe every combination, including chronically empty routes the route health store "
+             "would defer (needs --engine asyncio or --parallel)"
+    )
+    
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help=f"Sweep all {len(SHIPPING_DATES)} SHIPPING_DATES as one job space, coarse date spacing first "
+             "(needs --engine asyncio or --parallel)"
+    )
+    
+    parser.add_argument(
+        "--sweep-dates",
+        help="Comma-separated dates to sweep instead of SHIPPING_DATES (implies --sweep)"
+    )
+    
+    parser.add_argument(
+        "--shard",
+        help="Process only shard i of N (i/N, 0-based) of the combinations; checkpoints go to "
+             "<checkpoint-dir>/shard_<i>_of_<N> (needs --engine asyncio or --parallel)"
+    )
+    
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help=f"Seed for the city sample; use the same seed on every shard (default with --shard: {DEFAULT_SHARD_SEED})"
+    )
+    
     parser.add_argument(
         "--processes",
         type=int,
@@ -207,6 +273,11 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
     setup_logging(args.log_level)
     logger = logging.getLogger(__name__)
     
+    # Exported to the environment so worker processes use the same mode
+    configure_response_cache(mode=args.cache_mode)
+    if args.force_all:
+        configure_route_health(force_all=True)
+    
     try:
         # Validate inputs
         # validated_date = validate_date(args.date)
@@ -215,6 +286,26 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
         if args.delay_min > args.delay_max:
             raise ValueError("delay-min cannot be greater than delay-max")
         
+        sweep_dates = None
+        if args.sweep_dates:
+            sweep_dates = [datetime.strptime(d.strip(), "%Y-%m-%d").strftime("%Y-%m-%d") for d in args.sweep_dates.split(",") if d.strip()]
+        elif args.sweep:
+            sweep_dates = list(SHIPPING_DATES)
+        if sweep_dates and args.engine != "asyncio" and not args.parallel:
+            raise ValueError("--sweep needs --engine asyncio or --parallel")
+        
+        shard = parse_shard(args.shard) if args.shard else None
+        seed = args.seed
+        if shard:
+            if args.engine != "asyncio" and not args.parallel:
+                raise ValueError("--shard needs --engine asyncio or --parallel")
+            if seed is None:
+                seed = DEFAULT_SHARD_SEED
+                logger.warning(f"--shard without --seed: using seed {seed}; every shard must use the same seed")
+            # Each shard checkpoints into its own namespace; merge_shard_checkpoints.py combines them
+            args.checkpoint_dir = shard_checkpoint_dir(args.checkpoint_dir, shard)
+            args.output_prefix = f"{args.output_prefix}_shard{shard[0]}of{shard[1]}"
+        
         # Show configuration
         cities = list(CITIES_TO_POINT_ID_MAP.keys())
         total_combinations = len(cities) * (len(cities) - 1)
@@ -228,9 +319,16 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
         logger.info(f"Total cities: {len(cities)}")
         logger.info(f"Total combinations: {total_combinations}")
         logger.info(f"🎯 TARGET: 14,280 unique city+container combinations (85 cities × 84 × 2 containers)")
-        logger.info(f"Processing mode: {'PARALLEL' if args.parallel else 'SEQUENTIAL'}")
+        if args.engine == "asyncio":
+            logger.info("Processing mode: ASYNCIO (single process, one event loop)")
+        else:
+            logger.info(f"Processing mode: {'PARALLEL' if args.parallel else 'SEQUENTIAL'}")
+        if sweep_dates:
+            logger.info(f"📅 DATE SWEEP: {len(set(sweep_dates))} dates, passes {sweep_date_passes(sweep_dates)}")
+        if shard:
+            logger.info(f"🧩 SHARD {shard[0]}/{shard[1]} (seed {seed}), checkpoints in {args.checkpoint_dir}")
         
-        if args.parallel:
+        if args.parallel and args.engine == "process":
             import multiprocessing as mp
             num_processes = args.processes or mp.cpu_count()
             logger.info(f"Using {num_processes} parallel processes")
@@ -279,7 +377,19 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
             return
         
         # Run the computation
-        if args.parallel:
+        if args.engine == "asyncio":
+            results = await compute_shipping_matrix_asyncio(
+                city_percentage=args.city_percentage,
+                checkpoint_interval=args.checkpoint_interval,
+                resume=not args.no_resume,
+                checkpoint_dir=args.checkpoint_dir,
+                excel_backup=args.excel_backup,
+                max_in_flight=args.max_in_flight,
+                dates=sweep_dates,
+                seed=seed,
+                shard=shard
+            )
+        elif args.parallel:
             if args.realtime_checkpoint:
                 results = await compute_shipping_matrix_parallel_realtime(
                     # date=validated_date,
@@ -290,7 +400,10 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
                     checkpoint_interval=args.checkpoint_interval,
                     resume=not args.no_resume,
                     checkpoint_dir=args.checkpoint_dir,
-                    excel_backup=args.excel_backup
+                    excel_backup=args.excel_backup,
+                    dates=sweep_dates,
+                    seed=seed,
+                    shard=shard
                 )
             else:
                 results = await compute_shipping_matrix_parallel(
@@ -301,7 +414,10 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
                     city_percentage=args.city_percentage,
                     checkpoint_interval=args.checkpoint_interval,
                     resume=not args.no_resume,
-                    checkpoint_dir=args.checkpoint_dir
+                    checkpoint_dir=args.checkpoint_dir,
+                    dates=sweep_dates,
+                    seed=seed,
+                    shard=shard
                 )
         else:
             results = await compute_shipping_matrix(
@@ -367,4 +483,4 @@ This will process {len(CITIES_TO_POINT_ID_MAP) * (len(CITIES_TO_POINT_ID_MAP) -
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(run_with_screenshot_resources(main())) 
\ No newline at end of file
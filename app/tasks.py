@@ -1,17 +1,39 @@
 import itertools
-from typing import Optional
+from typing import List, Optional, Union
 from urllib.parse import urlparse
-import asyncio, random, uuid, os, boto3, logging
+import asyncio, random, os, time, logging
+import weakref
+from contextlib import asynccontextmanager
 from botocore.exceptions import NoCredentialsError
 from playwright.async_api import async_playwright
-from playwright_stealth import Stealth
+from app.utils import browser_pool
+from app.utils.browser_pool import CHROMIUM_ARGS, make_stealth, get_browser_pool, close_browser_pool
+from app.utils.upload_service import DEFAULT_BUCKET, get_s3_client, get_upload_service, close_upload_service
+from app.utils.screenshot_cache import content_hash, get_screenshot_cache
+from app.utils.capture_limiter import get_capture_limiter
+from app.utils.context_templates import get_context_template
+from app.utils.http_session import close_http_session
+from app.utils.screenshot_profiles import (
+    encode_for_profile,
+    get_capture_profile,
+    playwright_screenshot_options,
+    price_region_selector,
+    shutdown_encode_pool,
+)
 
 
 logger = logging.getLogger(__name__)
-SCREENSHOT_SEMAPHORE = asyncio.Semaphore(3)
 SCREEN_DIR = "screens"
 os.makedirs(SCREEN_DIR, exist_ok=True)
 
+# Screenshots are captured in memory and uploaded straight from the buffer.
+# Local PNG copies are only written when SCREENSHOT_KEEP_LOCAL=1 and are
+# removed by the retention sweeper once older than SCREENSHOT_RETENTION_HOURS.
+KEEP_LOCAL_SCREENSHOTS = os.getenv("SCREENSHOT_KEEP_LOCAL", "0") == "1"
+SCREENSHOT_RETENTION_HOURS = float(os.getenv("SCREENSHOT_RETENTION_HOURS", "24"))
+SWEEP_INTERVAL_SECONDS = 600
+_last_sweep = 0.0
+
 
 # def scrape_and_screenshot(url: str) -> Dict[str, Any]:
 #     """Celery task to scrape a webpage and capture its screenshot.
@@ -27,19 +49,17 @@ os.makedirs(SCREEN_DIR, exist_ok=True)
 #     """
 #     return asyncio.run(_go(url))
 
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION")
-
 def upload_to_s3(
         file_obj, 
         object_name=None, 
-        bucket="oracle-fpl-bot-predictions",
+        bucket=DEFAULT_BUCKET,
         metadata: Optional[dict] = {}
     ):
     """
     Upload a file to S3.
 
+    This call blocks; from async code use ``get_upload_service()`` instead.
+
     Args:
         file_obj: The file object to upload.
         object_name: The name of the object to upload.
@@ -48,12 +68,7 @@ def upload_to_s3(
     Returns:
         The URL of the uploaded file.       
     """
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION
-    )
+    s3_client = get_s3_client()
 
     try:
         s3_client.upload_fileobj(file_obj, bucket, object_name, ExtraArgs=metadata)
@@ -152,20 +167,6 @@ def upload_to_s3(
 
 cookie_string = "handlID=92852469965; handl_ref_domain=; handl_landing_page_base=https://www.freightos.com/; traffic_source=Direct; first_traffic_source=Direct; server-version-cookie=y25w24-release.1749630721000|; i18next=en; handl_original_ref=https%3A%2F%2Fship.freightos.com%2F; handl_landing_page=https%3A%2F%2Fwww.freightos.com%2Fwp-content%2Fuploads%2F2018%2F04%2Fcropped-favicon-512x512-Freighots-32x32.png; handl_ref=https%3A%2F%2Fship.freightos.com%2F; handl_url_base=https%3A%2F%2Fwww.freightos.com%2Fwp-content%2Fuploads%2F2018%2F04%2Fcropped-favicon-512x512-Freighots-32x32.png; handl_url=https%3A%2F%2Fwww.freightos.com%2Fwp-content%2Fuploads%2F2018%2F04%2Fcropped-favicon-512x512-Freighots-32x32.png; user_agent=Mozilla%2F5.0%20%28Macintosh%3B%20Intel%20Mac%20OS%20X%2010_15_7%29%20AppleWebKit%2F537.36%20%28KHTML%2C%20like%20Gecko%29%20Chrome%2F137.0.0.0%20Safari%2F537.36; organic_source=https%3A%2F%2Fship.freightos.com%2F; organic_source_str=Other; intercom-id-hwrb8vsu=84d5dfdf-01de-4610-ac59-2cceb47a176d; intercom-device-id-hwrb8vsu=49d67dd8-4587-4c5d-bcb2-17d430cda0b8; HandLtestDomainNameServer=HandLtestDomainValueServer; handl_ip=5.151.198.139; prefs=en|null|GBP|true|GB|0|kg|cm|cbm|cm3_kg|days||W48|YES|false|Freight||cbm|kg|false|false; intercom-session-hwrb8vsu=emlmUmdWR2E5c2xBYjZrRGRxKzZmM1Z3d0UxWE9QeG50ZUR5RE9FVHprWmpBTnI1cUNDSXRLd2ZtaDVPM1VleklsakYxR0FCWmI2R1hYOTZLSGQvTkYzem1DWFY5akpyK3RNUmUveDlmejQ9LS1Zc1JjRHFzdW1ISkdEeVRkaHBRdCtRPT0=--d9843bc58cd8bbe1a1a4ee6c9adf7c4f77cb06a1; session=okafor%40thecozm.com|agpzfnRyYWRlb3Mxch0LEhB1c2VyL0xlZ2FsRW50aXR5GICA6vCFiaoLDA|Okafor+Okafor||1750517761132|1753109761132|yT_32N3EdG4Tvn16XsqHMUfTciA|true|false||false|BuyQuotes+MarketplaceShipper+Buying|BusinessAdmin||||7204968168%3AagpzfnRyYWRlb3Mxch0LEhB1c2VyL0xlZ2FsRW50aXR5GICA6rCyp-kLDA%2CBuyQuotes%2BBuying%2BMarketplaceShipper|V2|v-qdF8g9ijcq1QqmMEa_6-i9Q_k"
 
-def parse_cookies(cookie_str, url):
-    domain = urlparse(url).netloc
-    cookies = []
-    for part in cookie_str.split(";"):
-        if "=" in part:
-            name, value = part.strip().split("=", 1)
-            cookies.append({
-                "name": name,
-                "value": value,
-                "domain": domain,
-                "path": "/"
-            })
-    return cookies
-
 USER_AGENTS = [
     # Desktop Chrome/Edge/Safari/Firefox
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -228,117 +229,430 @@ TIMEZONES = ["Europe/London", "Europe/Berlin"]
 #     "Asia/Tokyo", "Australia/Sydney", "America/Sao_Paulo",
 #     "Europe/Paris", "Europe/Madrid", "Asia/Shanghai"
 # ]
-async def _go(url: str, accept_cookies: bool = False):
-    async with SCREENSHOT_SEMAPHORE:
-        stealth = Stealth(
-            navigator_languages_override=("en-GB", "en"),
-            init_scripts_only=False
-        )
-        async with stealth.use_async(async_playwright()) as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--tls-fingerprint-randomization=enabled'
-                ]
-            )
-            # Get a "new" user-agent on each call
-            user_agent = next(user_agent_iter)
-            width = random.choice([1280, 1366, 1440, 1600, 1920])
-            height = random.choice([720, 900, 1080])
-            locale = random.choice(LOCALES)
-            timezone = random.choice(TIMEZONES)
-            device_scale_factor = random.choice([1, 1.25, 1.5, 2])
-            
-            context = await browser.new_context(
-                user_agent=user_agent,
-                viewport={"width": width, "height": height},
-                locale=locale,
-                timezone_id=timezone,
-                device_scale_factor=device_scale_factor,
-                # is_mobile=random.choice([True, False])
+@asynccontextmanager
+async def _one_shot_context(on_create=None, **context_options):
+    """Launch a dedicated browser for a single capture (legacy, non-pooled path)."""
+    stealth = make_stealth()
+    async with stealth.use_async(async_playwright()) as p:
+        browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+        try:
+            context = await browser.new_context(**context_options)
+            if on_create is not None:
+                await on_create(context)
+            yield context
+            await context.close()
+        finally:
+            await browser.close()
+
+
+def _screenshot_context(template, context_options: dict):
+    """Clone ``template`` into a pooled context (warm when reuse is on), or launch one if pooling is disabled."""
+    options = template.context_options(context_options)
+    if browser_pool.POOL_ENABLED:
+        return get_browser_pool().lease(warm_key=template.warm_key, on_create=template.prepare_context, **options)
+    return _one_shot_context(on_create=template.prepare_context, **options)
+
+
+# More spoofing for fingerprint evasion (unchanged)
+FINGERPRINT_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => false });
+    const origToDataURL = HTMLCanvasElement.prototype.toDataURL;
+    HTMLCanvasElement.prototype.toDataURL = function(t) {
+        const ctx = this.getContext('2d');
+        ctx.fillStyle = 'rgba(0,0,0,0.01)';
+        ctx.fillRect(0,0,this.width,this.height);
+        return origToDataURL.apply(this, arguments);
+    };
+    const origGetParam = WebGLRenderingContext.prototype.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(p) {
+        if (p === 37445) return 'Intel Inc.';
+        return origGetParam.apply(this, arguments);
+    };
+"""
+
+# Pages opened side by side in one context by capture_many
+TABS_PER_CONTEXT = int(os.getenv("SCREENSHOT_TABS_PER_CONTEXT", "3"))
+
+
+def _random_context_options(profile: dict) -> dict:
+    """Randomized fingerprint for one browser context."""
+    return {
+        # Get a "new" user-agent on each call
+        "user_agent": next(user_agent_iter),
+        "viewport": {
+            "width": random.choice([1280, 1366, 1440, 1600, 1920]),
+            "height": random.choice([720, 900, 1080]),
+        },
+        "locale": random.choice(LOCALES),
+        "timezone_id": random.choice(TIMEZONES),
+        "device_scale_factor": profile["device_scale_factor"] or random.choice([1, 1.25, 1.5, 2]),
+        # "is_mobile": random.choice([True, False]),
+    }
+
+
+def _context_template(url: str):
+    """Per-host template with the session cookies and fingerprint script (stealth is added by the pool's Playwright)."""
+    return get_context_template(url, cookie_string, FINGERPRINT_INIT_SCRIPT)
+
+
+COOKIE_ACCEPT_SELECTOR = "button[data-test='CookiesPopup-Accept']"
+COOKIE_POPUP_TIMEOUT_MS = 12000
+
+# Contexts that accepted the consent popup; warm contexts (SCREENSHOT_CONTEXT_REUSE=1)
+# keep the consent cookie, so later captures in them don't wait for the popup
+_consented_contexts = weakref.WeakSet()
+
+
+async def _accept_cookie_popup(page) -> None:
+    """Click the cookie consent button if the popup shows up.
+
+    Tabs sharing a context with a tab that already accepted get no popup, so a
+    missing popup is not an error. In a context that already accepted, the
+    popup is only looked for once instead of waited for.
+    """
+    context = page.context
+    if context in _consented_contexts:
+        button = await page.query_selector(COOKIE_ACCEPT_SELECTOR)
+        if button and await button.is_visible():
+            await button.click()
+            await page.wait_for_timeout(1000)
+        return
+
+    try:
+        await page.wait_for_selector(COOKIE_ACCEPT_SELECTOR, state="visible", timeout=COOKIE_POPUP_TIMEOUT_MS)
+    except Exception:
+        logger.debug(f"No cookie popup on {page.url}, consent already given")
+        _consented_contexts.add(context)
+        return
+    logger.debug("Cookie popup found, accepting it")
+    await page.click(COOKIE_ACCEPT_SELECTOR)
+    _consented_contexts.add(context)
+    await page.wait_for_timeout(1000)
+
+
+async def _capture_page(context, url: str, accept_cookies: bool, profile: dict, template) -> dict:
+    """Open ``url`` in a new tab of ``context`` and screenshot it.
+
+    Returns ``{"url", "image_bytes"}`` on success or ``{"url", "error"}`` when
+    navigation fails.
+    """
+    page = await context.new_page()
+    try:
+        await template.prepare_page(page)
+        width = page.viewport_size["width"]
+        height = page.viewport_size["height"]
+
+        try:
+            # --- HISTORY MANIPULATION: Optionally visit random site first ---
+            # if random.random() < 0.7:  # 70% of the time, visit random site first
+            #     pre_site = random.choice(RANDOM_SITES)
+            #     await page.goto(pre_site, wait_until="domcontentloaded", timeout=45000)
+            #     await page.wait_for_timeout(random.randint(10000, 30000))  # 10-30s
+
+            # Now go to your real target
+            await page.goto(url, wait_until="domcontentloaded", timeout=150000)
+
+            if accept_cookies:
+                await _accept_cookie_popup(page)
+
+            # Human-like mouse movement
+            for _ in range(random.randint(2, 5)):
+                await page.mouse.move(random.randint(100, width - 100),
+                                     random.randint(100, height - 100), steps=10)
+                await page.wait_for_timeout(random.randint(500, 1500))
+            await page.mouse.wheel(0, random.randint(300, 800))
+            await page.wait_for_timeout(random.randint(1000, 3000))
+        except Exception as e:
+            return {"url": url, "error": str(e)}
+
+        screenshot_options = playwright_screenshot_options(profile)
+        image_bytes = None
+        if profile["clip_to_price_region"]:
+            selector = price_region_selector(url)
+            if selector:
+                try:
+                    image_bytes = await page.locator(selector).first.screenshot(timeout=10000, **screenshot_options)
+                except Exception as e:
+                    logger.debug(f"Price region '{selector}' not captured for {url}, using viewport: {e}")
+        if image_bytes is None:
+            image_bytes = await page.screenshot(full_page=profile["full_page"], **screenshot_options)
+
+        return {"url": url, "image_bytes": image_bytes}
+    finally:
+        await page.close()
+
+
+async def _capture(url: str, accept_cookies: bool = False, profile: Optional[dict] = None) -> dict:
+    """Open ``url`` in a pooled browser context and screenshot it as ``profile`` describes.
+
+    Returns ``{"url", "image_bytes"}`` on success or ``{"url", "error"}`` when
+    navigation fails.
+    """
+    profile = profile or get_capture_profile()
+    template = _context_template(url)
+    # Host-wide adaptive limit shared by every worker process (replaces the per-process Semaphore(3))
+    async with get_capture_limiter().slot():
+        async with _screenshot_context(template, _random_context_options(profile)) as context:
+            return await _capture_page(context, url, accept_cookies, profile, template)
+
+
+def _thumbnail_key(filename: str) -> str:
+    folder, name = filename.rsplit("/", 1)
+    return f"{folder}/thumbs/{name}"
+
+
+def _cache_variant(capture_profile: dict) -> str:
+    # Different profiles of the same page are different images
+    return "" if capture_profile["name"] == "full" else capture_profile["name"]
+
+
+async def _cached_capture(url: str, capture_profile: dict, cache) -> Optional[dict]:
+    """Return the stored record for a recently captured page, if any."""
+    cached = await asyncio.to_thread(cache.lookup_url, url, _cache_variant(capture_profile))
+    if not cached:
+        return None
+
+    logger.info(f"Screenshot cache hit for {url}")
+    # Only a thumbnail that was actually uploaded and recorded is returned
+    wants_thumbnail = bool(capture_profile["thumbnail_width"])
+    return {
+        "url": url,
+        "screenshot_url": cached["screenshot_url"],
+        "thumbnail_url": cached["thumbnail_url"] if wants_thumbnail else None,
+        "screenshot_bytes": cached["size"],
+        "thumbnail_bytes": cached["thumbnail_size"] if wants_thumbnail else None,
+        "profile": capture_profile["name"],
+        "cached": True,
+    }
+
+
+async def _store_capture(url: str, raw_bytes: bytes, capture_profile: dict, cache) -> dict:
+    """Encode, upload and index a captured screenshot; return its record."""
+    # Re-encode and thumbnail in the encoder process pool
+    encoded = await encode_for_profile(raw_bytes, capture_profile)
+    image_bytes = encoded["image"]
+    thumbnail_bytes = encoded["thumbnail"]
+
+    # Content-addressed object name: identical images map to one object
+    digest = content_hash(image_bytes)
+    filename = f"freightos_shipping/{digest}.{encoded['ext']}"
+    thumbnail_filename = _thumbnail_key(filename)
+
+    if KEEP_LOCAL_SCREENSHOTS:
+        await asyncio.to_thread(_save_local_screenshot, filename, image_bytes)
+        await maybe_sweep_local_screenshots()
+
+    thumbnail_url = None
+    stored = await asyncio.to_thread(cache.lookup_blob, digest) if cache else None
+    if stored:
+        file_url = stored["screenshot_url"]
+        logger.info(f"Identical screenshot already stored, reusing {file_url}")
+        if thumbnail_bytes:
+            # The image may have been stored by a profile without thumbnails
+            thumbnail_url = stored["thumbnail_url"] or await get_upload_service().upload(
+                thumbnail_bytes, thumbnail_filename, content_type=encoded["content_type"]
             )
-            await stealth.apply_stealth_async(context)
-            page = await context.new_page()
-
-            cookies = parse_cookies(cookie_string, url)
-            await context.add_cookies(cookies)
-
-            # More spoofing for fingerprint evasion (unchanged)
-            await page.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', { get: () => false });
-                const origToDataURL = HTMLCanvasElement.prototype.toDataURL;
-                HTMLCanvasElement.prototype.toDataURL = function(t) {
-                    const ctx = this.getContext('2d');
-                    ctx.fillStyle = 'rgba(0,0,0,0.01)';
-                    ctx.fillRect(0,0,this.width,this.height);
-                    return origToDataURL.apply(this, arguments);
-                };
-                const origGetParam = WebGLRenderingContext.prototype.getParameter;
-                WebGLRenderingContext.prototype.getParameter = function(p) {
-                    if (p === 37445) return 'Intel Inc.';
-                    return origGetParam.apply(this, arguments);
-                };
-            """)
-
-            # await page.set_extra_http_headers({
-            #     "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-            #     "accept-language": "en-US,en;q=0.9",
-            #     "cache-control": "max-age=0",
-            #     "upgrade-insecure-requests": "1",
-            #     "sec-ch-ua": '"Google Chrome";v="137", "Chromium";v="137", "Not/A)Brand";v="24"',
-            #     "sec-ch-ua-mobile": "?0",
-            #     "sec-ch-ua-platform": '"macOS"',
-            # })
+    else:
+        uploads = [get_upload_service().upload(image_bytes, filename, content_type=encoded["content_type"])]
+        if thumbnail_bytes:
+            uploads.append(get_upload_service().upload(thumbnail_bytes, thumbnail_filename, content_type=encoded["content_type"]))
+        uploaded = await asyncio.gather(*uploads)
+        file_url = uploaded[0]
+        thumbnail_url = uploaded[1] if thumbnail_bytes else None
+
+    thumbnail_size = len(thumbnail_bytes) if thumbnail_url else None
+    if cache and file_url:
+        await asyncio.to_thread(
+            cache.record, url, file_url, digest, len(image_bytes), _cache_variant(capture_profile),
+            thumbnail_url, thumbnail_size
+        )
 
-            try:
-                # --- HISTORY MANIPULATION: Optionally visit random site first ---
-                # if random.random() < 0.7:  # 70% of the time, visit random site first
-                #     pre_site = random.choice(RANDOM_SITES)
-                #     await page.goto(pre_site, wait_until="domcontentloaded", timeout=45000)
-                #     await page.wait_for_timeout(random.randint(10000, 30000))  # 10-30s
+    return {
+        "url": url,
+        "screenshot_url": file_url,
+        "thumbnail_url": thumbnail_url,
+        "screenshot_bytes": len(image_bytes),
+        "thumbnail_bytes": thumbnail_size,
+        "profile": capture_profile["name"],
+    }
 
-                
-                # if random.random() < 0.3:
-                #     await context.close()
-                #     context = await browser.new_context()
-                #     page = await context.new_page()
-
-                # Now go to your real target
-                await page.goto(url, wait_until="domcontentloaded", timeout=150000)
-
-                if accept_cookies:
-                    print("[INFO] Waiting for cookie popup...")
-                    await page.wait_for_selector("button[data-test='CookiesPopup-Accept']", timeout=12000)
-                    print("[INFO] Accept button found. Clicking it...")
-                    await page.click("button[data-test='CookiesPopup-Accept']")
-                    await page.wait_for_timeout(1000)
-
-                # Human-like mouse movement
-                for _ in range(random.randint(2, 5)):
-                    await page.mouse.move(random.randint(100, width - 100),
-                                         random.randint(100, height - 100), steps=10)
-                    await page.wait_for_timeout(random.randint(500, 1500))
-                await page.mouse.wheel(0, random.randint(300, 800))
-                await page.wait_for_timeout(random.randint(1000, 3000))
+
+async def _go(url: str, accept_cookies: bool = False, use_cache: bool = True, profile: Optional[str] = None):
+    """Capture ``url`` with the named capture profile (default: SCREENSHOT_PROFILE) and store it.
+
+    Returns ``{"url", "screenshot_url", "thumbnail_url", "screenshot_bytes",
+    "thumbnail_bytes", "profile"}``, or ``{"url", "error"}`` when capture fails.
+    Cache hits carry ``cached: True``; their thumbnail and byte sizes are
+    whatever the cache recorded for the stored image, None otherwise.
+    """
+    capture_profile = get_capture_profile(profile)
+    cache = get_screenshot_cache() if use_cache else None
+
+    # Same page captured recently (retries, resumed runs) - reuse it without a browser
+    if cache:
+        cached = await _cached_capture(url, capture_profile, cache)
+        if cached:
+            return cached
+
+    captured = await _capture(url, accept_cookies, capture_profile)
+    if "error" in captured:
+        return captured
+    return await _store_capture(url, captured["image_bytes"], capture_profile, cache)
+
+
+async def capture_many(
+    urls: List[str],
+    per_context_tabs: int = TABS_PER_CONTEXT,
+    accept_cookies: Union[bool, List[bool]] = False,
+    use_cache: bool = True,
+    profile: Optional[str] = None
+) -> List[dict]:
+    """Capture several pages, opening up to ``per_context_tabs`` tabs in one context at a time.
+
+    URLs are grouped by host so each context serves one provider. Tabs in a
+    context load and capture in parallel; every context counts as one slot of
+    the capture limiter.
+
+    Args:
+        urls: Pages to capture
+        per_context_tabs: Pages opened side by side in one browser context
+        accept_cookies: One flag for all pages, or one flag per URL
+        use_cache: Reuse recent captures of the same page
+        profile: Capture profile name (default: SCREENSHOT_PROFILE)
+
+    Returns:
+        One record per input URL, in input order. Failed pages get
+        ``{"url", "error"}`` without affecting the others.
+    """
+    capture_profile = get_capture_profile(profile)
+    cache = get_screenshot_cache() if use_cache else None
+    per_context_tabs = max(1, per_context_tabs)
+    if isinstance(accept_cookies, bool):
+        accept_cookies = [accept_cookies] * len(urls)
+    if len(accept_cookies) != len(urls):
+        raise ValueError("accept_cookies must be a bool or have one entry per URL")
+
+    # Capture each distinct page once
+    unique = {}
+    for url, accept in zip(urls, accept_cookies):
+        unique.setdefault(url, accept)
+    records = {}
+
+    if cache:
+        cached = await asyncio.gather(*(_cached_capture(url, capture_profile, cache) for url in unique))
+        records.update({record["url"]: record for record in cached if record})
+
+    by_host = {}
+    for url in unique:
+        if url not in records:
+            by_host.setdefault(urlparse(url).netloc, []).append(url)
+    groups = [
+        host_urls[i:i + per_context_tabs]
+        for host_urls in by_host.values()
+        for i in range(0, len(host_urls), per_context_tabs)
+    ]
+
+    async def finish(url: str, captured) -> None:
+        if isinstance(captured, BaseException):
+            records[url] = {"url": url, "error": str(captured) or type(captured).__name__}
+        elif "error" in captured:
+            records[url] = captured
+        else:
+            try:
+                records[url] = await _store_capture(url, captured["image_bytes"], capture_profile, cache)
             except Exception as e:
-                await browser.close()
-                return {"url": url, "error": str(e)}
+                records[url] = {"url": url, "error": str(e)}
+
+    async def run_group(group: List[str]) -> None:
+        try:
+            template = _context_template(group[0])
+            async with get_capture_limiter().slot():
+                async with _screenshot_context(template, _random_context_options(capture_profile)) as context:
+                    captured = await asyncio.gather(
+                        *(_capture_page(context, url, unique[url], capture_profile, template) for url in group),
+                        return_exceptions=True
+                    )
+        except Exception as e:
+            captured = [e] * len(group)
+        await asyncio.gather(*(finish(url, result) for url, result in zip(group, captured)))
+
+    await asyncio.gather(*(run_group(group) for group in groups))
+    return [records[url] for url in urls]
+
+
+def _save_local_screenshot(filename: str, image_bytes: bytes) -> str:
+    path = os.path.join(SCREEN_DIR, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(image_bytes)
+    return path
+
+
+def sweep_local_screenshots(max_age_hours: float = None) -> int:
+    """
+    Delete local screenshots older than ``max_age_hours``.
 
-            filename = f"freightos_shipping/{uuid.uuid4()}.png"
-            path = os.path.join(SCREEN_DIR, filename)
-            await page.screenshot(path=path, full_page=True)
-            await context.close()
-            await browser.close()
+    Args:
+        max_age_hours: Retention window (default: SCREENSHOT_RETENTION_HOURS)
 
-            with open(path, "rb") as f:
-                file_url = upload_to_s3(f, filename, metadata={"ContentType": "image/png"})
-            return {"url": url, "screenshot_url": file_url}
+    Returns:
+        Number of files removed
+    """
+    if max_age_hours is None:
+        max_age_hours = SCREENSHOT_RETENTION_HOURS
+    cutoff = time.time() - max_age_hours * 3600
+
+    removed = 0
+    for root, _, files in os.walk(SCREEN_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logger.debug(f"Could not remove old screenshot {path}: {e}")
+
+    if removed:
+        logger.info(f"Removed {removed} local screenshots older than {max_age_hours}h from {SCREEN_DIR}")
+    return removed
+
+
+async def maybe_sweep_local_screenshots(force: bool = False) -> None:
+    """Run the retention sweep in a worker thread at most every SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+
+    now = time.time()
+    if not force and now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    await asyncio.to_thread(sweep_local_screenshots)
 
 
+async def release_screenshot_resources():
+    """Shut down long-lived screenshot and HTTP resources owned by the running event loop."""
+    await close_browser_pool()
+    await close_upload_service()
+    await close_http_session()
+    await asyncio.to_thread(shutdown_encode_pool)
+    await maybe_sweep_local_screenshots(force=True)
+
+
+async def run_with_screenshot_resources(coro):
+    """Await ``coro`` and release pooled screenshot resources afterwards.
+
+    Use this around the top-level coroutine passed to ``asyncio.run`` in worker
+    processes so pooled browsers and the shared HTTP session are closed before
+    the event loop shuts down.
+    """
+    try:
+        return await coro
+    finally:
+        await release_screenshot_resources()
+
 
 def scrape_and_screenshot(url: str):
-    return asyncio.run(_go(url))
+    return asyncio.run(run_with_screenshot_resources(_go(url)))
 
 
 # if __name__ == "__main__":
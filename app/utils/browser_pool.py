@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Browser Pool for Screenshot Capture
+
+This module keeps a small set of long-lived headless Chromium instances per
+process so that screenshot capture no longer pays the Playwright start-up and
+browser launch cost on every call. Callers lease a fresh browser context from
+the pool; browsers are recycled after a configurable number of pages or as soon
+as they crash.
+
+Callers that capture many pages of the same provider can instead lease a
+"warm" context by key: one long-lived context per browser and key whose
+HTTP cache and connections carry over from one capture to the next.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import BrowserContext, async_playwright
+from playwright_stealth import Stealth
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing (N browsers × M contexts, recycled after K pages)
+POOL_BROWSERS = int(os.getenv("SCREENSHOT_POOL_BROWSERS", "1"))
+POOL_CONTEXTS_PER_BROWSER = int(os.getenv("SCREENSHOT_POOL_CONTEXTS", "3"))
+POOL_RECYCLE_AFTER = int(os.getenv("SCREENSHOT_POOL_RECYCLE_AFTER", "50"))
+POOL_ENABLED = os.getenv("SCREENSHOT_POOL_ENABLED", "1") != "0"
+# Pages served by one warm (reused) context before it is replaced
+WARM_CONTEXT_MAX_PAGES = int(os.getenv("SCREENSHOT_WARM_CONTEXT_MAX_PAGES", "25"))
+
+CHROMIUM_ARGS = [
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--tls-fingerprint-randomization=enabled'
+]
+
+
+def make_stealth() -> Stealth:
+    """Create the stealth configuration shared by every screenshot browser."""
+    return Stealth(
+        navigator_languages_override=("en-GB", "en"),
+        init_scripts_only=False
+    )
+
+
+class PooledBrowser:
+    """A single Chromium instance tracked by the pool."""
+
+    def __init__(self, browser, slot_id: int):
+        self.browser = browser
+        self.slot_id = slot_id
+        self.pages_served = 0
+        self.active_leases = 0
+        self.crashed = False
+        # Reused contexts keyed by caller-chosen name: key -> [context, pages_served, active_leases]
+        self.warm_contexts: Dict[str, list] = {}
+        browser.on("disconnected", lambda _: self._mark_crashed())
+
+    def _mark_crashed(self) -> None:
+        self.crashed = True
+
+    @property
+    def is_healthy(self) -> bool:
+        return not self.crashed and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Pool of long-lived Chromium browsers handing out fresh contexts.
+
+    Each browser serves at most ``contexts_per_browser`` leases at a time and
+    is replaced once it has served ``recycle_after`` pages or has crashed.
+    """
+
+    def __init__(
+        self,
+        browsers: int = POOL_BROWSERS,
+        contexts_per_browser: int = POOL_CONTEXTS_PER_BROWSER,
+        recycle_after: int = POOL_RECYCLE_AFTER,
+        launch_args: Optional[List[str]] = None,
+        stealth: Optional[Stealth] = None,
+        warm_context_max_pages: int = WARM_CONTEXT_MAX_PAGES
+    ):
+        """
+        Initialize the browser pool.
+
+        Args:
+            browsers: Number of Chromium instances to keep alive
+            contexts_per_browser: Maximum concurrent contexts per browser
+            recycle_after: Number of pages a browser serves before it is relaunched
+            launch_args: Extra Chromium command line arguments
+            stealth: Stealth configuration applied to the Playwright instance
+            warm_context_max_pages: Leases a warm context serves before it is replaced
+        """
+        self.browsers = max(1, browsers)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.recycle_after = max(1, recycle_after)
+        self.launch_args = launch_args if launch_args is not None else list(CHROMIUM_ARGS)
+        self.stealth = stealth or make_stealth()
+        self.warm_context_max_pages = max(1, warm_context_max_pages)
+
+        self._playwright_cm = None
+        self._playwright = None
+        self._slots: List[Optional[PooledBrowser]] = [None] * self.browsers
+        self._draining: List[PooledBrowser] = []
+        self._retired_warm: List[list] = []
+        self._capacity = asyncio.Semaphore(self.browsers * self.contexts_per_browser)
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+        # Stats
+        self.launches = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.leases = 0
+        self.warm_contexts_created = 0
+        self.warm_reuses = 0
+
+    async def start(self) -> None:
+        """Start Playwright. Browsers themselves are launched lazily on first lease."""
+        if self._playwright is not None:
+            return
+        self._playwright_cm = self.stealth.use_async(async_playwright())
+        self._playwright = await self._playwright_cm.__aenter__()
+        logger.info(
+            f"Browser pool started: {self.browsers} browsers × {self.contexts_per_browser} contexts, "
+            f"recycling after {self.recycle_after} pages"
+        )
+
+    async def _launch(self, slot_id: int) -> PooledBrowser:
+        browser = await self._playwright.chromium.launch(headless=True, args=self.launch_args)
+        self.launches += 1
+        logger.debug(f"Launched pooled browser in slot {slot_id} (launch #{self.launches})")
+        return PooledBrowser(browser, slot_id)
+
+    async def _close_browser(self, pooled: PooledBrowser) -> None:
+        pooled.warm_contexts.clear()
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled browser in slot {pooled.slot_id}: {e}")
+
+    async def _acquire_browser(self) -> PooledBrowser:
+        """Pick the least busy healthy browser, launching or recycling as needed."""
+        async with self._lock:
+            if self._playwright is None:
+                await self.start()
+
+            for slot_id, pooled in enumerate(self._slots):
+                if pooled is None:
+                    continue
+                if not pooled.is_healthy:
+                    self.crashes += 1
+                    logger.warning(f"Pooled browser in slot {slot_id} crashed - relaunching")
+                    self._slots[slot_id] = None
+                    if pooled.active_leases > 0:
+                        self._draining.append(pooled)
+                    else:
+                        await self._close_browser(pooled)
+                elif pooled.pages_served >= self.recycle_after:
+                    self.recycles += 1
+                    logger.debug(f"Recycling pooled browser in slot {slot_id} after {pooled.pages_served} pages")
+                    self._slots[slot_id] = None
+                    if pooled.active_leases > 0:
+                        self._draining.append(pooled)
+                    else:
+                        await self._close_browser(pooled)
+
+            candidates = [p for p in self._slots if p is not None and p.active_leases < self.contexts_per_browser]
+            if candidates:
+                pooled = min(candidates, key=lambda p: p.active_leases)
+            else:
+                slot_id = self._slots.index(None)
+                pooled = await self._launch(slot_id)
+                self._slots[slot_id] = pooled
+
+            pooled.active_leases += 1
+            pooled.pages_served += 1
+            return pooled
+
+    async def _release_browser(self, pooled: PooledBrowser) -> None:
+        async with self._lock:
+            pooled.active_leases -= 1
+            if pooled in self._draining and pooled.active_leases == 0:
+                self._draining.remove(pooled)
+                await self._close_browser(pooled)
+
+    async def _new_context(
+        self,
+        pooled: PooledBrowser,
+        on_create: Optional[Callable[[BrowserContext], Awaitable[Any]]],
+        context_options: Dict[str, Any]
+    ) -> BrowserContext:
+        context = await pooled.browser.new_context(**context_options)
+        if on_create is not None:
+            await on_create(context)
+        return context
+
+    async def _open_context(
+        self,
+        pooled: PooledBrowser,
+        warm_key: Optional[str],
+        on_create: Optional[Callable[[BrowserContext], Awaitable[Any]]],
+        context_options: Dict[str, Any]
+    ) -> BrowserContext:
+        """Create a fresh context, or hand out the browser's warm context for ``warm_key``."""
+        if warm_key is None:
+            return await self._new_context(pooled, on_create, context_options)
+
+        warm = pooled.warm_contexts.get(warm_key)
+        if warm is not None and warm[1] >= self.warm_context_max_pages:
+            # Retire it; the last lease still using it closes it
+            del pooled.warm_contexts[warm_key]
+            if warm[2] == 0:
+                await self._close_context(warm[0])
+            else:
+                self._retired_warm.append(warm)
+            warm = None
+        if warm is None:
+            warm = [await self._new_context(pooled, on_create, context_options), 0, 0]
+            pooled.warm_contexts[warm_key] = warm
+            self.warm_contexts_created += 1
+        else:
+            self.warm_reuses += 1
+        warm[1] += 1
+        warm[2] += 1
+        return warm[0]
+
+    async def _close_context(self, context: BrowserContext) -> bool:
+        try:
+            await context.close()
+            return True
+        except Exception as e:
+            logger.debug(f"Error closing leased context: {e}")
+            return False
+
+    async def _release_context(self, pooled: PooledBrowser, context: BrowserContext, warm_key: Optional[str]) -> None:
+        if warm_key is None:
+            if not await self._close_context(context):
+                pooled.crashed = True
+            return
+
+        warm = pooled.warm_contexts.get(warm_key)
+        if warm is not None and warm[0] is context:
+            warm[2] -= 1
+            return
+        # Retired while this lease was using it - close once nobody else is
+        for entry in self._retired_warm:
+            if entry[0] is context:
+                entry[2] -= 1
+                if entry[2] <= 0:
+                    self._retired_warm.remove(entry)
+                    await self._close_context(context)
+                return
+        await self._close_context(context)
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        warm_key: Optional[str] = None,
+        on_create: Optional[Callable[[BrowserContext], Awaitable[Any]]] = None,
+        **context_options: Any
+    ) -> AsyncIterator[BrowserContext]:
+        """
+        Lease a browser context from the pool.
+
+        Args:
+            warm_key: Reuse one long-lived context per browser for this key
+                instead of creating a fresh one. Pages opened in a warm context
+                share its HTTP cache, cookies and connections. It is replaced
+                after ``warm_context_max_pages`` leases.
+            on_create: Coroutine function called once with each newly created
+                context (init scripts, routes)
+            **context_options: Keyword arguments forwarded to ``browser.new_context``
+
+        Yields:
+            A BrowserContext; fresh contexts are closed when the lease ends
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        async with self._capacity:
+            pooled = await self._acquire_browser()
+            context = None
+            try:
+                try:
+                    context = await self._open_context(pooled, warm_key, on_create, context_options)
+                except Exception:
+                    # The browser most likely died underneath us - retry once on a fresh one
+                    pooled.crashed = True
+                    await self._release_browser(pooled)
+                    pooled = await self._acquire_browser()
+                    context = await self._open_context(pooled, warm_key, on_create, context_options)
+
+                self.leases += 1
+                yield context
+            finally:
+                if context is not None:
+                    await self._release_context(pooled, context, warm_key)
+                await self._release_browser(pooled)
+
+    async def close(self) -> None:
+        """Close every browser and stop Playwright."""
+        self._closed = True
+        async with self._lock:
+            for pooled in [p for p in self._slots if p is not None] + self._draining:
+                await self._close_browser(pooled)
+            self._slots = [None] * self.browsers
+            self._draining = []
+            self._retired_warm = []
+
+            if self._playwright_cm is not None:
+                try:
+                    await self._playwright_cm.__aexit__(None, None, None)
+                except Exception as e:
+                    logger.debug(f"Error stopping Playwright: {e}")
+            self._playwright_cm = None
+            self._playwright = None
+
+        logger.info(f"Browser pool closed: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool usage statistics."""
+        return {
+            "browsers": self.browsers,
+            "contexts_per_browser": self.contexts_per_browser,
+            "recycle_after": self.recycle_after,
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "crashes": self.crashes,
+            "leases": self.leases,
+            "warm_contexts_created": self.warm_contexts_created,
+            "warm_reuses": self.warm_reuses,
+            "live_browsers": len([p for p in self._slots if p is not None]),
+        }
+
+
+# Per-process pool, bound to the event loop that created it
+_pool: Optional[BrowserPool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def configure_browser_pool(
+    browsers: Optional[int] = None,
+    contexts_per_browser: Optional[int] = None,
+    recycle_after: Optional[int] = None,
+    enabled: Optional[bool] = None
+) -> None:
+    """
+    Set the pool size for this process and any worker processes started afterwards.
+
+    Values are exported as environment variables so that ProcessPoolExecutor
+    workers pick up the same configuration.
+    """
+    global POOL_BROWSERS, POOL_CONTEXTS_PER_BROWSER, POOL_RECYCLE_AFTER, POOL_ENABLED
+
+    if browsers is not None:
+        POOL_BROWSERS = browsers
+        os.environ["SCREENSHOT_POOL_BROWSERS"] = str(browsers)
+    if contexts_per_browser is not None:
+        POOL_CONTEXTS_PER_BROWSER = contexts_per_browser
+        os.environ["SCREENSHOT_POOL_CONTEXTS"] = str(contexts_per_browser)
+    if recycle_after is not None:
+        POOL_RECYCLE_AFTER = recycle_after
+        os.environ["SCREENSHOT_POOL_RECYCLE_AFTER"] = str(recycle_after)
+    if enabled is not None:
+        POOL_ENABLED = enabled
+        os.environ["SCREENSHOT_POOL_ENABLED"] = "1" if enabled else "0"
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the browser pool for the running event loop, creating it if needed."""
+    global _pool, _pool_loop
+
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop or _pool._closed:
+        _pool = BrowserPool(
+            browsers=POOL_BROWSERS,
+            contexts_per_browser=POOL_CONTEXTS_PER_BROWSER,
+            recycle_after=POOL_RECYCLE_AFTER
+        )
+        _pool_loop = loop
+    return _pool
+
+
+async def close_browser_pool() -> None:
+    """Close the pool owned by the running event loop, if any."""
+    global _pool, _pool_loop
+
+    if _pool is not None and _pool_loop is asyncio.get_running_loop():
+        await _pool.close()
+    _pool = None
+    _pool_loop = None
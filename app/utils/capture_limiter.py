@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Adaptive Capture Limiter
+
+Host-wide limit on in-flight screenshot captures, shared by every worker
+process through a small SQLite database. Each capture holds a lease row while
+it runs; the limit itself is adjusted every few seconds from what the host is
+actually doing:
+
+- memory: MemAvailable and the RSS of running Chromium processes give the
+  number of additional captures that still fit in memory
+- CPU: 1-minute load average per core
+- latency: p95 of recent capture durations against a target
+
+The limit backs off multiplicatively under pressure and grows by one while the
+host has headroom and the limiter is saturated. Current limit, in-flight
+captures and queue depth are exposed through ``stats()`` and, when
+prometheus_client is installed, as Prometheus gauges refreshed on every
+acquire, release and wait.
+
+The limit covers captures in progress only. Each worker process also keeps
+idle browsers in its browser pool (app/utils/browser_pool.py) between
+captures, and their memory is outside the limit: the limiter alone does not
+cap Chromium memory on the host. Size the pools (SCREENSHOT_POOL_BROWSERS,
+SCREENSHOT_POOL_CONTEXTS) with the number of worker processes in mind.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+try:
+    from prometheus_client import Gauge
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LIMITER_DB_PATH = os.getenv("SCREENSHOT_LIMITER_DB", "cache/capture_limiter.sqlite3")
+LIMITER_MIN = int(os.getenv("SCREENSHOT_MIN_CONCURRENCY", "1"))
+LIMITER_MAX = int(os.getenv("SCREENSHOT_MAX_CONCURRENCY", str(max(2, (os.cpu_count() or 2) // 2))))
+LIMITER_INITIAL = int(os.getenv("SCREENSHOT_INITIAL_CONCURRENCY", "3"))
+LIMITER_TARGET_P95_SECONDS = float(os.getenv("SCREENSHOT_TARGET_P95_SECONDS", "45"))
+LIMITER_MEMORY_RESERVE_MB = int(os.getenv("SCREENSHOT_MEMORY_RESERVE_MB", "1024"))
+LIMITER_MAX_LOAD_PER_CORE = float(os.getenv("SCREENSHOT_MAX_LOAD_PER_CORE", "1.5"))
+LIMITER_ADJUST_INTERVAL = float(os.getenv("SCREENSHOT_LIMITER_ADJUST_SECONDS", "10"))
+
+# A lease older than this belongs to a crashed process and is reclaimed
+LEASE_TIMEOUT_SECONDS = 600
+# Capture durations considered for the p95
+LATENCY_WINDOW = 50
+# Assumed Chromium footprint per capture until real RSS has been observed
+DEFAULT_CAPTURE_RSS_MB = 400
+
+if PROMETHEUS_AVAILABLE:
+    LIMIT_GAUGE = Gauge("screenshot_capture_limit", "Current adaptive screenshot concurrency limit")
+    IN_FLIGHT_GAUGE = Gauge("screenshot_captures_in_flight", "Screenshot captures currently running")
+    QUEUE_DEPTH_GAUGE = Gauge("screenshot_capture_queue_depth", "Screenshot captures waiting for a slot")
+    P95_GAUGE = Gauge("screenshot_capture_p95_seconds", "p95 screenshot capture latency")
+
+
+def read_available_memory_mb() -> Optional[float]:
+    """Return MemAvailable from /proc/meminfo in MB, or None when unavailable."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def read_chromium_rss_mb() -> Optional[float]:
+    """Return the combined RSS of running Chromium processes in MB, or None when /proc is unavailable."""
+    if not os.path.isdir("/proc"):
+        return None
+
+    total_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/comm", "r") as f:
+                name = f.read().strip()
+            if "chrom" not in name and "headless_shell" not in name:
+                continue
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def read_load_per_core() -> Optional[float]:
+    """Return the 1-minute load average divided by the number of cores."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+
+def percentile(values, fraction: float) -> Optional[float]:
+    """Return the ``fraction`` percentile of ``values`` (nearest rank)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class CaptureLimiter:
+    """
+    Cross-process adaptive concurrency limiter for screenshot capture.
+
+    All state lives in SQLite so that every ProcessPoolExecutor worker on the
+    host shares one limit. Slot bookkeeping runs in a worker thread so the
+    event loop is never blocked on the database.
+    """
+
+    def __init__(
+        self,
+        db_path: str = LIMITER_DB_PATH,
+        min_limit: int = LIMITER_MIN,
+        max_limit: int = LIMITER_MAX,
+        initial_limit: int = LIMITER_INITIAL,
+        target_p95_seconds: float = LIMITER_TARGET_P95_SECONDS,
+        memory_reserve_mb: int = LIMITER_MEMORY_RESERVE_MB,
+        max_load_per_core: float = LIMITER_MAX_LOAD_PER_CORE,
+        adjust_interval: float = LIMITER_ADJUST_INTERVAL
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            db_path: SQLite database file (shared across processes)
+            min_limit: Lowest concurrency the limiter backs off to
+            max_limit: Highest concurrency the limiter grows to
+            initial_limit: Limit used before any adjustment
+            target_p95_seconds: p95 capture latency above which the limit is reduced
+            memory_reserve_mb: Memory kept free for the rest of the host
+            max_load_per_core: Load average per core above which the limit is reduced
+            adjust_interval: Seconds between limit adjustments
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.initial_limit = min(self.max_limit, max(self.min_limit, initial_limit))
+        self.target_p95_seconds = target_p95_seconds
+        self.memory_reserve_mb = memory_reserve_mb
+        self.max_load_per_core = max_load_per_core
+        self.adjust_interval = adjust_interval
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                lease_id TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                acquired_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS waiters (
+                waiter_id TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                since REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                duration REAL NOT NULL,
+                finished_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('limit', ?)", (self.initial_limit,))
+        conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('adjusted_at', 0)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_state(self, conn: sqlite3.Connection, key: str) -> float:
+        return conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()[0]
+
+    def _set_state(self, conn: sqlite3.Connection, key: str, value: float) -> None:
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _p95(self, conn: sqlite3.Connection) -> Optional[float]:
+        rows = conn.execute(
+            "SELECT duration FROM samples ORDER BY id DESC LIMIT ?", (LATENCY_WINDOW,)
+        ).fetchall()
+        return percentile([row[0] for row in rows], 0.95)
+
+    def _reclaim_stale(self, conn: sqlite3.Connection, now: float) -> None:
+        # Leases and waiters left behind by crashed processes
+        conn.execute("DELETE FROM leases WHERE acquired_at < ?", (now - LEASE_TIMEOUT_SECONDS,))
+        for table in ("leases", "waiters"):
+            for (pid,) in conn.execute(f"SELECT DISTINCT pid FROM {table}").fetchall():
+                if not _pid_alive(pid):
+                    conn.execute(f"DELETE FROM {table} WHERE pid = ?", (pid,))
+
+    def _adjust(self, conn: sqlite3.Connection, in_flight: int, now: float) -> int:
+        """Recompute the limit from memory, CPU load and latency. Runs inside the caller's transaction."""
+        limit = int(self._get_state(conn, "limit"))
+        if now - self._get_state(conn, "adjusted_at") < self.adjust_interval:
+            return limit
+
+        self._reclaim_stale(conn, now)
+        available_mb = read_available_memory_mb()
+        chromium_rss_mb = read_chromium_rss_mb()
+        load = read_load_per_core()
+        p95 = self._p95(conn)
+
+        # How many captures fit in memory: those running plus what the free memory allows
+        memory_cap = None
+        if available_mb is not None:
+            per_capture_mb = DEFAULT_CAPTURE_RSS_MB
+            if chromium_rss_mb and in_flight > 0:
+                per_capture_mb = max(100.0, chromium_rss_mb / in_flight)
+            memory_cap = in_flight + int((available_mb - self.memory_reserve_mb) // per_capture_mb)
+
+        new_limit = limit
+        reasons = []
+        if memory_cap is not None and memory_cap < limit:
+            new_limit = memory_cap
+            reasons.append(f"memory ({available_mb:.0f}MB free)")
+        if load is not None and load > self.max_load_per_core:
+            new_limit = min(new_limit, int(limit * 0.7))
+            reasons.append(f"load {load:.2f}/core")
+        if p95 is not None and p95 > self.target_p95_seconds:
+            new_limit = min(new_limit, int(limit * 0.7))
+            reasons.append(f"p95 {p95:.1f}s")
+
+        if not reasons and in_flight >= limit and (memory_cap is None or memory_cap > limit):
+            # Saturated with headroom everywhere - probe one more slot
+            new_limit = limit + 1
+            reasons.append("headroom")
+
+        new_limit = min(self.max_limit, max(self.min_limit, new_limit))
+        if new_limit != limit:
+            logger.info(f"📐 Screenshot concurrency {limit} -> {new_limit} ({', '.join(reasons)})")
+            self._set_state(conn, "limit", new_limit)
+        self._set_state(conn, "adjusted_at", now)
+
+        # Keep the latency window bounded
+        conn.execute(
+            "DELETE FROM samples WHERE id <= (SELECT MAX(id) FROM samples) - ?", (LATENCY_WINDOW * 4,)
+        )
+        return new_limit
+
+    def try_acquire(self, lease_id: str) -> bool:
+        """Take a slot if one is free under the current limit."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            in_flight = conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+            limit = self._adjust(conn, in_flight, now)
+            acquired = in_flight < limit
+            if acquired:
+                conn.execute(
+                    "INSERT INTO leases (lease_id, pid, acquired_at) VALUES (?, ?, ?)",
+                    (lease_id, os.getpid(), now)
+                )
+                conn.execute("DELETE FROM waiters WHERE waiter_id = ?", (lease_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._update_gauges(conn)
+        return acquired
+
+    def add_waiter(self, lease_id: str) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO waiters (waiter_id, pid, since) VALUES (?, ?, ?)",
+            (lease_id, os.getpid(), time.time())
+        )
+        self._update_gauges(conn)
+
+    def remove_waiter(self, lease_id: str) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM waiters WHERE waiter_id = ?", (lease_id,))
+        self._update_gauges(conn)
+
+    def release(self, lease_id: str, duration: Optional[float] = None) -> None:
+        """Free a slot and record how long the capture took."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE lease_id = ?", (lease_id,))
+            if duration is not None:
+                conn.execute("INSERT INTO samples (duration, finished_at) VALUES (?, ?)", (duration, time.time()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._update_gauges(conn)
+
+    def _update_gauges(self, conn: sqlite3.Connection) -> None:
+        """Publish limit, in-flight captures, queue depth and p95 so scrapes between ``stats()`` calls stay current."""
+        if not PROMETHEUS_AVAILABLE:
+            return
+        LIMIT_GAUGE.set(self._get_state(conn, "limit"))
+        IN_FLIGHT_GAUGE.set(conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0])
+        QUEUE_DEPTH_GAUGE.set(conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0])
+        p95 = self._p95(conn)
+        if p95 is not None:
+            P95_GAUGE.set(p95)
+
+    @asynccontextmanager
+    async def slot(self, poll_interval: float = 0.5) -> AsyncIterator[None]:
+        """
+        Wait for a capture slot and hold it for the duration of the block.
+
+        Args:
+            poll_interval: Base delay between attempts while all slots are taken
+        """
+        lease_id = uuid.uuid4().hex
+        if not await asyncio.to_thread(self.try_acquire, lease_id):
+            await asyncio.to_thread(self.add_waiter, lease_id)
+            try:
+                while not await asyncio.to_thread(self.try_acquire, lease_id):
+                    await asyncio.sleep(poll_interval + random.uniform(0, poll_interval))
+            except BaseException:
+                await asyncio.to_thread(self.remove_waiter, lease_id)
+                raise
+
+        started = time.monotonic()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # Failed captures often end early and would make latency look better than it is
+            duration = None if failed else time.monotonic() - started
+            await asyncio.to_thread(self.release, lease_id, duration)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, in-flight captures, queue depth and host signals."""
+        conn = self._connect()
+        stats = {
+            "limit": int(self._get_state(conn, "limit")),
+            "in_flight": conn.execute("SELECT COUNT(*) FROM leases").fetchone()[0],
+            "queue_depth": conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0],
+            "p95_seconds": self._p95(conn),
+            "available_memory_mb": read_available_memory_mb(),
+            "load_per_core": read_load_per_core(),
+        }
+
+        if PROMETHEUS_AVAILABLE:
+            LIMIT_GAUGE.set(stats["limit"])
+            IN_FLIGHT_GAUGE.set(stats["in_flight"])
+            QUEUE_DEPTH_GAUGE.set(stats["queue_depth"])
+            if stats["p95_seconds"] is not None:
+                P95_GAUGE.set(stats["p95_seconds"])
+        return stats
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_limiter: Optional[CaptureLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_capture_limiter() -> CaptureLimiter:
+    """Return the process-wide handle on the host-wide capture limiter."""
+    global _limiter
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = CaptureLimiter()
+    return _limiter
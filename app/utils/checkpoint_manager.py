@@ -15,6 +15,8 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from pathlib import Path
 
+from app.utils.screenshot_queue import queue_mode_enabled, reconcile_results
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,7 +25,14 @@ class CheckpointManager:
     Manages checkpointing and resume functionality for shipping matrix computation.
     """
     
-    def __init__(self, checkpoint_dir: str = "checkpoints", checkpoint_interval: int = 50, excel_backup: bool = False):
+    def __init__(
+        self,
+        checkpoint_dir: str = "checkpoints",
+        checkpoint_interval: int = 50,
+        excel_backup: bool = False,
+        include_date: bool = False,
+        target_combinations: int = 14280
+    ):
         """
         Initialize checkpoint manager.
         
@@ -31,11 +40,14 @@ class CheckpointManager:
             checkpoint_dir: Directory to store checkpoint files
             checkpoint_interval: Number of results to process before checkpointing
             excel_backup: Whether to save Excel backups alongside CSV
+            include_date: Key combinations on (city_from, city_to, container, date) for date sweeps
+            target_combinations: Unique combinations in the full matrix
         """
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_interval = checkpoint_interval
         self.excel_backup = excel_backup
-        self.checkpoint_dir.mkdir(exist_ok=True)
+        self.include_date = include_date
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
         
         # Checkpoint files
         self.results_file = self.checkpoint_dir / "results.json"
@@ -43,18 +55,33 @@ class CheckpointManager:
         self.completed_pairs_file = self.checkpoint_dir / "completed_pairs.pkl"
         self.metadata_file = self.checkpoint_dir / "metadata.json"
         
-        # In-memory tracking - now supports (city_from, city_to, container) tuples
-        self.completed_pairs: Set[Tuple[str, str, str]] = set()
+        # In-memory tracking - (city_from, city_to, container) tuples, plus the date in sweep mode
+        self.completed_pairs: Set[Tuple[str, ...]] = set()
         self.total_results: List[Dict[str, Any]] = []
         self.last_checkpoint_count = 0
         
-        # Progress tracking for 14,280 unique combinations (85 cities × 84 × 2 containers)
-        self.target_combinations = 14280  # 85 cities × 84 × 2 containers = 14,280 combinations
+        # Progress tracking for 14,280 unique combinations (85 cities × 84 × 2 containers), per date in sweep mode
+        self.target_combinations = target_combinations
         self.last_logged_combination_count = 0
         
         logger.info(f"Checkpoint manager initialized: {self.checkpoint_dir}")
         logger.info(f"Checkpoint interval: {self.checkpoint_interval} results")
-        logger.info(f"🎯 Target: {self.target_combinations} unique city+container combinations")
+        logger.info(f"🎯 Target: {self.target_combinations} unique city+container{'+date' if include_date else ''} combinations")
+    
+    def combination_key(self, result: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+        """
+        Return the completion key of a result, or None if it lacks the fields.
+        
+        Args:
+            result: Result dictionary containing shipping data
+            
+        Returns:
+            (city_from, city_to, container), with the shipping date appended in sweep mode
+        """
+        key = (result.get('city_of_origin'), result.get('city_of_destination'), result.get('container_type'))
+        if self.include_date:
+            key += (result.get('date_of_shipping'),)
+        return key if all(key) else None
     
     def clear_checkpoints(self) -> None:
         """Clear all existing checkpoint files for a fresh start."""
@@ -121,10 +148,24 @@ class CheckpointManager:
                             self.total_results = []
                             logger.info("🆕 Starting fresh due to format change (city+container combinations)")
                             return checkpoint_data
+                        elif len(first_pair) == 3 and self.include_date:
+                            # Single-date checkpoint resumed as a sweep: every result carries its date
+                            self.completed_pairs = {
+                                key for key in map(self.combination_key, self.total_results) if key
+                            }
+                            logger.info(f"🔄 Rebuilt {len(self.completed_pairs)} completed city+container+date keys from results")
                         elif len(first_pair) == 3:
                             # New format: (city_from, city_to, container)
                             self.completed_pairs = loaded_pairs
                             logger.info(f"Loaded {len(self.completed_pairs)} completed pairs")
+                        elif len(first_pair) == 4 and self.include_date:
+                            # Sweep format: (city_from, city_to, container, date)
+                            self.completed_pairs = loaded_pairs
+                            logger.info(f"Loaded {len(self.completed_pairs)} completed city+container+date keys")
+                        elif len(first_pair) == 4:
+                            # Sweep checkpoint resumed for a single date: a combination counts once done on any date
+                            self.completed_pairs = {pair[:3] for pair in loaded_pairs}
+                            logger.info(f"Loaded {len(self.completed_pairs)} completed pairs from a date sweep checkpoint")
                         else:
                             logger.warning(f"Unexpected pair format with {len(first_pair)} elements")
                             self.completed_pairs = set()
@@ -156,7 +197,7 @@ class CheckpointManager:
         
         return checkpoint_data
     
-    def is_pair_completed(self, origin_city: str, destination_city: str, container: str) -> bool:
+    def is_pair_completed(self, origin_city: str, destination_city: str, container: str, date: Optional[str] = None) -> bool:
         """
         Check if a city pair with container has already been processed.
         
@@ -164,11 +205,15 @@ class CheckpointManager:
             origin_city: Origin city name
             destination_city: Destination city name
             container: Container type (e.g., "ST20", "ST40")
+            date: Shipping date (sweep mode only)
             
         Returns:
             True if combination has been completed, False otherwise
         """
-        return (origin_city, destination_city, container) in self.completed_pairs
+        key = (origin_city, destination_city, container)
+        if self.include_date:
+            key += (date,)
+        return key in self.completed_pairs
     
     def add_result(self, result: Dict[str, Any]) -> None:
         """
@@ -180,12 +225,9 @@ class CheckpointManager:
         self.total_results.append(result)
         
         # Mark combination as completed and track progress
-        origin = result.get('city_of_origin')
-        destination = result.get('city_of_destination')
-        container = result.get('container_type')
+        combination = self.combination_key(result)
         
-        if origin and destination and container:
-            combination = (origin, destination, container)
+        if combination:
             if combination not in self.completed_pairs:
                 # New unique combination completed!
                 self.completed_pairs.add(combination)
@@ -237,11 +279,9 @@ class CheckpointManager:
         # Count unique combinations in this batch
         batch_combinations = set()
         for result in batch_results:
-            origin = result.get('city_of_origin')
-            destination = result.get('city_of_destination')
-            container = result.get('container_type')
-            if origin and destination and container:
-                batch_combinations.add((origin, destination, container))
+            combination = self.combination_key(result)
+            if combination:
+                batch_combinations.add(combination)
         
         # Add each result (this will trigger combination progress logging)
         for result in batch_results:
@@ -263,6 +303,12 @@ class CheckpointManager:
             
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
+            # Pick up screenshots finished by the queue workers since the last checkpoint
+            if queue_mode_enabled():
+                patched = reconcile_results(self.total_results)
+                if patched:
+                    logger.info(f"🖼️ Patched {patched} queued screenshot URLs into results")
+            
             # Save results to JSON
             with open(self.results_file, 'w', encoding='utf-8') as f:
                 json.dump(self.total_results, f, indent=2, default=str)
@@ -287,8 +333,8 @@ class CheckpointManager:
                 'last_checkpoint': timestamp,
                 'total_results': len(self.total_results),
                 'completed_pairs': len(self.completed_pairs),
-                'checkpoint_version': '2.0',  # Updated version for container support
-                'format': 'city_container_combinations'
+                'checkpoint_version': '3.0' if self.include_date else '2.0',  # 3.0 adds the shipping date
+                'format': 'city_container_date_combinations' if self.include_date else 'city_container_combinations'
             }
             
             with open(self.metadata_file, 'w', encoding='utf-8') as f:
@@ -314,7 +360,7 @@ class CheckpointManager:
             if not self.total_results:
                 return
             
-            csv_backup_file = f"checkpoints/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            csv_backup_file = str(self.checkpoint_dir / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
             
             # Import here to avoid circular imports
             from app.utils.helpers import save_results_to_csv
@@ -336,7 +382,7 @@ class CheckpointManager:
             # Import here to avoid circular imports
             from app.utils.helpers import save_results_to_excel
             
-            excel_backup_file = f"checkpoints/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            excel_backup_file = str(self.checkpoint_dir / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
             
             # Save Excel with all enhanced features
             save_results_to_excel(self.total_results, excel_backup_file)
@@ -348,12 +394,13 @@ class CheckpointManager:
         except Exception as e:
             logger.error(f"Error saving Excel backup: {e}")
     
-    def get_remaining_pairs(self, all_city_container_pairs: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    def get_remaining_pairs(self, all_city_container_pairs: List[Tuple[str, ...]]) -> List[Tuple[str, ...]]:
         """
         Get list of city+container combinations that haven't been processed yet.
         
         Args:
             all_city_container_pairs: Complete list of city+container combinations to process
+                (with the date as fourth element in sweep mode); order is preserved
             
         Returns:
             List of remaining city+container combinations to process
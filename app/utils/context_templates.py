@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Warm Context Templates for Screenshot Capture
+
+Everything a screenshot context needs before its first page opens - session
+cookies, the fingerprint init script and request blocking - is prepared once
+per provider host and process instead of on every capture. Cloning a template
+is a single ``new_context(storage_state=...)`` plus one ``add_init_script``.
+
+With ``SCREENSHOT_CONTEXT_REUSE=1`` the browser pool also keeps one warm
+context per host and browser, so consecutive captures of the same provider
+share its HTTP cache, DNS lookups and keep-alive connections. ``context.route``
+turns Chromium's HTTP cache off, so warm contexts block trackers, fonts and
+media per page through ``Network.setBlockedURLs`` instead.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from app.utils.resource_blocking import apply_resource_blocking, apply_resource_blocking_cdp
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_REUSE = os.getenv("SCREENSHOT_CONTEXT_REUSE", "0") == "1"
+
+
+def template_cookies(cookie_str: str, url: str) -> List[Dict[str, Any]]:
+    """Turn a ``name=value; ...`` cookie header into storage-state cookies for ``url``'s host."""
+    parts = urlsplit(url)
+    cookies = []
+    for part in cookie_str.split(";"):
+        if "=" in part:
+            name, value = part.strip().split("=", 1)
+            cookies.append({
+                "name": name,
+                "value": value,
+                "domain": parts.netloc,
+                "path": "/",
+                "expires": -1,
+                "httpOnly": False,
+                "secure": parts.scheme == "https",
+                "sameSite": "Lax",
+            })
+    return cookies
+
+
+class ContextTemplate:
+    """Prepared state cloned into every context opened against one host."""
+
+    def __init__(self, host: str, url: str, cookies: List[Dict[str, Any]], init_script: str, reuse: bool = CONTEXT_REUSE):
+        """
+        Initialize the template.
+
+        Args:
+            host: Host the template is built for (also the warm context key)
+            url: A page on ``host``, used to pick the request blocking profile
+            cookies: Storage-state cookies set on every clone
+            init_script: Script installed once per context, before any page script
+            reuse: Keep one warm context per browser for this host
+        """
+        self.host = host
+        self.url = url
+        self.storage_state = {"cookies": cookies, "origins": []}
+        self.init_script = init_script
+        self.reuse = reuse
+        self.clones = 0
+
+    @property
+    def warm_key(self) -> Optional[str]:
+        """Browser pool key of the warm context, or None when contexts are not reused."""
+        return self.host if self.reuse else None
+
+    def context_options(self, context_options: Dict[str, Any]) -> Dict[str, Any]:
+        """Return ``new_context`` keyword arguments with the template's storage state added."""
+        return {**context_options, "storage_state": self.storage_state}
+
+    async def prepare_context(self, context) -> None:
+        """Install the init script and, for throwaway contexts, the request blocking route."""
+        self.clones += 1
+        if self.init_script:
+            await context.add_init_script(self.init_script)
+        if not self.reuse:
+            # Drop trackers, media and fonts the screenshot doesn't need
+            await apply_resource_blocking(context, self.url)
+
+    async def prepare_page(self, page) -> None:
+        """Per-page setup; warm contexts block requests here so their HTTP cache stays on."""
+        if self.reuse:
+            await apply_resource_blocking_cdp(page, self.url)
+
+
+_templates: Dict[str, ContextTemplate] = {}
+
+
+def get_context_template(url: str, cookie_str: str, init_script: str) -> ContextTemplate:
+    """
+    Return the template for ``url``'s host, building it on first use in this process.
+
+    Args:
+        url: Page about to be captured
+        cookie_str: Session cookie header applied to the host
+        init_script: Script installed in every context of the host
+
+    Returns:
+        The host's ContextTemplate
+    """
+    host = urlsplit(url).netloc
+    template = _templates.get(host)
+    if template is None:
+        template = ContextTemplate(host, url, template_cookies(cookie_str, url), init_script)
+        _templates[host] = template
+        logger.debug(
+            f"Built context template for {host}: {len(template.storage_state['cookies'])} cookies, "
+            f"reuse={'on' if template.reuse else 'off'}"
+        )
+    return template
@@ -2,15 +2,16 @@ import asyncio
 import aiohttp
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable, Awaitable
 import random
 import json
 import csv
 import os
 import re
+import sqlite3
+import time
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor
-import math
+from functools import partial
 try:
     from openpyxl import Workbook
     from openpyxl.styles import Font, Alignment
@@ -24,7 +25,19 @@ from app.utils.model import SearatesRequestPayload, SearatesResponsePayload, Fre
 from app.utils.city_point_dict import CITIES_TO_POINT_ID_MAP
 from app.utils.freightos_locations import FREIGHTOS_LOCATIONS
 from app.utils.checkpoint_manager import CheckpointManager
-from app.tasks import _go
+from app.utils.http_session import get_http_session, get_named_http_session, make_http_session
+from app.utils.poll_scheduler import PollScheduler
+from app.utils.stage_pipeline import StagedPipeline
+from app.utils.http_retry import check_status, request_with_retry, retry_stats
+from app.utils.rate_limiter import configure_rate_limits, rate_limiter_stats
+from app.utils.response_cache import get_response_cache
+from app.utils.result_log import ResultLog
+from app.utils.route_health import get_route_health
+from app.utils.searates_decoder import decode_response, loads, rates_response
+from app.utils.sharding import sample_keys, shard_combinations
+from app.utils.work_queue import WORK_LANES_PER_WORKER, WORK_UNIT_SIZE, make_units, run_work_queue, worker_count
+from app.tasks import _go, run_with_screenshot_resources
+from app.utils.screenshot_queue import enqueue_screenshot, queue_mode_enabled, reconcile_results
 
 # Configure logging
 logging.basicConfig(
@@ -38,6 +51,15 @@ logging.basicConfig(
 
 BEARER_TOKEN = os.getenv("SEARATES_BEARER_TOKEN")
 SEARATES_API_URL = "https://rates.searates.com/graphql"
+# Combinations handled concurrently inside one Searates batch
+SEARATES_MAX_IN_FLIGHT = int(os.getenv("SEARATES_MAX_IN_FLIGHT", "8"))
+# Combinations in flight for the single-process asyncio engine
+SEARATES_ASYNC_MAX_IN_FLIGHT = int(os.getenv("SEARATES_ASYNC_MAX_IN_FLIGHT", "64"))
+# Rate queries packed into one aliased GraphQL POST by concurrent callers (1 = no batching)
+SEARATES_BATCH_SIZE = int(os.getenv("SEARATES_BATCH_SIZE", "4"))
+# Consecutive failed batched calls before batching pauses, and for how many seconds
+SEARATES_BATCH_MAX_FAILURES = int(os.getenv("SEARATES_BATCH_MAX_FAILURES", "3"))
+SEARATES_BATCH_COOLDOWN = float(os.getenv("SEARATES_BATCH_COOLDOWN", "300"))
 
 logger = logging.getLogger(__name__)
 
@@ -74,11 +96,71 @@ SHIPPING_DATES = [
 CONTAINERS = ["ST20", "ST40"]
 
 
+def sweep_date_passes(dates: List[str]) -> List[List[str]]:
+    """
+    Order shipping dates coarse to fine for a date sweep.
 
-def build_searates_payload(payload: SearatesRequestPayload):
-    query = f"""
-    {{
-      rates(
+    The first pass takes dates a large power-of-two stride apart; every later
+    pass halves the stride and adds the dates in between, so an interrupted
+    sweep still covers every route at an even (if coarse) date spacing.
+    For 25 dates the passes hold 2, 2, 3, 6 and 12 dates.
+
+    Args:
+        dates: Shipping dates in YYYY-MM-DD format
+
+    Returns:
+        One list of dates per pass, coarsest first
+    """
+    dates = sorted(set(dates))
+    stride = 1
+    while stride * 2 < len(dates):
+        stride *= 2
+
+    passes, seen = [], set()
+    while stride >= 1:
+        level = [i for i in range(0, len(dates), stride) if i not in seen]
+        seen.update(level)
+        if level:
+            passes.append([dates[i] for i in level])
+        stride //= 2
+    return passes
+
+
+def build_matrix_combinations(cities: List[str], dates: Optional[List[str]] = None) -> List[tuple]:
+    """
+    Build the job space of the shipping matrix.
+
+    Args:
+        cities: Cities to pair up (same-city pairs are skipped)
+        dates: Date sweep; None for the single-date matrix
+
+    Returns:
+        (origin, destination, container) tuples, or with ``dates``
+        (origin, destination, container, date) tuples ordered pass by pass
+        (see ``sweep_date_passes``), then by date, route and container
+    """
+    routes = [
+        (origin_city, destination_city, container)
+        for origin_city in cities
+        for destination_city in cities
+        if origin_city != destination_city
+        for container in CONTAINERS
+    ]
+    if not dates:
+        return routes
+    return [
+        route + (date,)
+        for date_pass in sweep_date_passes(dates)
+        for date in date_pass
+        for route in routes
+    ]
+
+
+
+def _searates_rates_field(payload: SearatesRequestPayload, alias: str = "") -> str:
+    """Return one ``rates(...)`` selection, optionally prefixed with a GraphQL alias (``"r0: "``)."""
+    return f"""
+      {alias}rates(
         includedServices: d2d,
         portFromFees: true,
         portToFees: true,
@@ -178,6 +260,13 @@ def build_searates_payload(payload: SearatesRequestPayload):
           request_key
         }}
       }}
+    """
+
+
+def build_searates_payload(payload: SearatesRequestPayload):
+    query = f"""
+    {{
+      {_searates_rates_field(payload).strip()}
     }}
     """
 
@@ -185,15 +274,111 @@ def build_searates_payload(payload: SearatesRequestPayload):
     return payload
 
 
-async def make_request(url: str, payload: SearatesRequestPayload) -> SearatesResponsePayload:
-    async with aiohttp.ClientSession() as session:
-        try:
-            request_payload = build_searates_payload(payload)
-            async with session.request("POST", url, headers={"Authorization": BEARER_TOKEN}, json=request_payload) as response:
-                return SearatesResponsePayload(**await response.json())
-        except Exception as e:
-            print(e)
-            return None
+def build_searates_batch_payload(payloads: List[SearatesRequestPayload]) -> Dict[str, Any]:
+    """
+    Pack several rate queries into one GraphQL document.
+
+    Each query becomes an aliased ``rates`` field (``r0``, ``r1``, ...) so the
+    response can be split back per combination.
+    """
+    fields = "\n".join(
+        _searates_rates_field(payload, alias=f"r{i}: ").strip() for i, payload in enumerate(payloads)
+    )
+    return {"query": f"{{\n{fields}\n}}"}
+
+
+async def lookup_cached_rates(payload: SearatesRequestPayload) -> Optional[SearatesResponsePayload]:
+    """Return the cached response for ``payload`` (see app/utils/response_cache.py), if any."""
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    rates = await asyncio.to_thread(cache.lookup, build_searates_payload(payload)["query"])
+    if rates is None:
+        return None
+    return rates_response(rates)
+
+
+async def store_cached_rates(payload: SearatesRequestPayload, body: Any) -> None:
+    """Cache the raw ``rates`` list of a successful response body for ``payload``."""
+    cache = get_response_cache()
+    if cache is None or not isinstance(body, dict) or body.get("errors"):
+        return
+    rates = (body.get("data") or {}).get("rates")
+    if isinstance(rates, list):
+        await asyncio.to_thread(cache.store, build_searates_payload(payload)["query"], rates)
+
+
+async def record_route_outcome(origin_city: str, destination_city: str, container: str, outcome: str) -> None:
+    """Record a success/empty/error outcome in the route health store (see app/utils/route_health.py)."""
+    store = get_route_health()
+    if store is None:
+        return
+    try:
+        await asyncio.to_thread(store.record, origin_city, destination_city, container, outcome)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record route health for {origin_city} -> {destination_city} ({container}): {e}")
+
+
+def schedule_by_route_health(combinations: List[tuple]) -> List[tuple]:
+    """
+    Put chronically empty routes last and drop the ones not due for a re-probe.
+
+    Args:
+        combinations: (origin, destination, container[, date]) tuples still to process
+
+    Returns:
+        The combinations to process in this run
+    """
+    store = get_route_health()
+    if store is None:
+        return combinations
+    scheduled, deferred = store.plan(combinations)
+    if deferred:
+        routes = len({combination[:3] for combination in deferred})
+        logger.info(f"🩺 Route health: deferring {len(deferred)} combinations on {routes} chronically empty routes (use --force-all to include them)")
+    logger.info(f"🩺 Route health: {len(scheduled)} combinations scheduled, {store.summary()['chronically_empty']} chronically empty routes on record")
+    return scheduled
+
+
+async def make_request(
+    url: str,
+    payload: SearatesRequestPayload,
+    read_cache: bool = True,
+    max_attempts: Optional[int] = None,
+    base_delay: Optional[float] = None
+) -> SearatesResponsePayload:
+    """
+    Fetch one rate query, retrying transient failures (see app/utils/http_retry.py).
+
+    Raises:
+        Exception: When the request fails for good - a fatal error, retries or
+            the host's retry budget used up, or a rejected query
+    """
+    if read_cache:
+        cached = await lookup_cached_rates(payload)
+        if cached is not None:
+            return cached
+
+    # Process-wide pooled session: connections, DNS and TLS sessions are reused across requests
+    session = get_http_session()
+    request_payload = build_searates_payload(payload)
+
+    async def send() -> Any:
+        async with session.request("POST", url, headers={"Authorization": BEARER_TOKEN}, json=request_payload) as response:
+            # 429s and 5xx are retried instead of being parsed as a payload without rates
+            check_status(url, response.status, response.headers)
+            raw = await response.read()
+        body = loads(raw)
+        if isinstance(body, dict) and body.get("errors") and not body.get("data"):
+            raise ValueError(f"Searates query rejected: {body['errors']}")
+        return body
+
+    # Every attempt waits for the per-host token bucket
+    body = await request_with_retry(url, send, max_attempts=max_attempts, base_delay=base_delay)
+    # Only the fields create_result_entry reads are decoded (see app/utils/searates_decoder.py)
+    result = decode_response(body)
+    await store_cached_rates(payload, body)
+    return result
 
 
 async def compute_shipping_matrix(
@@ -259,14 +444,18 @@ async def compute_shipping_matrix(
                         website_link = f"https://www.searates.com/logistics-explorer/?id={shipment_id}"
                         
                         logger.info(f"Taking screenshot for shipment {shipment_id}")
-                        screenshot_result = await _go(website_link)
-                        
-                        if isinstance(screenshot_result, str):
-                            screenshot_url = screenshot_result
-                        elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
-                            screenshot_url = screenshot_result
+                        if queue_mode_enabled():
+                            # Captured later by screenshot_worker.py and patched in on reconcile
+                            await enqueue_screenshot(website_link, website_link)
                         else:
-                            logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
+                            screenshot_result = await _go(website_link)
+                        
+                            if isinstance(screenshot_result, str):
+                                screenshot_url = screenshot_result
+                            elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
+                                screenshot_url = screenshot_result
+                            else:
+                                logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
                             
                     except Exception as screenshot_error:
                         logger.error(f"Screenshot error for {origin_city} -> {destination_city}: {screenshot_error}")
@@ -307,7 +496,8 @@ async def make_request_with_retry(
     url: str, 
     payload: SearatesRequestPayload, 
     max_retries: int = 3,
-    retry_delay: float = 2.0
+    retry_delay: float = 2.0,
+    read_cache: bool = True
 ) -> Optional[SearatesResponsePayload]:
     """
     Make API request with retry logic and exponential backoff.
@@ -317,26 +507,206 @@ async def make_request_with_retry(
         payload: Request payload
         max_retries: Maximum number of retry attempts
         retry_delay: Base delay between retries
+        read_cache: Answer from the response cache when possible
         
     Returns:
-        API response or None if all retries failed
+        API response or None if the request failed for good
+    """
+    try:
+        return await make_request(
+            url, payload, read_cache=read_cache, max_attempts=max_retries + 1, base_delay=retry_delay
+        )
+    except Exception as e:
+        logger.error(f"API request failed: {e}")
+        return None
+
+async def make_batch_request(
+    url: str,
+    payloads: List[SearatesRequestPayload]
+) -> List[Optional[SearatesResponsePayload]]:
+    """
+    Fetch several rate queries in one aliased GraphQL POST.
+
+    Returns:
+        One entry per payload, in order: the combination's response, or None
+        when its alias is missing from ``data`` or named in an error path. A
+        null alias is an answer (no rates), as it is for a single query
+
+    Raises:
+        Exception: When the POST itself fails or the body is not a GraphQL response
+    """
+    session = get_http_session()
+    request_payload = build_searates_batch_payload(payloads)
+
+    async def send() -> Any:
+        async with session.request("POST", url, headers={"Authorization": BEARER_TOKEN}, json=request_payload) as response:
+            check_status(url, response.status, response.headers)
+            return loads(await response.read())
+
+    body = await request_with_retry(url, send)
+
+    data = body.get("data") or {}
+    failed_aliases = {
+        str(error["path"][0])
+        for error in body.get("errors") or []
+        if isinstance(error, dict) and error.get("path")
+    }
+    if body.get("errors") and not failed_aliases and not data:
+        raise ValueError(f"Batched query rejected: {body['errors']}")
+
+    responses = []
+    for i, payload in enumerate(payloads):
+        alias = f"r{i}"
+        if alias in failed_aliases or alias not in data:
+            responses.append(None)
+        else:
+            rates = data[alias]
+            responses.append(rates_response(rates))
+            await store_cached_rates(payload, {"data": {"rates": rates}})
+    return responses
+
+
+# Consecutive batched calls that failed outright, and when paused batching may be tried again
+_batch_failures = 0
+_batch_paused_until = 0.0
+
+
+async def make_batch_request_with_retry(
+    url: str,
+    payloads: List[SearatesRequestPayload]
+) -> List[Optional[SearatesResponsePayload]]:
+    """
+    Batched request that falls back to single queries for whatever it could not answer.
+
+    Combinations whose alias failed, or all of them when the batched call
+    fails outright, are re-fetched one by one with ``make_request_with_retry``.
+
+    After SEARATES_BATCH_MAX_FAILURES batched calls in a row failed outright,
+    single queries are used for SEARATES_BATCH_COOLDOWN seconds. Then one
+    batched call is tried again: a success resumes batching, a failure
+    pauses it for another cooldown.
     """
-    for attempt in range(max_retries + 1):
+    global _batch_failures, _batch_paused_until
+
+    responses: List[Optional[SearatesResponsePayload]] = [None] * len(payloads)
+    if len(payloads) > 1 and time.monotonic() >= _batch_paused_until:
         try:
-            response = await make_request(url, payload)
-            if response:
-                return response
-                
+            responses = await make_batch_request(url, payloads)
+            if _batch_failures >= SEARATES_BATCH_MAX_FAILURES:
+                logger.info("Batched Searates queries work again - batching resumed")
+            _batch_failures = 0
         except Exception as e:
-            if attempt == max_retries:
-                logger.error(f"API request failed after {max_retries} retries: {e}")
-                return None
-            
-            delay = retry_delay * (2 ** attempt) + random.uniform(0, 1)
-            logger.warning(f"API request attempt {attempt + 1} failed, retrying in {delay:.2f}s: {e}")
-            await asyncio.sleep(delay)
-    
-    return None
+            _batch_failures += 1
+            logger.warning(f"Batched Searates query of {len(payloads)} failed, falling back to single queries: {e}")
+            if _batch_failures >= SEARATES_BATCH_MAX_FAILURES:
+                _batch_paused_until = time.monotonic() + SEARATES_BATCH_COOLDOWN
+                logger.warning(f"Batched Searates queries keep failing - using single queries for {SEARATES_BATCH_COOLDOWN:.0f}s")
+
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if missing and len(missing) < len(payloads):
+        logger.info(f"Batched Searates query: {len(missing)}/{len(payloads)} combinations re-fetched individually")
+    if missing:
+        # Callers looked these up in the cache already
+        singles = await asyncio.gather(
+            *(make_request_with_retry(url, payloads[i], read_cache=False) for i in missing)
+        )
+        for i, response in zip(missing, singles):
+            responses[i] = response
+    return responses
+
+
+class SearatesBatcher:
+    """
+    Coalesces concurrent rate lookups into aliased batch queries.
+
+    Callers await ``fetch(payload)`` as if it were a single request. Lookups
+    arriving within ``window`` seconds of each other are sent together, up
+    to ``batch_size`` per POST.
+    """
+
+    def __init__(self, url: str, batch_size: int, window: float = 0.05):
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set = set()
+
+        # Stats
+        self.lookups = 0
+        self.posts = 0
+
+    async def fetch(self, payload: SearatesRequestPayload) -> Optional[SearatesResponsePayload]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+        self.lookups += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[tuple]) -> None:
+        self.posts += 1
+        try:
+            responses = await make_batch_request_with_retry(self.url, [payload for payload, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batch_size": self.batch_size, "lookups": self.lookups, "posts": self.posts}
+
+
+_batcher: Optional[SearatesBatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_searates_batcher(url: str = SEARATES_API_URL) -> SearatesBatcher:
+    """Return the batcher for the running event loop, creating it if needed."""
+    global _batcher, _batcher_loop
+
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop or _batcher.url != url:
+        _batcher = SearatesBatcher(url, SEARATES_BATCH_SIZE)
+        _batcher_loop = loop
+    return _batcher
+
+
+async def fetch_searates_rates(
+    url: str,
+    payload: SearatesRequestPayload
+) -> Tuple[Optional[SearatesResponsePayload], bool]:
+    """
+    Rate lookup for concurrent callers: batched when SEARATES_BATCH_SIZE > 1, else a single query.
+
+    Returns:
+        (response, or None if the request failed for good; whether the
+        response was replayed from the response cache)
+    """
+    # Cache hits skip the batching window
+    cached = await lookup_cached_rates(payload)
+    if cached is not None:
+        return cached, True
+    if SEARATES_BATCH_SIZE > 1:
+        return await get_searates_batcher(url).fetch(payload), False
+    return await make_request_with_retry(url, payload, read_cache=False), False
+
 
 city_country_map = {
     "HO CHI MINH": "VN",
@@ -365,17 +735,46 @@ city_country_map = {
 
 
 
+def screenshot_fields(screenshot) -> Dict[str, Any]:
+    """
+    Return the screenshot fields of a result entry.
+
+    Args:
+        screenshot: Record returned by ``_go``, a plain screenshot URL or None
+
+    Returns:
+        ``screenshot_url``, ``thumbnail_url``, ``screenshot_bytes`` and
+        ``thumbnail_bytes``; fields the capture didn't provide are None
+    """
+    fields = {"screenshot_url": None, "thumbnail_url": None, "screenshot_bytes": None, "thumbnail_bytes": None}
+    if not screenshot:
+        return fields
+
+    if hasattr(screenshot, 'get'):
+        # Capture record - extract just the S3 URLs and sizes
+        fields["screenshot_url"] = screenshot.get('screenshot_url') or screenshot.get('url')
+        for field in ("thumbnail_url", "screenshot_bytes", "thumbnail_bytes"):
+            fields[field] = screenshot.get(field)
+    else:
+        fields["screenshot_url"] = str(screenshot)
+    return fields
+
+
 def create_result_entry(
     origin_city: str,
     destination_city: str,
     rate,
     date: str,
     container: str,
-    screenshot_url: Optional[str],
+    screenshot_url: Union[str, Dict[str, Any], None],
     website_link: Optional[str],
     is_expired: bool = False,
 ) -> Dict[str, Any]:
-    """Create a structured result entry from API rate data."""
+    """Create a structured result entry from API rate data.
+
+    ``screenshot_url`` may be the record returned by ``_go``; its thumbnail
+    and byte sizes are kept next to the screenshot URL.
+    """
     
     # Get origin and destination location data
     origin_location = None
@@ -395,24 +794,6 @@ def create_result_entry(
                 carrier = point.provider
                 break
     
-    # Clean screenshot_url - extract just the S3 URL if it's a dict/object
-    clean_screenshot_url = None
-    if screenshot_url:
-        if isinstance(screenshot_url, dict):
-            # Extract screenshot_url from dict if it exists
-            clean_screenshot_url = screenshot_url.get('screenshot_url') or screenshot_url.get('url')
-        elif isinstance(screenshot_url, str):
-            clean_screenshot_url = screenshot_url
-        else:
-            # Handle other object types by trying to extract screenshot_url
-            try:
-                if hasattr(screenshot_url, 'get'):
-                    clean_screenshot_url = screenshot_url.get('screenshot_url') or screenshot_url.get('url')
-                else:
-                    clean_screenshot_url = str(screenshot_url)
-            except:
-                clean_screenshot_url = str(screenshot_url) if screenshot_url else None
-    
     return {
         "city_of_origin": origin_city,
         "country_of_origin": origin_location.country if origin_location else city_country_map.get(origin_city, "Unknown"),
@@ -426,7 +807,7 @@ def create_result_entry(
         "provider": "Searates",
         "datetime_of_scraping": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "carrier": carrier,
-        "screenshot_url": clean_screenshot_url,
+        **screenshot_fields(screenshot_url),
         "website_link": website_link,
         "shipment_id": rate.general.shipmentId,
         "rate_id": rate.points[0].rateId if rate.points else None,
@@ -446,11 +827,11 @@ def create_empty_result(
     destination_city: str, 
     date: str, 
     container: str,
-    screenshot_url: Optional[str],
+    screenshot_url: Union[str, Dict[str, Any], None],
     website_link: Optional[str],
     is_expired: bool = False,
 ) -> Dict[str, Any]:
-    """Create an empty result entry when no rates are found."""
+    """Create an empty result entry when no rates are found (see ``create_result_entry`` for ``screenshot_url``)."""
     return {
         "city_of_origin": origin_city,
         "country_of_origin": city_country_map.get(origin_city, "Unknown"),
@@ -464,7 +845,7 @@ def create_empty_result(
         "provider": "Searates",
         "datetime_of_scraping": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "carrier": None,
-        "screenshot_url": screenshot_url,
+        **screenshot_fields(screenshot_url),
         "website_link": website_link,
         "shipment_id": None,
         "rate_id": None,
@@ -487,7 +868,7 @@ def create_error_result(
     error_message: str
 ) -> Dict[str, Any]:
     """Create an error result entry when processing fails."""
-    result = create_empty_result(origin_city, destination_city, date, container)
+    result = create_empty_result(origin_city, destination_city, date, container, None, None)
     result["error"] = error_message
     return result
 
@@ -833,7 +1214,9 @@ def process_city_batch(batch_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     logger.info(f"Processing batch {batch_id} with {len(city_pairs)} city pairs")
     
     # Run the async computation for this batch
-    return asyncio.run(compute_batch_async(city_pairs, date, container, delay_range, batch_id))
+    return asyncio.run(run_with_screenshot_resources(
+        compute_batch_async(city_pairs, date, container, delay_range, batch_id)
+    ))
 
 
 def format_city(city: str, capitalize: bool = False, hyphenate: bool = True) -> str:
@@ -899,14 +1282,18 @@ async def compute_batch_async(
                         website_link = f"https://www.searates.com/logistics-explorer/?id={shipment_id}"
                         
                         logger.debug(f"Taking screenshot for shipment {shipment_id}")
-                        screenshot_result = await _go(website_link)
-                        
-                        if isinstance(screenshot_result, str):
-                            screenshot_url = screenshot_result
-                        elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
-                            screenshot_url = screenshot_result
+                        if queue_mode_enabled():
+                            # Captured later by screenshot_worker.py and patched in on reconcile
+                            await enqueue_screenshot(website_link, website_link)
                         else:
-                            logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
+                            screenshot_result = await _go(website_link)
+                        
+                            if isinstance(screenshot_result, str):
+                                screenshot_url = screenshot_result
+                            elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
+                                screenshot_url = screenshot_result
+                            else:
+                                logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
                             
                     except Exception as screenshot_error:
                         logger.error(f"Screenshot error for {origin_city} -> {destination_city}: {screenshot_error}")
@@ -952,11 +1339,15 @@ async def compute_batch_async(
                 
                 screenshot_url = None
                 try:
-                    screenshot_result = await _go(fallback_website_link)
-                    if isinstance(screenshot_result, str):
-                        screenshot_url = screenshot_result
-                    elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
-                        screenshot_url = screenshot_result.get("screenshot_url") or screenshot_result
+                    if queue_mode_enabled():
+                        # Captured later by screenshot_worker.py and patched in on reconcile
+                        await enqueue_screenshot(fallback_website_link, fallback_website_link)
+                    else:
+                        screenshot_result = await _go(fallback_website_link)
+                        if isinstance(screenshot_result, str):
+                            screenshot_url = screenshot_result
+                        elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
+                            screenshot_url = screenshot_result
                 except Exception as screenshot_error:
                     logger.error(f"Screenshot error for fallback page {fallback_website_link}: {screenshot_error}")
 
@@ -998,7 +1389,10 @@ async def compute_shipping_matrix_parallel(
     city_percentage: float = 0.03,
     checkpoint_interval: int = 50,
     resume: bool = True,
-    checkpoint_dir: str = "checkpoints"
+    checkpoint_dir: str = "checkpoints",
+    dates: Optional[List[str]] = None,
+    seed: Optional[int] = None,
+    shard: Optional[tuple] = None
 ) -> List[Dict[str, Any]]:
     """
     Compute shipping matrix using multiprocessing with checkpointing for fault tolerance.
@@ -1006,12 +1400,15 @@ async def compute_shipping_matrix_parallel(
     Args:
         date: Shipping date in YYYY-MM-DD format
         container: Container type (e.g., "ST20")
-        delay_range: Tuple of (min, max) seconds for random delays
+        delay_range: Unused; kept for callers that still pass it
         num_processes: Number of processes to use (default: CPU count)
         city_percentage: Percentage of cities to process (default: 0.03 = 3%)
         checkpoint_interval: Number of results to process before checkpointing
         resume: Whether to resume from existing checkpoint
         checkpoint_dir: Directory to store checkpoint files
+        dates: Sweep these shipping dates as one job space instead of a single date
+        seed: Seed for the city sample (required for consistent shards across hosts)
+        shard: (index, count) - process only this shard of the combinations
         
     Returns:
         List of dictionaries containing shipping data for each combination
@@ -1022,7 +1419,9 @@ async def compute_shipping_matrix_parallel(
     # Initialize checkpoint manager
     checkpoint_manager = CheckpointManager(
         checkpoint_dir=checkpoint_dir,
-        checkpoint_interval=checkpoint_interval
+        checkpoint_interval=checkpoint_interval,
+        include_date=bool(dates),
+        target_combinations=14280 * len(set(dates)) if dates else 14280
     )
     
     logger.info(f"Starting PARALLEL matrix computation using {num_processes} processes")
@@ -1040,23 +1439,23 @@ async def compute_shipping_matrix_parallel(
     
     # Get city combinations
     all_cities = list(CITIES_TO_POINT_ID_MAP.keys())
-    cities_count = int(len(all_cities) * city_percentage)
-    cities = random.sample(all_cities, cities_count)
+    # Seeded sampling picks the same cities on every host of a sharded run
+    cities = sample_keys(all_cities, city_percentage, seed)
     
-    # Generate all city+container combinations (exclude same city combinations)
-    all_city_container_combinations = []
-    for origin_city in cities:
-        for destination_city in cities:
-            if origin_city != destination_city:
-                for container in CONTAINERS:  # ["ST20", "ST40"]
-                    all_city_container_combinations.append((origin_city, destination_city, container))
+    # Generate all city+container(+date) combinations (exclude same city combinations),
+    # keeping this host's shard
+    all_city_container_combinations = shard_combinations(build_matrix_combinations(cities, dates), shard)
     
     logger.info(f"📊 COMBINATION SETUP:")
     logger.info(f"   Total cities available: {len(all_cities)}")
     logger.info(f"   Cities to process: {len(cities)} ({city_percentage*100:.1f}%)")
     logger.info(f"   Container types: {CONTAINERS}")
+    if dates:
+        logger.info(f"   Date sweep: {len(set(dates))} dates, coarse to fine: {sweep_date_passes(dates)}")
+    if shard:
+        logger.info(f"   Shard: {shard[0]}/{shard[1]} (seed {seed})")
     logger.info(f"   Expected combinations: {len(all_city_container_combinations)}")
-    logger.info(f"   Target for completion: 14,280 combinations (85 cities × 84 × 2 containers)")
+    logger.info(f"   Target for completion: {checkpoint_manager.target_combinations:,} combinations (85 cities × 84 × 2 containers{' × dates' if dates else ''})")
     
     # Get remaining combinations to process (skip completed ones if resuming)
     if resume and checkpoint_data.get('has_checkpoint'):
@@ -1077,46 +1476,45 @@ async def compute_shipping_matrix_parallel(
         logger.info(f"🎉 FINAL STATS: {progress['completed_combinations']}/{progress['target_combinations']} combinations completed!")
         return checkpoint_manager.total_results
     
-    batch_size = max(1, math.ceil(len(remaining_combinations) / num_processes))
-    batches = []
+    # Chronically empty routes go last or wait for their re-probe (--force-all schedules everything)
+    remaining_combinations = schedule_by_route_health(remaining_combinations)
+    if not remaining_combinations:
+        logger.info("⏭️ Only deferred empty routes remain - nothing to probe in this run")
+        return checkpoint_manager.total_results
     
-    for i in range(0, len(remaining_combinations), batch_size):
-        selected_date = "2025-09-01"
-        
-        batch_combinations = remaining_combinations[i:i + batch_size]
-        batch_data = {
-            'city_container_combinations': batch_combinations,
-            'date': selected_date,
-            'delay_range': delay_range,
-            'batch_id': len(batches) + 1
-        }
-        batches.append(batch_data)
+    # Small units on a shared queue: workers that finish early take over the tail
+    # instead of waiting on one fixed slice full of slow routes
+    selected_date = "2025-09-01"
+    units = make_units(remaining_combinations, WORK_UNIT_SIZE)
+    # Enough lanes to keep SEARATES_MAX_IN_FLIGHT combinations busy per worker
+    lanes = max(WORK_LANES_PER_WORKER, SEARATES_MAX_IN_FLIGHT // WORK_UNIT_SIZE)
+    
+    logger.info(f"Split work into {len(units)} units of up to {WORK_UNIT_SIZE} combinations ({lanes} per worker in flight)")
     
-    logger.info(f"Split work into {len(batches)} batches (avg {batch_size} combinations per batch)")
+    # Every worker process gets an equal share of the Searates request budget;
+    # small or resumed runs start fewer workers than requested
+    configure_rate_limits(share=1 / worker_count(num_processes, len(units)))
+    
+    units_done = 0
+    
+    def commit_unit(unit: List[tuple], unit_results: List[Dict[str, Any]]) -> None:
+        nonlocal units_done
+        # Streamed back as units finish; add_result checkpoints every checkpoint_interval results
+        for result in unit_results:
+            checkpoint_manager.add_result(result)
+        units_done += 1
+        if units_done % 25 == 0 or units_done == len(units):
+            logger.info(f"✅ Completed {units_done}/{len(units)} units, total results: {len(checkpoint_manager.total_results)}")
     
-    # Process batches in parallel using ProcessPoolExecutor
     try:
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            logger.info("Starting parallel processing...")
-            
-            # Submit all batches for processing
-            future_to_batch = {executor.submit(process_city_container_batch, batch): batch for batch in batches}
-            
-            # Collect results as they complete
-            for future in future_to_batch:
-                try:
-                    batch_results = future.result()
-                    batch_id = future_to_batch[future]['batch_id']
-                    
-                    # Add results to checkpoint manager (with automatic checkpointing)
-                    checkpoint_manager.add_batch_results(batch_results, batch_id)
-                    
-                    logger.info(f"✅ Completed batch {batch_id}, total results: {len(checkpoint_manager.total_results)}")
-                    
-                except Exception as e:
-                    batch_id = future_to_batch[future]['batch_id']
-                    logger.error(f"❌ Batch {batch_id} failed: {e}")
-                    # Continue processing other batches even if one fails
+        logger.info("Starting parallel processing...")
+        await run_work_queue(
+            units,
+            partial(process_city_container_unit, date=selected_date),
+            num_processes,
+            commit_unit,
+            lanes=lanes
+        )
     
     except KeyboardInterrupt:
         logger.info("🛑 Process interrupted by user - saving checkpoint...")
@@ -1153,6 +1551,24 @@ async def compute_shipping_matrix_parallel(
     return checkpoint_manager.total_results
 
 
+async def process_city_container_unit(city_container_combinations: List[tuple], date: str) -> List[Dict[str, Any]]:
+    """
+    Work-queue handler: fetch one small unit of city+container combinations concurrently.
+
+    Args:
+        city_container_combinations: (origin, destination, container[, date]) tuples
+        date: Shipping date for combinations without their own
+
+    Returns:
+        Result entries of all combinations, in unit order
+    """
+    per_combination = await asyncio.gather(*(
+        process_city_container_combination(origin_city, destination_city, container, sweep_date[0] if sweep_date else date)
+        for origin_city, destination_city, container, *sweep_date in city_container_combinations
+    ))
+    return [result for combination_results in per_combination for result in combination_results]
+
+
 def process_city_container_batch(batch_data: dict) -> List[Dict[str, Any]]:
     """
     Process a batch of city+container combinations in a separate process.
@@ -1170,152 +1586,216 @@ def process_city_container_batch(batch_data: dict) -> List[Dict[str, Any]]:
     date = batch_data['date']
     delay_range = batch_data['delay_range']
     batch_id = batch_data['batch_id']
+    max_in_flight = batch_data.get('max_in_flight')
     
     # Run the async computation
-    return asyncio.run(compute_batch_with_containers_async(
+    return asyncio.run(run_with_screenshot_resources(compute_batch_with_containers_async(
         city_container_combinations, 
         date, 
         delay_range,
-        batch_id
-    ))
+        batch_id,
+        max_in_flight
+    )))
+
+
+async def process_city_container_combination(
+    origin_city: str,
+    destination_city: str,
+    container: str,
+    date: str,
+    logger: logging.Logger = logger
+) -> List[Dict[str, Any]]:
+    """
+    Fetch rates and screenshots for one city+container combination.
+
+    Args:
+        origin_city: Origin city name
+        destination_city: Destination city name
+        container: Container type (e.g., "ST20")
+        date: Shipping date in YYYY-MM-DD format
+        logger: Logger for this batch
+
+    Returns:
+        Result entries for every rate, or a single fallback/error entry
+    """
+    # A response replayed from the cache is not a new probe of the route
+    from_cache = False
+    try:
+        # Create API payload with specific container type
+        payload = SearatesRequestPayload(
+            pointIdFrom=CITIES_TO_POINT_ID_MAP[origin_city],
+            pointIdTo=CITIES_TO_POINT_ID_MAP[destination_city],
+            date=date,
+            container=container
+        )
+
+        # Make API request with retry logic (paced by the host's token bucket,
+        # batched with other in-flight combinations when SEARATES_BATCH_SIZE > 1)
+        api_response, from_cache = await fetch_searates_rates(SEARATES_API_URL, payload)
+
+        if api_response and api_response.data and api_response.data.rates:
+            # Process each rate found
+            combination_results = []
+            for rate_idx, rate in enumerate(api_response.data.rates):
+                screenshot_url = None
+                website_link = None
+
+                try:
+                    # Generate screenshot URL
+                    shipment_id = rate.general.shipmentId
+                    website_link = f"https://www.searates.com/logistics-explorer/?id={shipment_id}"
+
+                    logger.debug(f"Taking screenshot for shipment {shipment_id}")
+                    if queue_mode_enabled():
+                        # Captured later by screenshot_worker.py and patched in on reconcile
+                        await enqueue_screenshot(website_link, website_link)
+                    else:
+                        screenshot_result = await _go(website_link)
+
+                        if isinstance(screenshot_result, str):
+                            screenshot_url = screenshot_result
+                        elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
+                            screenshot_url = screenshot_result
+                        else:
+                            logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
+
+                except Exception as screenshot_error:
+                    logger.error(f"Screenshot error for {origin_city} -> {destination_city} ({container}): {screenshot_error}")
+
+                # Create result entry with correct parameter order
+                result_entry = create_result_entry(
+                    origin_city=origin_city,
+                    destination_city=destination_city,
+                    rate=rate,
+                    date=date,
+                    container=container,
+                    screenshot_url=screenshot_url,
+                    website_link=website_link
+                )
+
+                combination_results.append(result_entry)
+
+                # Add delay between screenshots if multiple rates
+                if rate_idx < len(api_response.data.rates) - 1:
+                    await asyncio.sleep(random.uniform(1, 2))
+
+            logger.debug(f"✅ {origin_city} -> {destination_city} ({container}) completed with {len(combination_results)} rates")
+            if not from_cache:
+                await record_route_outcome(origin_city, destination_city, container, "success")
+            return combination_results
+
+        if api_response is None:
+            # The request failed for good - record an error, not a route without rates
+            await record_route_outcome(origin_city, destination_city, container, "error")
+            return [create_error_result(origin_city, destination_city, date, container, "Searates request failed")]
+
+        if not from_cache:
+            await record_route_outcome(origin_city, destination_city, container, "empty")
+
+        # No rates found - create fallback result
+        origin_city_url = format_city(origin_city, capitalize=False)
+        dest_city_url = format_city(destination_city, capitalize=False)
+        origin_city_cap = format_city(origin_city, capitalize=True, hyphenate=False)
+        dest_city_cap = format_city(destination_city, capitalize=True, hyphenate=False)
+
+        fallback_website_link = (
+            f"https://www.searates.com/logistics-explorer/from-{origin_city_url}-to-{dest_city_url}/"
+            f"?from={origin_city_cap}&to={dest_city_cap}"
+            f"&fromId={CITIES_TO_POINT_ID_MAP[origin_city]}"
+            f"&toId={CITIES_TO_POINT_ID_MAP[destination_city]}"
+            f"&date={date}&type=fcl&container={container}"
+        )
+
+        screenshot_url = None
+        try:
+            if queue_mode_enabled():
+                # Captured later by screenshot_worker.py and patched in on reconcile
+                await enqueue_screenshot(fallback_website_link, fallback_website_link)
+            else:
+                screenshot_result = await _go(fallback_website_link)
+                if isinstance(screenshot_result, str):
+                    screenshot_url = screenshot_result
+                elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
+                    screenshot_url = screenshot_result
+        except Exception as screenshot_error:
+            logger.error(f"Screenshot error for fallback page {fallback_website_link}: {screenshot_error}")
+
+        logger.debug(f"⚠️  {origin_city} -> {destination_city} ({container}) completed with no rates (fallback)")
+        return [create_empty_result(
+            origin_city, destination_city, date, container, screenshot_url, fallback_website_link
+        )]
+
+    except Exception as e:
+        logger.error(f"Error processing {origin_city} -> {destination_city} ({container}): {e}")
+        if not from_cache:
+            await record_route_outcome(origin_city, destination_city, container, "error")
+        return [create_error_result(origin_city, destination_city, date, container, str(e))]
 
 
 async def compute_batch_with_containers_async(
     city_container_combinations: List[tuple], 
     date: str, 
     delay_range: tuple,
-    batch_id: int
+    batch_id: int,
+    max_in_flight: int = None
 ) -> List[Dict[str, Any]]:
     """
     Async computation for a batch of city+container combinations.
+
+    Up to ``max_in_flight`` combinations run concurrently; request pacing
+    comes from the Searates token bucket in ``make_request`` rather than
+    sleeps between combinations. Results are returned in the order of
+    ``city_container_combinations`` regardless of completion order.
+
+    Args:
+        city_container_combinations: (origin, destination, container) tuples,
+            or (origin, destination, container, date) tuples in a date sweep
+        date: Shipping date in YYYY-MM-DD format (for 3-tuples)
+        delay_range: Unused; kept for callers that still pass it
+        batch_id: Batch number used in log messages
+        max_in_flight: Concurrent combinations (default: SEARATES_MAX_IN_FLIGHT)
     """
-    results = []
     logger = logging.getLogger(f"batch_{batch_id}")
+    max_in_flight = max(1, max_in_flight or SEARATES_MAX_IN_FLIGHT)
+    total = len(city_container_combinations)
     
-    # Track unique combinations processed in this batch
-    batch_combinations_processed = set()
-    
-    logger.info(f"Batch {batch_id}: Starting with {len(city_container_combinations)} city+container combinations to process")
+    logger.info(f"Batch {batch_id}: Starting with {total} city+container combinations to process ({max_in_flight} in flight)")
     
-    for i, (origin_city, destination_city, container) in enumerate(city_container_combinations):
-        combination_key = (origin_city, destination_city, container)
-        
-        # Log progress every 10 combinations within the batch
-        if (i + 1) % 10 == 0 or i == 0 or i == len(city_container_combinations) - 1:
-            logger.info(f"Batch {batch_id}: Processing combination {i+1}/{len(city_container_combinations)}: {origin_city} -> {destination_city} ({container})")
-        
-        try:
-            # Create API payload with specific container type
-            payload = SearatesRequestPayload(
-                pointIdFrom=CITIES_TO_POINT_ID_MAP[origin_city],
-                pointIdTo=CITIES_TO_POINT_ID_MAP[destination_city],
-                date=date,
-                container=container
+    semaphore = asyncio.Semaphore(max_in_flight)
+    completed = 0
+
+    async def run_combination(origin_city: str, destination_city: str, container: str, *sweep_date: str) -> List[Dict[str, Any]]:
+        nonlocal completed
+        async with semaphore:
+            combination_results = await process_city_container_combination(
+                origin_city, destination_city, container, sweep_date[0] if sweep_date else date, logger
             )
-            
-            # Make API request with retry logic
-            api_response = await make_request_with_retry(SEARATES_API_URL, payload)
-            
-            if api_response and api_response.data and api_response.data.rates:
-                # Process each rate found
-                combination_results = []
-                for rate_idx, rate in enumerate(api_response.data.rates):
-                    screenshot_url = None
-                    website_link = None
-                    
-                    try:
-                        # Generate screenshot URL
-                        shipment_id = rate.general.shipmentId
-                        website_link = f"https://www.searates.com/logistics-explorer/?id={shipment_id}"
-                        
-                        logger.debug(f"Taking screenshot for shipment {shipment_id}")
-                        screenshot_result = await _go(website_link)
-                        
-                        if isinstance(screenshot_result, str):
-                            screenshot_url = screenshot_result
-                        elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
-                            screenshot_url = screenshot_result
-                        else:
-                            logger.error(f"Screenshot failed for {shipment_id}: {screenshot_result}")
-                            
-                    except Exception as screenshot_error:
-                        logger.error(f"Screenshot error for {origin_city} -> {destination_city} ({container}): {screenshot_error}")
-                    
-                    # Create result entry with correct parameter order
-                    result_entry = create_result_entry(
-                        origin_city=origin_city,
-                        destination_city=destination_city,
-                        rate=rate,
-                        date=date,
-                        container=container,
-                        screenshot_url=screenshot_url,
-                        website_link=website_link
-                    )
-                    
-                    combination_results.append(result_entry)
-                    
-                    # Add delay between screenshots if multiple rates
-                    if rate_idx < len(api_response.data.rates) - 1:
-                        await asyncio.sleep(random.uniform(1, 2))
-                
-                # Mark this combination as successfully processed
-                batch_combinations_processed.add(combination_key)
-                results.extend(combination_results)
-                
-                logger.debug(f"Batch {batch_id}: ✅ {origin_city} -> {destination_city} ({container}) completed with {len(combination_results)} rates")
-                
-            else:
-                # No rates found - create fallback result
-                origin_city_url = format_city(origin_city, capitalize=False)
-                dest_city_url = format_city(destination_city, capitalize=False)
-                origin_city_cap = format_city(origin_city, capitalize=True, hyphenate=False)
-                dest_city_cap = format_city(destination_city, capitalize=True, hyphenate=False)
-
-                fallback_website_link = (
-                    f"https://www.searates.com/logistics-explorer/from-{origin_city_url}-to-{dest_city_url}/"
-                    f"?from={origin_city_cap}&to={dest_city_cap}"
-                    f"&fromId={CITIES_TO_POINT_ID_MAP[origin_city]}"
-                    f"&toId={CITIES_TO_POINT_ID_MAP[destination_city]}"
-                    f"&date={date}&type=fcl&container={container}"
-                )
-                
-                screenshot_url = None
-                try:
-                    screenshot_result = await _go(fallback_website_link)
-                    if isinstance(screenshot_result, str):
-                        screenshot_url = screenshot_result
-                    elif isinstance(screenshot_result, dict) and "error" not in screenshot_result:
-                        screenshot_url = screenshot_result.get("screenshot_url") or screenshot_result
-                except Exception as screenshot_error:
-                    logger.error(f"Screenshot error for fallback page {fallback_website_link}: {screenshot_error}")
+        completed += 1
+        # Log progress every 10 combinations within the batch
+        if completed % 10 == 0 or completed == 1 or completed == total:
+            logger.info(f"Batch {batch_id}: Completed {completed}/{total}: {origin_city} -> {destination_city} ({container})")
+        return combination_results
 
-                # Still mark as processed even with no rates
-                batch_combinations_processed.add(combination_key)
-                empty_result = create_empty_result(
-                    origin_city, destination_city, date, container, screenshot_url, fallback_website_link
-                )
-                results.append(empty_result)
-                
-                logger.debug(f"Batch {batch_id}: ⚠️  {origin_city} -> {destination_city} ({container}) completed with no rates (fallback)")
-            
-            # Add delay between API requests
-            if i < len(city_container_combinations) - 1:
-                delay = random.uniform(delay_range[0], delay_range[1])
-                await asyncio.sleep(delay)
-                    
-        except Exception as e:
-            logger.error(f"Batch {batch_id}: Error processing {origin_city} -> {destination_city} ({container}): {e}")
-            # Still mark as processed even with errors
-            batch_combinations_processed.add(combination_key)
-            error_result = create_error_result(origin_city, destination_city, date, container, str(e))
-            results.append(error_result)
+    # gather keeps input order, so checkpoints see the same sequence on every run
+    per_combination = await asyncio.gather(
+        *(run_combination(*combination) for combination in city_container_combinations)
+    )
+    results = [result for combination_results in per_combination for result in combination_results]
     
     # Final batch summary
     logger.info(f"Batch {batch_id}: ✅ COMPLETED")
-    logger.info(f"Batch {batch_id}: Processed {len(batch_combinations_processed)} unique city+container combinations")
+    logger.info(f"Batch {batch_id}: Processed {len(per_combination)} unique city+container combinations")
     logger.info(f"Batch {batch_id}: Generated {len(results)} total data points")
-    if len(batch_combinations_processed) > 0:
-        logger.info(f"Batch {batch_id}: Average {len(results) / len(batch_combinations_processed):.1f} data points per combination")
+    if per_combination:
+        logger.info(f"Batch {batch_id}: Average {len(results) / len(per_combination):.1f} data points per combination")
+    bucket_stats = rate_limiter_stats()
+    if bucket_stats:
+        logger.info(f"Batch {batch_id}: Rate limiter {bucket_stats}")
+    if retry_stats():
+        logger.info(f"Batch {batch_id}: Retries {retry_stats()}")
+    response_cache = get_response_cache()
+    if response_cache:
+        logger.info(f"Batch {batch_id}: Response cache {response_cache.stats()}")
     
     return results
 
@@ -1329,7 +1809,10 @@ async def compute_shipping_matrix_parallel_realtime(
     checkpoint_interval: int = 10,
     resume: bool = True,
     checkpoint_dir: str = "checkpoints",
-    excel_backup: bool = False
+    excel_backup: bool = False,
+    dates: Optional[List[str]] = None,
+    seed: Optional[int] = None,
+    shard: Optional[tuple] = None
 ) -> List[Dict[str, Any]]:
     """
     Compute shipping matrix with REAL-TIME checkpointing every N results.
@@ -1344,6 +1827,9 @@ async def compute_shipping_matrix_parallel_realtime(
         checkpoint_interval: Number of results to process before checkpointing
         resume: Whether to resume from existing checkpoint
         checkpoint_dir: Directory to store checkpoint files
+        dates: Sweep these shipping dates as one job space instead of a single date
+        seed: Seed for the city sample (required for consistent shards across hosts)
+        shard: (index, count) - process only this shard of the combinations
         
     Returns:
         List of dictionaries containing shipping data for each combination
@@ -1355,7 +1841,9 @@ async def compute_shipping_matrix_parallel_realtime(
     checkpoint_manager = CheckpointManager(
         checkpoint_dir=checkpoint_dir,
         checkpoint_interval=checkpoint_interval,
-        excel_backup=excel_backup
+        excel_backup=excel_backup,
+        include_date=bool(dates),
+        target_combinations=14280 * len(set(dates)) if dates else 14280
     )
     
     logger.info(f"Starting REAL-TIME PARALLEL matrix computation using {num_processes} processes")
@@ -1374,23 +1862,23 @@ async def compute_shipping_matrix_parallel_realtime(
     # Get city combinations
     all_cities = list(CITIES_TO_POINT_ID_MAP.keys())
 
-    cities_count = int(len(all_cities) * city_percentage)
-    cities = random.sample(all_cities, cities_count)
+    # Seeded sampling picks the same cities on every host of a sharded run
+    cities = sample_keys(all_cities, city_percentage, seed)
     
-    # Generate all city+container combinations (exclude same city combinations)
-    all_city_container_combinations = []
-    for origin_city in cities:
-        for destination_city in cities:
-            if origin_city != destination_city:
-                for container in CONTAINERS:  # ["ST20", "ST40"]
-                    all_city_container_combinations.append((origin_city, destination_city, container))
+    # Generate all city+container(+date) combinations (exclude same city combinations),
+    # keeping this host's shard
+    all_city_container_combinations = shard_combinations(build_matrix_combinations(cities, dates), shard)
     
     logger.info(f"📊 COMBINATION SETUP:")
     logger.info(f"   Total cities available: {len(all_cities)}")
     logger.info(f"   Cities to process: {len(cities)} ({city_percentage*100:.1f}%)")
     logger.info(f"   Container types: {CONTAINERS}")
+    if dates:
+        logger.info(f"   Date sweep: {len(set(dates))} dates, coarse to fine: {sweep_date_passes(dates)}")
+    if shard:
+        logger.info(f"   Shard: {shard[0]}/{shard[1]} (seed {seed})")
     logger.info(f"   Expected combinations: {len(all_city_container_combinations)}")
-    logger.info(f"   Target for completion: 14,280 combinations (85 cities × 84 × 2 containers)")
+    logger.info(f"   Target for completion: {checkpoint_manager.target_combinations:,} combinations (85 cities × 84 × 2 containers{' × dates' if dates else ''})")
     
     # Get remaining combinations to process (skip completed ones if resuming)
     if resume and checkpoint_data.get('has_checkpoint'):
@@ -1410,6 +1898,12 @@ async def compute_shipping_matrix_parallel_realtime(
         logger.info(f"🎉 FINAL STATS: {progress['completed_combinations']}/{progress['target_combinations']} combinations completed!")
         return checkpoint_manager.total_results
     
+    # Chronically empty routes go last or wait for their re-probe (--force-all schedules everything)
+    remaining_combinations = schedule_by_route_health(remaining_combinations)
+    if not remaining_combinations:
+        logger.info("⏭️ Only deferred empty routes remain - nothing to probe in this run")
+        return checkpoint_manager.total_results
+    
     # Use a queue-based approach for real-time processing
     from concurrent.futures import ProcessPoolExecutor, as_completed
     import queue
@@ -1433,6 +1927,10 @@ async def compute_shipping_matrix_parallel_realtime(
     logger.info(f"Split work into {len(chunks)} small chunks (avg {chunk_size} combinations per chunk)")
     logger.info(f"This enables checkpointing every {checkpoint_interval} results instead of waiting for full batches")
     
+    # Every worker process gets an equal share of the Searates request budget;
+    # the executor starts no more processes than there are chunks
+    configure_rate_limits(share=1 / worker_count(num_processes, len(chunks)))
+    
     # Process chunks and checkpoint in real-time
     try:
         with ProcessPoolExecutor(max_workers=num_processes) as executor:
@@ -1499,6 +1997,162 @@ async def compute_shipping_matrix_parallel_realtime(
     return checkpoint_manager.total_results
 
 
+async def compute_shipping_matrix_asyncio(
+    date: str = "2025-09-01",
+    city_percentage: float = 1.0,
+    checkpoint_interval: int = 10,
+    resume: bool = True,
+    checkpoint_dir: str = "checkpoints",
+    excel_backup: bool = False,
+    max_in_flight: int = None,
+    dates: Optional[List[str]] = None,
+    seed: Optional[int] = None,
+    shard: Optional[tuple] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compute the shipping matrix in a single event loop.
+
+    The matrix is network-bound, so instead of forking one process per core
+    this runs up to ``max_in_flight`` combinations as lightweight tasks in
+    one loop. They share one HTTP session, one Searates token bucket (the
+    whole host budget) and one browser pool, and no result lists are pickled
+    between processes. Image encoding keeps its own process pool.
+
+    Results are checkpointed as they finish but committed in combination
+    order, so every checkpoint is a prefix of the same sequence.
+
+    With ``dates`` the run becomes a date sweep: route × container × date is
+    scheduled as one job space over the same session, token bucket and
+    response cache, checkpointed per date, and ordered so every route is
+    covered at a coarse date spacing before the gaps are filled in.
+
+    Args:
+        date: Shipping date in YYYY-MM-DD format
+        city_percentage: Percentage of cities to process
+        checkpoint_interval: Number of results to process before checkpointing
+        resume: Whether to resume from existing checkpoint
+        checkpoint_dir: Directory to store checkpoint files
+        excel_backup: Save Excel backups during checkpointing
+        max_in_flight: Concurrent combinations (default: SEARATES_ASYNC_MAX_IN_FLIGHT)
+        dates: Sweep these shipping dates instead of the single ``date``
+        seed: Seed for the city sample (required for consistent shards across hosts)
+        shard: (index, count) - process only this shard of the combinations
+
+    Returns:
+        List of dictionaries containing shipping data for each combination
+    """
+    max_in_flight = max(1, max_in_flight or SEARATES_ASYNC_MAX_IN_FLIGHT)
+
+    checkpoint_manager = CheckpointManager(
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_interval=checkpoint_interval,
+        excel_backup=excel_backup,
+        include_date=bool(dates),
+        target_combinations=14280 * len(set(dates)) if dates else 14280
+    )
+
+    logger.info(f"Starting ASYNCIO matrix computation: one process, up to {max_in_flight} combinations in flight")
+    logger.info(f"Real-time checkpointing enabled: every {checkpoint_interval} results")
+
+    # Handle resume vs fresh start
+    checkpoint_data = {}
+    if resume:
+        checkpoint_data = checkpoint_manager.load_existing_checkpoint()
+        if checkpoint_data['has_checkpoint']:
+            logger.info(f"🔄 Resuming from checkpoint with {len(checkpoint_data['results'])} existing results")
+    else:
+        logger.info("🆕 Starting fresh - clearing existing checkpoints")
+        checkpoint_manager.clear_checkpoints()
+
+    all_cities = list(CITIES_TO_POINT_ID_MAP.keys())
+    # Seeded sampling picks the same cities on every host of a sharded run
+    cities = sample_keys(all_cities, city_percentage, seed)
+
+    all_city_container_combinations = shard_combinations(build_matrix_combinations(cities, dates), shard)
+    if shard:
+        logger.info(f"🧩 Shard {shard[0]}/{shard[1]}: {len(all_city_container_combinations)} combinations")
+    if dates:
+        logger.info(f"📅 Date sweep over {len(set(dates))} dates, coarse to fine: {sweep_date_passes(dates)}")
+
+    if resume and checkpoint_data.get('has_checkpoint'):
+        remaining_combinations = checkpoint_manager.get_remaining_pairs(all_city_container_combinations)
+        logger.info(f"🔄 RESUMING FROM CHECKPOINT: {len(remaining_combinations)} combinations remaining")
+    else:
+        remaining_combinations = all_city_container_combinations
+        logger.info(f"🆕 STARTING FRESH: {len(remaining_combinations)} total city+container combinations to process")
+
+    if not remaining_combinations:
+        logger.info("✅ All city+container combinations already completed!")
+        return checkpoint_manager.total_results
+
+    # Chronically empty routes go last or wait for their re-probe (--force-all schedules everything)
+    remaining_combinations = schedule_by_route_health(remaining_combinations)
+    if not remaining_combinations:
+        logger.info("⏭️ Only deferred empty routes remain - nothing to probe in this run")
+        return checkpoint_manager.total_results
+
+    # This process is the only client, so it gets the whole request budget
+    configure_rate_limits(share=1.0)
+
+    total = len(remaining_combinations)
+    next_index = iter(range(total))
+    finished: Dict[int, List[Dict[str, Any]]] = {}
+    next_to_commit = 0
+    commit_lock = asyncio.Lock()
+
+    def commit(batch: List[Dict[str, Any]]) -> None:
+        # add_result may write a checkpoint; runs in a worker thread, one call at a time
+        for result in batch:
+            checkpoint_manager.add_result(result)
+
+    async def commit_ready() -> None:
+        nonlocal next_to_commit
+        async with commit_lock:
+            ready = []
+            while next_to_commit in finished:
+                ready.extend(finished.pop(next_to_commit))
+                next_to_commit += 1
+            if ready:
+                await asyncio.to_thread(commit, ready)
+
+    async def worker() -> None:
+        for index in next_index:
+            origin_city, destination_city, container, *sweep_date = remaining_combinations[index]
+            finished[index] = await process_city_container_combination(
+                origin_city, destination_city, container, sweep_date[0] if sweep_date else date
+            )
+            await commit_ready()
+            done = next_to_commit
+            if done and done % 100 == 0:
+                logger.info(f"📊 Committed {done}/{total} combinations ({len(checkpoint_manager.total_results)} results)")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(max_in_flight, total))))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info("🛑 Process interrupted - saving checkpoint...")
+        await asyncio.to_thread(checkpoint_manager.save_checkpoint, True)
+        raise
+
+    logger.info("💾 Saving final checkpoint...")
+    await asyncio.to_thread(checkpoint_manager.save_checkpoint, True)
+
+    progress = checkpoint_manager.get_progress_summary()
+    logger.info("="*80)
+    logger.info("🎉 ASYNCIO MATRIX COMPUTATION COMPLETED!")
+    logger.info(f"   ✅ Unique combinations completed: {progress['completed_combinations']}/{progress['target_combinations']} ({progress['progress_percent']:.1f}%)")
+    logger.info(f"   📄 Total data points generated: {progress['total_data_points']}")
+    logger.info(f"   🚦 Rate limiter: {rate_limiter_stats()}")
+    logger.info(f"   🔁 Retries: {retry_stats()}")
+    if SEARATES_BATCH_SIZE > 1:
+        logger.info(f"   🧺 Query batching: {get_searates_batcher().stats()}")
+    response_cache = get_response_cache()
+    if response_cache:
+        logger.info(f"   🗄️ Response cache: {response_cache.stats()}")
+    logger.info("="*80)
+
+    return checkpoint_manager.total_results
+
+
 async def run_script():
     """Main script to run the shipping matrix computation."""
     logger.info("Starting shipping matrix computation...")
@@ -1545,6 +2199,11 @@ FREIGHTOS_USER_COOKIES = "handlID=92852469965; handl_ref_domain=; handl_landing_
 
 FREIGHTOS_SEARCH_URL = "https://ship.freightos.com/api/open-freight/quoting/quotes/search/"
 
+# Connection limits of the per-worker Freightos client
+FREIGHTOS_POOL_SIZE = int(os.getenv("FREIGHTOS_POOL_SIZE", "32"))
+FREIGHTOS_POOL_PER_HOST = int(os.getenv("FREIGHTOS_POOL_PER_HOST", "16"))
+FREIGHTOS_TIMEOUT_SECONDS = float(os.getenv("FREIGHTOS_TIMEOUT_SECONDS", "30"))
+
 def make_freightos_headers():
     return {
         "Cookie": FREIGHTOS_USER_COOKIES,
@@ -1553,6 +2212,24 @@ def make_freightos_headers():
         "Origin": "https://ship.freightos.com",
     }
 
+# Built once and sent as the Freightos client's default headers
+FREIGHTOS_HEADERS = make_freightos_headers()
+
+def get_freightos_session() -> aiohttp.ClientSession:
+    """
+    Return this worker's Freightos client for the running event loop.
+    Initial requests and polls share its keep-alive connections; the cookie
+    and JSON headers are set once as session defaults.
+    """
+    return get_named_http_session("freightos", lambda: make_http_session(
+        pool_size=FREIGHTOS_POOL_SIZE,
+        per_host=FREIGHTOS_POOL_PER_HOST,
+        timeout_seconds=FREIGHTOS_TIMEOUT_SECONDS,
+        headers=FREIGHTOS_HEADERS,
+        # The Cookie header is the login; don't mix in cookies set by responses
+        cookie_jar=aiohttp.DummyCookieJar()
+    ))
+
 def build_freightos_payload(origin_location_code: str, origin_country_id: str, 
                            destination_location_code: str, destination_country_id: str,
                            date: str, container: str = "container20") -> FreightosRequestPayload:
@@ -1660,177 +2337,138 @@ async def make_freightos_initial_request(origin_location_code: str, origin_count
                                        date: str, container: str = "container20") -> Optional[str]:
     """
     Make initial Freightos request and return polling URL.
-    Enhanced with comprehensive error handling and redundancy.
+    Timeouts, dropped connections and 429/5xx responses are retried by the
+    shared retry layer (see app/utils/http_retry.py); API errors are not.
     """
-    max_attempts = 10
+    payload = build_freightos_payload(
+        origin_location_code, origin_country_id,
+        destination_location_code, destination_country_id,
+        date, container
+    )
+    request_body = json.dumps(payload.model_dump(exclude_none=True), indent=2)
+    session = get_freightos_session()
     
-    for attempt in range(max_attempts):
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = build_freightos_payload(
-                    origin_location_code, origin_country_id,
-                    destination_location_code, destination_country_id,
-                    date, container
-                )
-                
-                async with session.post(
-                    url=FREIGHTOS_SEARCH_URL,
-                    data=json.dumps(payload.model_dump(exclude_none=True), indent=2),
-                    headers=make_freightos_headers(),
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    try:
-                        response_data = await response.json()
-                    except Exception as json_error:
-                        logger.warning(f"Failed to parse JSON response (attempt {attempt + 1}): {json_error}")
-                        if attempt < max_attempts - 1:
-                            await asyncio.sleep(1)
-                            continue
-                        return None
-                    
-                    # Check for obvious API errors first
-                    if isinstance(response_data, dict):
-                        if "businessInfo" in response_data and "message" in response_data.get("businessInfo", {}):
-                            error_msg = response_data["businessInfo"]["message"]
-                            logger.error(f"Freightos API error: {error_msg}")
-                            return None
-                        
-                        if "error" in response_data or "errors" in response_data:
-                            logger.error(f"Freightos API returned error: {response_data}")
-                            return None
-                    
-                    # Try to parse with ultra-permissive model
-                    try:
-                        result = FreightosQuotesResponse(**response_data)
-                        resultId = result.messageHeader.conversationID
-                        logger.info(f"Freightos API result ID: {resultId}")
-                        if result.paging and result.paging.next:
-                            return result.paging.next
-                        else:
-                            logger.warning(f"No polling URL in response (attempt {attempt + 1})")
-                            return None
-                    except Exception as parse_error:
-                        logger.warning(f"Model parsing failed (attempt {attempt + 1}): {parse_error}")
-                        
-                        # Try to extract polling URL manually as fallback
-                        try:
-                            if isinstance(response_data, dict) and "paging" in response_data:
-                                paging_data = response_data["paging"]
-                                if isinstance(paging_data, dict) and "next" in paging_data:
-                                    next_url = paging_data["next"]
-                                    if next_url and isinstance(next_url, str):
-                                        logger.info(f"Extracted polling URL manually: {next_url}")
-                                        return next_url
-                        except Exception as manual_error:
-                            logger.warning(f"Manual URL extraction failed: {manual_error}")
-                        
-                        if attempt < max_attempts - 1:
-                            await asyncio.sleep(1)
-                            continue
-                        return None
-                        
-        except asyncio.TimeoutError:
-            logger.warning(f"Request timeout (attempt {attempt + 1})")
-            if attempt < max_attempts - 1:
-                await asyncio.sleep(2)
-                continue
-        except Exception as e:
-            logger.warning(f"Request failed (attempt {attempt + 1}): {e}")
-            if attempt < max_attempts - 1:
-                await asyncio.sleep(1)
-                continue
+    async def send() -> Any:
+        async with session.post(url=FREIGHTOS_SEARCH_URL, data=request_body) as response:
+            check_status(FREIGHTOS_SEARCH_URL, response.status, response.headers)
+            return await response.json()
+    
+    try:
+        response_data = await request_with_retry(FREIGHTOS_SEARCH_URL, send)
+    except Exception as e:
+        logger.error(f"Failed to get polling URL: {e}")
+        return None
     
-    logger.error(f"Failed to get polling URL after {max_attempts} attempts")
+    # Check for obvious API errors first
+    if isinstance(response_data, dict):
+        if "businessInfo" in response_data and "message" in response_data.get("businessInfo", {}):
+            error_msg = response_data["businessInfo"]["message"]
+            logger.error(f"Freightos API error: {error_msg}")
+            return None
+        
+        if "error" in response_data or "errors" in response_data:
+            logger.error(f"Freightos API returned error: {response_data}")
+            return None
+    
+    # Try to parse with ultra-permissive model
+    try:
+        result = FreightosQuotesResponse(**response_data)
+        resultId = result.messageHeader.conversationID
+        logger.info(f"Freightos API result ID: {resultId}")
+        if result.paging and result.paging.next:
+            return result.paging.next
+        logger.warning("No polling URL in response")
+        return None
+    except Exception as parse_error:
+        logger.warning(f"Model parsing failed: {parse_error}")
+    
+    # Try to extract polling URL manually as fallback
+    try:
+        if isinstance(response_data, dict) and "paging" in response_data:
+            paging_data = response_data["paging"]
+            if isinstance(paging_data, dict) and "next" in paging_data:
+                next_url = paging_data["next"]
+                if next_url and isinstance(next_url, str):
+                    logger.info(f"Extracted polling URL manually: {next_url}")
+                    return next_url
+    except Exception as manual_error:
+        logger.warning(f"Manual URL extraction failed: {manual_error}")
+    
+    logger.error("Failed to get polling URL from the Freightos response")
     return None
 
+async def fetch_freightos_poll(polling_url: str) -> Any:
+    """One Freightos polling GET; failed requests are retried by the shared retry layer."""
+    session = get_freightos_session()
+    
+    async def send() -> Any:
+        async with session.get(url=polling_url) as response:
+            check_status(polling_url, response.status, response.headers)
+            return await response.json()
+    
+    # The next scheduled poll is a retry in itself
+    return await request_with_retry(polling_url, send, max_attempts=2)
+
+
+def parse_freightos_poll(data: Any) -> tuple:
+    """
+    Read a polling response for the poll scheduler.
+
+    Returns:
+        (whether quotes arrived, (quotes_data, result_id) or None for unusable responses)
+    """
+    if not isinstance(data, dict):
+        logger.warning(f"Unexpected polling response format: {type(data)}")
+        return False, None
+    
+    # Extract resultId from response
+    result_id = None
+    try:
+        result = FreightosQuotesResponse(**data)
+        result_id = result.messageHeader.conversationID
+        logger.info(f"Freightos polling result ID: {result_id}")
+    except Exception as parse_error:
+        logger.warning(f"Could not extract resultId from polling response: {parse_error}")
+        # Continue without resultId - we'll still return data if available
+    
+    quotes = data.get("quotes")
+    if quotes:
+        logger.debug(f"Successfully received {len(quotes)} quotes")
+    return bool(quotes), (data, result_id)
+
+
+_freightos_poller: Optional[PollScheduler] = None
+_freightos_poller_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_freightos_poller() -> PollScheduler:
+    """Return the Freightos poll scheduler for the running event loop, creating it if needed."""
+    global _freightos_poller, _freightos_poller_loop
+    
+    loop = asyncio.get_running_loop()
+    if _freightos_poller is None or _freightos_poller_loop is not loop:
+        _freightos_poller = PollScheduler(fetch_freightos_poll, parse_freightos_poll)
+        _freightos_poller_loop = loop
+    return _freightos_poller
+
+
 async def make_freightos_polling_request(polling_url: str, max_retries: int = 5, 
                                        retry_delay: float = 3.0) -> Optional[tuple]:
     """
-    Make polling request to Freightos and return the quotes data with resultId.
-    Enhanced with comprehensive error handling and redundancy.
+    Poll Freightos until the quotes are ready and return them with the resultId.
+    The polls are timed by the shared scheduler (see app/utils/poll_scheduler.py),
+    so any number of searches can wait at once; after ``max_retries`` ×
+    ``retry_delay`` seconds the last response is returned for the screenshot.
     Returns: (quotes_data, result_id) tuple or None if failed
     """
     if not polling_url or not isinstance(polling_url, str):
         logger.error("Invalid polling URL provided")
         return None
     
-    async with aiohttp.ClientSession() as session:
-        for attempt in range(10):
-            try:
-                async with session.get(
-                    url=polling_url,
-                    headers=make_freightos_headers(),
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status != 200:
-                        logger.warning(f"Polling returned status {response.status} (attempt {attempt + 1})")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        return None
-                    
-                    try:
-                        data = await response.json()
-                    except Exception as json_error:
-                        logger.warning(f"Failed to parse polling JSON (attempt {attempt + 1}): {json_error}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        return None
-                    
-                    # Extract resultId from response
-                    result_id = None
-                    try:
-                        result = FreightosQuotesResponse(**data)
-                        result_id = result.messageHeader.conversationID
-                        logger.info(f"Freightos polling result ID: {result_id}")
-                    except Exception as parse_error:
-                        logger.warning(f"Could not extract resultId from polling response: {parse_error}")
-                        # Continue without resultId - we'll still return data if available
-                    
-                    # Check if we have quotes
-                    try:
-                        if isinstance(data, dict):
-                            quotes = data.get("quotes")
-                            if quotes and len(quotes) > 0:
-                                logger.debug(f"Successfully received {len(quotes)} quotes")
-                                return (data, result_id)
-                            else:
-                                # No quotes yet but we have a valid response - check if we should return anyway
-                                if attempt >= max_retries - 1:
-                                    # Final attempt - return the response even without quotes for screenshot
-                                    logger.info(f"Final polling attempt - returning response for screenshot")
-                                    return (data, result_id)
-                                else:
-                                    logger.info(f"No quotes yet, retrying in {retry_delay} seconds... (attempt {attempt + 1}/{max_retries})")
-                                    await asyncio.sleep(retry_delay)
-                                    continue
-                        else:
-                            logger.warning(f"Unexpected response format (attempt {attempt + 1}): {type(data)}")
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(retry_delay)
-                                continue
-                            return None
-                    except Exception as check_error:
-                        logger.warning(f"Error checking quotes (attempt {attempt + 1}): {check_error}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        return None
-                        
-            except asyncio.TimeoutError:
-                logger.warning(f"Polling timeout (attempt {attempt + 1})")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    continue
-            except Exception as e:
-                logger.warning(f"Polling request failed (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    continue
-    
-    logger.warning(f"Failed to get quotes after {max_retries} attempts - continuing to next request")
-    return None
+    outcome = await get_freightos_poller().poll(polling_url, timeout=max_retries * retry_delay)
+    if outcome is None:
+        logger.warning("Failed to get quotes - continuing to next request")
+    return outcome
 
 def locode_to_city_country(locode):
     """Convert UN/LOCODE to city and country."""
@@ -2374,422 +3012,418 @@ async def compute_freightos_matrix(
     logger.info(f"Freightos matrix computation completed. Generated {len(results)} results")
     return results
 
-def process_freightos_location_batch(batch_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """
-    Process a batch of Freightos location+container pairs.
-    This function is designed to be run in a separate process.
-    """
-    batch_results = []
-    location_container_pairs = batch_data['location_container_pairs']
-    date = batch_data['date']
-    delay_range = batch_data['delay_range']
-    batch_id = batch_data['batch_id']
-    checkpoint_manager = batch_data.get('checkpoint_manager')
-    checkpoint_interval = batch_data.get('checkpoint_interval', 5)
+FREIGHTOS_SUBMIT_CONCURRENCY = int(os.getenv("FREIGHTOS_SUBMIT_CONCURRENCY", "2"))
+# Searches waiting for quotes at once; the polls themselves are multiplexed by the poll scheduler
+FREIGHTOS_POLL_CONCURRENCY = int(os.getenv("FREIGHTOS_POLL_CONCURRENCY", "64"))
+FREIGHTOS_CAPTURE_CONCURRENCY = int(os.getenv("FREIGHTOS_CAPTURE_CONCURRENCY", "4"))
+FREIGHTOS_TRANSFORM_CONCURRENCY = int(os.getenv("FREIGHTOS_TRANSFORM_CONCURRENCY", "2"))
+# Units each worker feeds into its pipeline at once; with WORK_UNIT_SIZE this bounds the
+# searches a worker has in flight while keeping the rest of the units on the shared queue
+FREIGHTOS_WORK_LANES = int(os.getenv("FREIGHTOS_WORK_LANES", "8"))
+
+
+class FreightosSearch:
+    """State of one Freightos location+container pair as it moves through the pipeline stages."""
+
+    __slots__ = (
+        "index", "origin_location", "destination_location", "container", "date", "batch_id",
+        "origin_data", "destination_data", "polling_url", "quotes_data", "result_id",
+        "polling_attempts", "screenshot_url", "website_link", "results", "succeeded", "finished"
+    )
+
+    def __init__(self, origin_location: str, destination_location: str, container: str, date: str,
+                 batch_id: int, index: int = 0):
+        self.index = index
+        self.origin_location = origin_location
+        self.destination_location = destination_location
+        self.container = container
+        self.date = date
+        self.batch_id = batch_id
+        self.origin_data = None
+        self.destination_data = None
+        self.polling_url = None
+        self.quotes_data = None
+        self.result_id = None
+        self.polling_attempts = 0
+        self.screenshot_url = None
+        self.website_link = None
+        self.results: List[Dict[str, Any]] = []
+        self.succeeded = False
+        # Set once the results are final; later stages pass the search through
+        self.finished = False
+
+    def __repr__(self) -> str:
+        return f"FreightosSearch({self.origin_location} -> {self.destination_location}, {self.container})"
+
+    def finish(self, results: List[Dict[str, Any]], succeeded: bool = False) -> "FreightosSearch":
+        self.results = results
+        self.succeeded = succeeded
+        self.finished = True
+        return self
+
+    def fail(self, error_type: str, error_message: str, has_polling_url: bool = False) -> "FreightosSearch":
+        return self.finish([create_freightos_empty_result(
+            self.origin_location, self.destination_location, self.date, self.container,
+            error_type=error_type, error_message=error_message,
+            has_polling_url=has_polling_url, polling_attempts=self.polling_attempts,
+            screenshot_url=self.screenshot_url, website_link=self.website_link
+        )])
+
+
+async def submit_freightos_search(search: FreightosSearch) -> FreightosSearch:
+    """Stage 1: look up both locations and send the initial request for the polling URL."""
+    batch_id = search.batch_id
+    try:
+        # Get location data with error handling
+        search.origin_data = FREIGHTOS_LOCATIONS.get(search.origin_location)
+        search.destination_data = FREIGHTOS_LOCATIONS.get(search.destination_location)
+        
+        if not search.origin_data:
+            logger.warning(f"Batch {batch_id} - Origin location '{search.origin_location}' not found")
+            return search.fail("location_not_found", f"Origin location '{search.origin_location}' not found in FREIGHTOS_LOCATIONS")
+        if not search.destination_data:
+            logger.warning(f"Batch {batch_id} - Destination location '{search.destination_location}' not found")
+            return search.fail("location_not_found", f"Destination location '{search.destination_location}' not found in FREIGHTOS_LOCATIONS")
+        
+        # Make initial request to get polling URL
+        try:
+            search.polling_url = await make_freightos_initial_request(
+                search.origin_data["locationCode"], search.origin_data["countryID"],
+                search.destination_data["locationCode"], search.destination_data["countryID"],
+                search.date, search.container
+            )
+        except Exception as e:
+            logger.error(f"Batch {batch_id} - Error in initial request: {e}")
+            search.polling_url = None
+        
+        if not search.polling_url:
+            logger.warning(f"Batch {batch_id} - Failed to get polling URL")
+            return search.fail("no_polling_url", "Failed to get polling URL from initial request")
+    except Exception as e:
+        logger.error(f"Batch {batch_id} - Critical error: {e}")
+        search.fail("critical_error", str(e))
+    return search
+
+
+async def poll_freightos_search(search: FreightosSearch) -> FreightosSearch:
+    """Stage 2: wait on the poll scheduler for the quotes and the resultId."""
+    if search.finished:
+        return search
+    polling_response = None
+    try:
+        polling_response = await make_freightos_polling_request(search.polling_url)
+    except Exception as e:
+        logger.error(f"Batch {search.batch_id} - Error in polling request: {e}")
+    search.polling_attempts = 1  # Assuming at least 1 attempt was made
     
-    logger.info(f"Starting Freightos batch {batch_id} with {len(location_container_pairs)} location+container pairs")
+    # Extract quotes_data and result_id from response
+    if polling_response:
+        search.quotes_data, search.result_id = polling_response
+    return search
+
+
+async def capture_freightos_search(search: FreightosSearch) -> FreightosSearch:
+    """Stage 3: screenshot the results page if we have a resultId (regardless of quotes)."""
+    if search.finished:
+        return search
+    if not search.result_id:
+        logger.warning(f"Batch {search.batch_id} - No result_id available for screenshot")
+        return search
     
-    # Run the async batch processing
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    result_id = search.result_id
+    try:
+        # Generate website link using result_id
+        search.website_link = website_link = f"https://ship.freightos.com/results/{result_id}/"
+        
+        logger.info(f"Taking screenshot for result {result_id}")
+        if queue_mode_enabled():
+            # Captured later by screenshot_worker.py and patched in on reconcile
+            await enqueue_screenshot(website_link, website_link)
+            return search
+        
+        screenshot_result = await _go(website_link)
+        screenshot_url = None
+    
+        # Enhanced screenshot URL extraction with better logging
+        logger.info(f"Screenshot result type: {type(screenshot_result)}, value: {screenshot_result}")
+    
+        if screenshot_result:
+            # Try multiple ways to extract the URL
+            if isinstance(screenshot_result, str) and screenshot_result.startswith('http'):
+                screenshot_url = screenshot_result
+                logger.info(f"✅ Screenshot captured (string): {screenshot_url}")
+            elif hasattr(screenshot_result, 'url') and screenshot_result.url:
+                screenshot_url = screenshot_result.url
+                logger.info(f"✅ Screenshot captured (object.url): {screenshot_url}")
+            elif isinstance(screenshot_result, dict) and 'screenshot_url' in screenshot_result:
+                screenshot_url = screenshot_result['screenshot_url']
+                logger.info(f"✅ Screenshot captured (screenshot_url): {screenshot_url}")
+            elif isinstance(screenshot_result, dict) and 'url' in screenshot_result:
+                screenshot_url = screenshot_result['url']
+                logger.info(f"✅ Screenshot captured (dict url): {screenshot_url}")
+            else:
+                # Try to convert to string if it contains URL-like content
+                str_result = str(screenshot_result)
+                if 'https://' in str_result and '.amazonaws.com' in str_result:
+                    # Extract URL from string representation
+                    url_match = re.search(r'(https://[^\s]+amazonaws\.com[^\s]*\.png)', str_result)
+                    if url_match:
+                        screenshot_url = url_match.group(1)
+                        logger.info(f"✅ Screenshot captured (extracted): {screenshot_url}")
+                    else:
+                        logger.warning(f"⚠️ Screenshot result contains AWS URL but couldn't extract: {str_result}")
+                else:
+                    logger.warning(f"⚠️ Screenshot failed - unrecognized format: {type(screenshot_result)} = {screenshot_result}")
+        else:
+            logger.warning(f"⚠️ Screenshot failed - empty result returned")
+        search.screenshot_url = screenshot_url
     
+    except Exception as screenshot_error:
+        logger.warning(f"⚠️ Screenshot failed for {search.origin_location} -> {search.destination_location}: {screenshot_error}")
+        # Continue processing even if screenshot fails
+    return search
+
+
+async def transform_freightos_search(search: FreightosSearch) -> FreightosSearch:
+    """Stage 4: turn the quotes into result entries - ALWAYS create results (potentially multiple)."""
+    if search.finished:
+        return search
+    batch_id = search.batch_id
+    origin_location, destination_location = search.origin_location, search.destination_location
     try:
-        batch_results = loop.run_until_complete(
-            compute_freightos_batch_async(
-                location_container_pairs, 
-                date, 
-                delay_range, 
-                batch_id,
-                checkpoint_manager,
-                checkpoint_interval
-            )
+        if not search.quotes_data:
+            logger.warning(f"Batch {batch_id} - No quotes returned after polling")
+            return search.fail("no_quotes", "No quotes returned after polling retries", has_polling_url=True)
+        
+        # Process ALL quotes, not just the first one
+        batch_results = create_freightos_result_entries(
+            origin_location, destination_location, search.quotes_data, search.date, search.container,
+            search.screenshot_url, search.website_link
         )
+        
+        # Process each quote result
+        success_quotes = 0
+        for result in batch_results:
+            if result and result.get("request_status") == "success":
+                success_quotes += 1
+                logger.info(f"Batch {batch_id} - ✅ Quote {result.get('quote_number', 1)}/{result.get('total_quotes_available', 1)}: {origin_location} -> {destination_location} (${result.get('price_of_shipping')}) via {result.get('carrier', 'Unknown')}")
+        
+        if success_quotes > 0:
+            logger.info(f"Batch {batch_id} - 🎯 Total: {success_quotes} valid quotes found for {origin_location} -> {destination_location}")
+        else:
+            logger.warning(f"Batch {batch_id} - ⚠️ No valid pricing data in any quotes")
+        search.finish(batch_results, success_quotes > 0)
     except Exception as e:
-        logger.error(f"Error in Freightos batch {batch_id}: {e}")
-    finally:
-        loop.close()
-    
-    logger.info(f"Completed Freightos batch {batch_id} with {len(batch_results)} results")
-    return batch_results
+        logger.error(f"Batch {batch_id} - Critical error: {e}")
+        search.fail("critical_error", str(e), has_polling_url=True)
+    return search
 
-async def compute_freightos_batch_async(
-    location_container_pairs: List[tuple], 
-    date: str, 
-    delay_range: tuple,
-    batch_id: int,
-    checkpoint_manager=None,
-    checkpoint_interval: int = 5
+
+class FreightosPipeline:
+    """
+    Long-lived submit → poll → capture → transform pipeline of one worker process.
+
+    Every work unit the worker handles feeds its searches into the same
+    pipeline, so the searches of the next unit are submitted while earlier
+    ones are still being polled or captured instead of each unit filling and
+    draining a pipeline of its own. Submissions stay spaced by a random delay
+    from the unit's ``delay_range``, across all units. Each stage has its own
+    concurrency limit (FREIGHTOS_*_CONCURRENCY) and a bounded input queue.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self.submitted = 0
+        self.pipeline = StagedPipeline([
+            ("submit", self._guarded("submit", submit_freightos_search), FREIGHTOS_SUBMIT_CONCURRENCY),
+            ("poll", self._guarded("poll", poll_freightos_search), FREIGHTOS_POLL_CONCURRENCY),
+            ("capture", self._guarded("capture", capture_freightos_search), FREIGHTOS_CAPTURE_CONCURRENCY),
+            ("transform", self._guarded("transform", transform_freightos_search), FREIGHTOS_TRANSFORM_CONCURRENCY),
+            ("done", self._done, 1),
+        ], name=f"freightos-{os.getpid()}")
+        # Runs until the worker's event loop shuts down
+        self._task = asyncio.get_running_loop().create_task(self.pipeline.run(self._searches()))
+        self._task.add_done_callback(self._stopped)
+
+    @staticmethod
+    def _guarded(stage_name: str, handler: Callable[[FreightosSearch], Awaitable[FreightosSearch]]):
+        # The pipeline drops items whose handler raises; a dropped search would
+        # leave its unit waiting forever, so turn the exception into a result
+        async def run(search: FreightosSearch) -> FreightosSearch:
+            try:
+                return await handler(search)
+            except Exception as e:
+                logger.error(f"Batch {search.batch_id} - Stage '{stage_name}' failed for {search!r}: {e}")
+                return search.fail("critical_error", str(e), has_polling_url=bool(search.polling_url))
+        return run
+
+    def _stopped(self, task: asyncio.Task) -> None:
+        # Units still waiting fail instead of hanging when the pipeline itself stops
+        error = RuntimeError("Freightos pipeline stopped")
+        if not task.cancelled() and task.exception() is not None:
+            error = RuntimeError(f"Freightos pipeline stopped: {task.exception()!r}")
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(error)
+        self._waiting.clear()
+
+    @property
+    def running(self) -> bool:
+        """Whether the pipeline still accepts searches."""
+        return not self._task.done()
+
+    async def _searches(self):
+        while True:
+            search, delay_range = await self._queue.get()
+            if self.submitted and delay_range and len(delay_range) >= 2:
+                # Random delay between submissions
+                await asyncio.sleep(random.uniform(delay_range[0], delay_range[1]))
+            self.submitted += 1
+            logger.info(f"Batch {search.batch_id} - Submitting #{self.submitted}: {search.origin_location} -> {search.destination_location} ({search.container})")
+            yield search
+
+    async def _done(self, search: FreightosSearch) -> None:
+        # Guarded handlers turn failures into results, so every search gets here
+        future = self._waiting.pop(id(search), None)
+        if future is not None and not future.done():
+            future.set_result(search)
+
+    async def run(self, location_container_pairs: List[tuple], date: str, delay_range: tuple) -> List[FreightosSearch]:
+        """
+        Feed pairs into the pipeline and wait until all of them are finished.
+
+        Returns:
+            The finished searches, in pair order
+        """
+        if not self.running:
+            raise RuntimeError("Freightos pipeline stopped")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for idx, (origin_location, destination_location, container) in enumerate(location_container_pairs):
+            search = FreightosSearch(origin_location, destination_location, container, date, os.getpid(), index=idx)
+            future = loop.create_future()
+            self._waiting[id(search)] = future
+            futures.append(future)
+            self._queue.put_nowait((search, delay_range))
+        return list(await asyncio.gather(*futures))
+
+
+_freightos_pipeline: Optional[FreightosPipeline] = None
+_freightos_pipeline_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_freightos_pipeline() -> FreightosPipeline:
+    """Return the Freightos pipeline for the running event loop, starting it if needed."""
+    global _freightos_pipeline, _freightos_pipeline_loop
+    
+    loop = asyncio.get_running_loop()
+    if _freightos_pipeline is None or _freightos_pipeline_loop is not loop or not _freightos_pipeline.running:
+        _freightos_pipeline = FreightosPipeline()
+        _freightos_pipeline_loop = loop
+    return _freightos_pipeline
+
+
+async def process_freightos_unit(
+    location_container_pairs: List[tuple],
+    date: str,
+    delay_range: tuple
 ) -> List[Dict[str, Any]]:
     """
-    Asynchronously compute a batch of Freightos location+container pairs.
-    Enhanced with comprehensive error handling and COMPLETE data consistency.
-    SAVES ALL COMBINATIONS - successful and failed - for complete dataset analysis.
-    TIME-BASED CHECKPOINTING: Saves every 5 minutes regardless of result count.
+    Work-queue handler: fetch one small unit of Freightos pairs through the
+    worker's long-lived pipeline. Checkpointing is left to the parent.
+
+    Args:
+        location_container_pairs: (origin, destination, container) tuples
+        date: Shipping date in YYYY-MM-DD format
+        delay_range: Tuple of (min, max) seconds between requests
+
+    Returns:
+        Result entries of every pair in the unit, in pair order
     """
-    from datetime import datetime
-    import os
-    import json
+    searches = await get_freightos_pipeline().run(location_container_pairs, date, delay_range)
     
     results = []
-    total_pairs = len(location_container_pairs)
-    successful_count = 0
-    failed_count = 0
+    for search in searches:
+        results.extend(search.results)
+    return results
+
+
+FREIGHTOS_RESULT_LOG_DIR = os.getenv("FREIGHTOS_RESULT_LOG_DIR", "freightos_checkpoints/result_log")
+FREIGHTOS_MASTER_INTERVAL = float(os.getenv("FREIGHTOS_MASTER_INTERVAL", "900"))  # Seconds between master rebuilds
+# Rows with the same route, container and price are the same result in the master files
+FREIGHTOS_MASTER_KEY_FIELDS = ("city_of_origin", "city_of_destination", "container_type", "price_of_shipping")
+
+_freightos_result_log: Optional[ResultLog] = None
+
+
+def get_freightos_result_log() -> ResultLog:
+    """Return this process's handle on the shared Freightos result log."""
+    global _freightos_result_log
     
-    # TIME-BASED CHECKPOINTING: Track last save time
-    last_checkpoint_time = datetime.now()
-    checkpoint_interval_minutes = 5  # Save every 5 minutes
+    if _freightos_result_log is None:
+        _freightos_result_log = ResultLog(FREIGHTOS_RESULT_LOG_DIR, FREIGHTOS_MASTER_KEY_FIELDS)
+    return _freightos_result_log
+
+
+def materialize_freightos_master(
+    min_interval: float = 0.0,
+    skip_unchanged: bool = True,
+    output_dir: str = "freightos_checkpoints",
+    result_log: Optional[ResultLog] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Write the MASTER_ALL_RESULTS JSON/CSV/Excel files from the result log.
     
-    logger.info(f"Batch {batch_id} - Processing {total_pairs} location+container pairs with COMPLETE data saving (success + errors)")
-    logger.info(f"Batch {batch_id} - Time-based checkpointing every {checkpoint_interval_minutes} minutes")
+    Only one process at a time rebuilds them (see ResultLog.claim_compaction);
+    the others return right away. The previous master files are removed once
+    the new ones are written.
     
-    for idx, (origin_location, destination_location, container) in enumerate(location_container_pairs, 1):
-        logger.info(f"Batch {batch_id} - Processing {idx}/{total_pairs}: {origin_location} -> {destination_location} ({container})")
-        
-        result = None
-        polling_attempts = 0
-        
-        try:
-            # Get location data with error handling
-            origin_data = FREIGHTOS_LOCATIONS.get(origin_location)
-            destination_data = FREIGHTOS_LOCATIONS.get(destination_location)
-            
-            if not origin_data:
-                logger.warning(f"Batch {batch_id} - Origin location '{origin_location}' not found")
-                result = create_freightos_empty_result(
-                    origin_location, destination_location, date, container,
-                    error_type="location_not_found", 
-                    error_message=f"Origin location '{origin_location}' not found in FREIGHTOS_LOCATIONS",
-                    has_polling_url=False, polling_attempts=0
-                )
-                failed_count += 1
-                
-            elif not destination_data:
-                logger.warning(f"Batch {batch_id} - Destination location '{destination_location}' not found")
-                result = create_freightos_empty_result(
-                    origin_location, destination_location, date, container,
-                    error_type="location_not_found", 
-                    error_message=f"Destination location '{destination_location}' not found in FREIGHTOS_LOCATIONS",
-                    has_polling_url=False, polling_attempts=0
-                )
-                failed_count += 1
-                
-            else:
-                # Step 1: Make initial request to get polling URL
-                polling_url = None
-                try:
-                    polling_url = await make_freightos_initial_request(
-                        origin_data["locationCode"], origin_data["countryID"],
-                        destination_data["locationCode"], destination_data["countryID"],
-                        date, container
-                    )
-                except Exception as e:
-                    logger.error(f"Batch {batch_id} - Error in initial request: {e}")
-                    polling_url = None
-                
-                if not polling_url:
-                    logger.warning(f"Batch {batch_id} - Failed to get polling URL")
-                    result = create_freightos_empty_result(
-                        origin_location, destination_location, date, container,
-                        error_type="no_polling_url", 
-                        error_message="Failed to get polling URL from initial request",
-                        has_polling_url=False, polling_attempts=0
-                    )
-                    failed_count += 1
-                    
-                else:
-                    # Step 2: Poll for quotes with error handling
-                    polling_response = None
-                    result_id = None
-                    try:
-                        polling_response = await make_freightos_polling_request(polling_url)
-                        polling_attempts = 1  # Assuming at least 1 attempt was made
-                    except Exception as e:
-                        logger.error(f"Batch {batch_id} - Error in polling request: {e}")
-                        polling_response = None
-                        polling_attempts = 1
-                    
-                    # Extract quotes_data and result_id from response
-                    quotes_data = None
-                    if polling_response:
-                        quotes_data, result_id = polling_response
-                    
-                    # Step 3: Take screenshot if we have result_id (regardless of quotes)
-                    screenshot_url = None
-                    website_link = None
-                    
-                    if result_id:
-                        try:
-                            # Generate website link using result_id
-                            website_link = f"https://ship.freightos.com/results/{result_id}/"
-                            
-                            logger.info(f"Taking screenshot for result {result_id}")
-                            screenshot_result = await _go(website_link)
-                            
-                            # Enhanced screenshot URL extraction with better logging
-                            logger.info(f"Screenshot result type: {type(screenshot_result)}, value: {screenshot_result}")
-                            
-                            if screenshot_result:
-                                # Try multiple ways to extract the URL
-                                if isinstance(screenshot_result, str) and screenshot_result.startswith('http'):
-                                    screenshot_url = screenshot_result
-                                    logger.info(f"✅ Screenshot captured (string): {screenshot_url}")
-                                elif hasattr(screenshot_result, 'url') and screenshot_result.url:
-                                    screenshot_url = screenshot_result.url
-                                    logger.info(f"✅ Screenshot captured (object.url): {screenshot_url}")
-                                elif isinstance(screenshot_result, dict) and 'screenshot_url' in screenshot_result:
-                                    screenshot_url = screenshot_result['screenshot_url']
-                                    logger.info(f"✅ Screenshot captured (screenshot_url): {screenshot_url}")
-                                elif isinstance(screenshot_result, dict) and 'url' in screenshot_result:
-                                    screenshot_url = screenshot_result['url']
-                                    logger.info(f"✅ Screenshot captured (dict url): {screenshot_url}")
-                                else:
-                                    # Try to convert to string if it contains URL-like content
-                                    str_result = str(screenshot_result)
-                                    if 'https://' in str_result and '.amazonaws.com' in str_result:
-                                        # Extract URL from string representation
-                                        url_match = re.search(r'(https://[^\s]+amazonaws\.com[^\s]*\.png)', str_result)
-                                        if url_match:
-                                            screenshot_url = url_match.group(1)
-                                            logger.info(f"✅ Screenshot captured (extracted): {screenshot_url}")
-                                        else:
-                                            logger.warning(f"⚠️ Screenshot result contains AWS URL but couldn't extract: {str_result}")
-                                    else:
-                                        logger.warning(f"⚠️ Screenshot failed - unrecognized format: {type(screenshot_result)} = {screenshot_result}")
-                            else:
-                                logger.warning(f"⚠️ Screenshot failed - empty result returned")
-                        
-                        except Exception as screenshot_error:
-                            logger.warning(f"⚠️ Screenshot failed for {origin_location} -> {destination_location}: {screenshot_error}")
-                            # Continue processing even if screenshot fails
-                    else:
-                        logger.warning(f"Batch {batch_id} - No result_id available for screenshot")
-                    
-                    # Step 4: Process the response - ALWAYS create results (potentially multiple)
-                    if quotes_data:
-                        # NEW: Process ALL quotes, not just the first one
-                        batch_results = create_freightos_result_entries(
-                            origin_location, destination_location, quotes_data, date, container,
-                            screenshot_url, website_link
-                        )
-                        
-                        # Process each quote result
-                        success_quotes = 0
-                        for result in batch_results:
-                            if result and result.get("request_status") == "success":
-                                success_quotes += 1
-                                logger.info(f"Batch {batch_id} - ✅ Quote {result.get('quote_number', 1)}/{result.get('total_quotes_available', 1)}: {origin_location} -> {destination_location} (${result.get('price_of_shipping')}) via {result.get('carrier', 'Unknown')}")
-                            results.append(result)
-                        
-                        if success_quotes > 0:
-                            successful_count += 1
-                            logger.info(f"Batch {batch_id} - 🎯 Total: {success_quotes} valid quotes found for {origin_location} -> {destination_location}")
-                        else:
-                            failed_count += 1
-                            logger.warning(f"Batch {batch_id} - ⚠️ No valid pricing data in any quotes")
-                    else:
-                        logger.warning(f"Batch {batch_id} - No quotes returned after polling")
-                        result = create_freightos_empty_result(
-                            origin_location, destination_location, date, container,
-                            error_type="no_quotes", 
-                            error_message="No quotes returned after polling retries",
-                            has_polling_url=True, polling_attempts=polling_attempts,
-                            screenshot_url=screenshot_url, website_link=website_link
-                        )
-                        results.append(result)
-                        failed_count += 1
-            
-        except Exception as e:
-            logger.error(f"Batch {batch_id} - Critical error: {e}")
-            result = create_freightos_empty_result(
-                origin_location, destination_location, date, container,
-                error_type="critical_error", 
-                error_message=str(e),
-                has_polling_url=False, polling_attempts=polling_attempts
-            )
-            results.append(result)
-            failed_count += 1
-        
-        # TIME-BASED CHECKPOINTING: Save every 5 minutes if we have any data
-        current_time = datetime.now()
-        time_since_last_checkpoint = (current_time - last_checkpoint_time).total_seconds() / 60
-        
-        if time_since_last_checkpoint >= checkpoint_interval_minutes and len(results) > 0:
-            try:
-                # Save results to multiple formats
-                timestamp = current_time.strftime("%Y%m%d_%H%M%S")
-                base_filename = f"freightos_checkpoints/batch_{batch_id}_checkpoint_{len(results)}_{timestamp}"
-                
-                # Create directory if it doesn't exist
-                os.makedirs("freightos_checkpoints", exist_ok=True)
-                
-                # Save individual batch files
-                json_file = f"{base_filename}.json"
-                with open(json_file, 'w') as f:
-                    json.dump(results, f, indent=2)
-                
-                csv_file = save_results_to_csv(results, f"{base_filename}.csv")
-                excel_file = save_results_to_excel_basic(results, f"{base_filename}.xlsx")
-                
-                # CENTRALIZED AGGREGATION: Collect ALL results from ALL batches
-                all_results = []
-                
-                # Read all existing batch checkpoint files
-                import glob
-                checkpoint_pattern = "freightos_checkpoints/batch_*_checkpoint_*.json"
-                all_checkpoint_files = glob.glob(checkpoint_pattern)
-                
-                for checkpoint_file in all_checkpoint_files:
-                    try:
-                        with open(checkpoint_file, 'r') as f:
-                            batch_data = json.load(f)
-                            if isinstance(batch_data, list):
-                                all_results.extend(batch_data)
-                    except Exception as e:
-                        logger.warning(f"Error reading checkpoint file {checkpoint_file}: {e}")
-                
-                # Remove duplicates based on unique combination of origin, destination, container, price
-                seen = set()
-                unique_results = []
-                for result in all_results:
-                    key = (
-                        result.get('city_of_origin', ''),
-                        result.get('city_of_destination', ''),
-                        result.get('container_type', ''),
-                        result.get('price_of_shipping', 0)
-                    )
-                    if key not in seen:
-                        seen.add(key)
-                        unique_results.append(result)
-                
-                # Save MASTER aggregated files (single source of truth)
-                if unique_results:
-                    master_timestamp = current_time.strftime("%Y%m%d_%H%M%S")
-                    master_base = f"freightos_checkpoints/MASTER_ALL_RESULTS_{len(unique_results)}_{master_timestamp}"
-                    
-                    # Master JSON
-                    master_json = f"{master_base}.json"
-                    with open(master_json, 'w') as f:
-                        json.dump(unique_results, f, indent=2)
-                    
-                    # Master CSV
-                    master_csv = save_results_to_csv(unique_results, f"{master_base}.csv")
-                    
-                    # Master Excel
-                    master_excel = save_results_to_excel_basic(unique_results, f"{master_base}.xlsx")
-                
-                logger.info(f"💾 Batch {batch_id} - TIME-BASED CHECKPOINT SAVED! {len(results)} batch results:")
-                logger.info(f"   📄 Batch JSON: {json_file}")
-                logger.info(f"   📊 Batch CSV: {csv_file}")
-                logger.info(f"   📈 Batch Excel: {excel_file}")
-                
-                if unique_results:
-                    logger.info(f"🎯 MASTER AGGREGATED FILES UPDATED! {len(unique_results)} total unique results:")
-                    logger.info(f"   📄 Master JSON: {master_json}")
-                    logger.info(f"   📊 Master CSV: {master_csv}")
-                    logger.info(f"   📈 Master Excel: {master_excel}")
-                
-                # Update last checkpoint time
-                last_checkpoint_time = current_time
-                
-            except Exception as e:
-                logger.warning(f"Batch {batch_id} - Time-based checkpoint save failed: {e}")
-        
-        # Random delay between requests (with error handling)
-        try:
-            if delay_range and len(delay_range) >= 2:
-                delay = random.uniform(delay_range[0], delay_range[1])
-                logger.debug(f"Batch {batch_id} - Waiting {delay:.1f} seconds before next request...")
-                await asyncio.sleep(delay)
-        except Exception as delay_error:
-            logger.warning(f"Batch {batch_id} - Error in delay: {delay_error}")
-            # Continue without delay if delay calculation fails
-            pass
+    Args:
+        min_interval: Skip unless this many seconds passed since the last rebuild
+        skip_unchanged: Skip when no rows were logged since the last rebuild
+        output_dir: Directory for the master files
+        result_log: Log to read (default: the shared Freightos result log)
     
-    # FINAL CHECKPOINT: Save any remaining results at batch completion
-    if len(results) > 0:
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            base_filename = f"freightos_checkpoints/batch_{batch_id}_FINAL_{len(results)}_{timestamp}"
-            
-            os.makedirs("freightos_checkpoints", exist_ok=True)
-            
-            # Save individual batch final files
-            json_file = f"{base_filename}.json"
-            with open(json_file, 'w') as f:
-                json.dump(results, f, indent=2)
-            
-            csv_file = save_results_to_csv(results, f"{base_filename}.csv")
-            excel_file = save_results_to_excel_basic(results, f"{base_filename}.xlsx")
-            
-            # CENTRALIZED AGGREGATION: Collect ALL results from ALL batches (including FINAL files)
-            all_results = []
-            
-            # Read all existing batch checkpoint and final files
-            import glob
-            checkpoint_pattern = "freightos_checkpoints/batch_*_checkpoint_*.json"
-            final_pattern = "freightos_checkpoints/batch_*_FINAL_*.json"
-            all_files = glob.glob(checkpoint_pattern) + glob.glob(final_pattern)
-            
-            for file_path in all_files:
-                try:
-                    with open(file_path, 'r') as f:
-                        batch_data = json.load(f)
-                        if isinstance(batch_data, list):
-                            all_results.extend(batch_data)
-                except Exception as e:
-                    logger.warning(f"Error reading file {file_path}: {e}")
-            
-            # Remove duplicates
-            seen = set()
-            unique_results = []
-            for result in all_results:
-                key = (
-                    result.get('city_of_origin', ''),
-                    result.get('city_of_destination', ''),
-                    result.get('container_type', ''),
-                    result.get('price_of_shipping', 0)
-                )
-                if key not in seen:
-                    seen.add(key)
-                    unique_results.append(result)
-            
-            # Save MASTER aggregated files
-            if unique_results:
-                master_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                master_base = f"freightos_checkpoints/MASTER_ALL_RESULTS_{len(unique_results)}_{master_timestamp}"
-                
-                # Master JSON
-                master_json = f"{master_base}.json"
-                with open(master_json, 'w') as f:
-                    json.dump(unique_results, f, indent=2)
-                
-                # Master CSV
-                master_csv = save_results_to_csv(unique_results, f"{master_base}.csv")
-                
-                # Master Excel
-                master_excel = save_results_to_excel_basic(unique_results, f"{master_base}.xlsx")
-            
-            logger.info(f"🏁 Batch {batch_id} - FINAL CHECKPOINT SAVED! {len(results)} batch results:")
-            logger.info(f"   📄 Batch JSON: {json_file}")
-            logger.info(f"   📊 Batch CSV: {csv_file}")
-            logger.info(f"   📈 Batch Excel: {excel_file}")
-            
-            if unique_results:
-                logger.info(f"🎯 MASTER AGGREGATED FILES UPDATED! {len(unique_results)} total unique results:")
-                logger.info(f"   📄 Master JSON: {master_json}")
-                logger.info(f"   📊 Master CSV: {master_csv}")
-                logger.info(f"   📈 Master Excel: {master_excel}")
-            
-        except Exception as e:
-            logger.warning(f"Batch {batch_id} - Final checkpoint save failed: {e}")
+    Returns:
+        Master files by type, or None if this call did not rebuild them
+    """
+    result_log = result_log or get_freightos_result_log()
+    if not result_log.claim_compaction(min_interval, skip_unchanged):
+        return None
     
-    logger.info(f"🎯 Batch {batch_id} - COMPLETED with ALL {len(results)} combinations saved!")
-    logger.info(f"   ✅ Successful quotes: {successful_count}")
-    logger.info(f"   ⚠️  Failed attempts: {failed_count}")
-    logger.info(f"   📊 Total processed: {total_pairs}")
-    logger.info(f"   📈 Success rate: {(successful_count/total_pairs)*100:.1f}%")
+    try:
+        unique_results = result_log.read_rows()
+        if queue_mode_enabled():
+            # Rows are logged once; screenshots captured since then are patched in here
+            reconcile_results(unique_results)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        master_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        master_base = os.path.join(output_dir, f"MASTER_ALL_RESULTS_{len(unique_results)}_{master_timestamp}")
+        
+        master_json = f"{master_base}.json"
+        with open(master_json, 'w') as f:
+            json.dump(unique_results, f, indent=2)
+        outputs = {
+            "json": master_json,
+            "csv": save_results_to_csv(unique_results, f"{master_base}.csv"),
+            "excel": save_results_to_excel_basic(unique_results, f"{master_base}.xlsx"),
+        }
+    except BaseException:
+        result_log.release_compaction()
+        raise
     
-    return results
+    for old_file in result_log.finish_compaction(outputs).values():
+        if old_file and old_file not in outputs.values() and os.path.exists(old_file):
+            os.remove(old_file)
+    
+    logger.info(f"🎯 MASTER AGGREGATED FILES UPDATED! {len(unique_results)} total unique results:")
+    logger.info(f"   📄 Master JSON: {outputs['json']}")
+    logger.info(f"   📊 Master CSV: {outputs['csv']}")
+    logger.info(f"   📈 Master Excel: {outputs['excel']}")
+    return outputs
+
 
 async def compute_freightos_matrix_parallel(
     date: str = "2025-09-01", 
@@ -2799,7 +3433,9 @@ async def compute_freightos_matrix_parallel(
     location_percentage: float = 0.1,
     checkpoint_interval: int = 50,
     resume: bool = True,
-    checkpoint_dir: str = "freightos_checkpoints"
+    checkpoint_dir: str = "freightos_checkpoints",
+    seed: Optional[int] = None,
+    shard: Optional[tuple] = None
 ) -> List[Dict[str, Any]]:
     """
     Compute Freightos shipping matrix using parallel processing with checkpointing.
@@ -2813,6 +3449,8 @@ async def compute_freightos_matrix_parallel(
         checkpoint_interval: Number of results to process before checkpointing
         resume: Whether to resume from existing checkpoint
         checkpoint_dir: Directory to store checkpoint files
+        seed: Seed for the location sample (required for consistent shards across hosts)
+        shard: (index, count) - process only this shard of the combinations
         
     Returns:
         List of dictionaries containing shipping data for each combination
@@ -2845,8 +3483,8 @@ async def compute_freightos_matrix_parallel(
     
     # Get location combinations
     all_locations = list(FREIGHTOS_LOCATIONS.keys())
-    locations_count = int(len(all_locations) * location_percentage)
-    locations = random.sample(all_locations, locations_count)
+    # Seeded sampling picks the same locations on every host of a sharded run
+    locations = sample_keys(all_locations, location_percentage, seed)
     
     # Generate all location pairs with container types (exclude same location combinations)
     all_location_container_pairs = []
@@ -2855,10 +3493,13 @@ async def compute_freightos_matrix_parallel(
             if origin_location != destination_location:
                 for container_type in container_types:
                     all_location_container_pairs.append((origin_location, destination_location, container_type))
+    all_location_container_pairs = shard_combinations(all_location_container_pairs, shard)
     
     logger.info(f"📊 COMBINATION SETUP:")
     logger.info(f"   Total cities available: {len(all_locations)}")
     logger.info(f"   Cities to process: {len(locations)} ({location_percentage*100:.1f}%)")
+    if shard:
+        logger.info(f"   Shard: {shard[0]}/{shard[1]} (seed {seed})")
     logger.info(f"   Expected combinations: {len(all_location_container_pairs)}")
     logger.info(f"   Target for completion: 7,140 combinations ({len(locations)} cities × 70)")
     
@@ -2880,74 +3521,72 @@ async def compute_freightos_matrix_parallel(
         logger.info(f"🎉 FINAL STATS: {progress['completed_combinations']}/{progress['target_combinations']} combinations completed!")
         return checkpoint_manager.total_results
     
-    # Split work into batches for parallel processing
-    batch_size = max(1, len(remaining_pairs) // num_processes)
-    batches = []
-    
-    for i in range(0, len(remaining_pairs), batch_size):
-        batch_pairs = remaining_pairs[i:i + batch_size]
-        batch_data = {
-            'location_container_pairs': batch_pairs,
-            'date': date,
-            'delay_range': delay_range,
-            'batch_id': len(batches) + 1,
-            'checkpoint_manager': checkpoint_manager,
-            'checkpoint_interval': checkpoint_interval
-        }
-        batches.append(batch_data)
-    
-    logger.info(f"Split work into {len(batches)} batches (avg {batch_size} combinations per batch)")
+    # Small units on a shared queue: workers that finish early take over the tail
+    # instead of waiting on one fixed slice full of slow routes
+    units = make_units(remaining_pairs, WORK_UNIT_SIZE)
+    logger.info(f"Split work into {len(units)} units of up to {WORK_UNIT_SIZE} combinations")
     
-    # Process batches in parallel
     total_combinations_processed = 0
     total_successful_quotes = 0
     total_failed_attempts = 0
+    units_done = 0
+    
+    def commit_unit(unit: List[tuple], unit_results: List[Dict[str, Any]]) -> None:
+        nonlocal total_combinations_processed, total_successful_quotes, total_failed_attempts, units_done
+        # Streamed back as units finish; add_result checkpoints every checkpoint_interval results
+        for result in unit_results:
+            checkpoint_manager.add_result(result)
+            if result.get("request_status") == "success":
+                total_successful_quotes += 1
+            else:
+                total_failed_attempts += 1
+        total_combinations_processed += len(unit_results)
+        units_done += 1
+        
+        # Only rows not logged before go into the shared result log; one process at a
+        # time rebuilds the master files, at most every FREIGHTOS_MASTER_INTERVAL seconds
+        try:
+            get_freightos_result_log().append(unit_results)
+            materialize_freightos_master(min_interval=FREIGHTOS_MASTER_INTERVAL)
+        except Exception as e:
+            logger.warning(f"Could not update the Freightos result log: {e}")
+        
+        if units_done % 25 == 0 or units_done == len(units):
+            logger.info(f"✅ Completed {units_done}/{len(units)} units")
+            logger.info(f"   🎯 TOTAL PROGRESS: {total_combinations_processed} combinations processed")
+            if total_combinations_processed:
+                logger.info(f"   📊 Overall Success Rate: {(total_successful_quotes/total_combinations_processed)*100:.1f}%")
     
     try:
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            logger.info("🚀 Starting parallel Freightos processing with COMPLETE data saving...")
-            logger.info("   📊 Every combination will be saved (successful + failed)")
-            
-            # Submit all batches for processing
-            future_to_batch = {executor.submit(process_freightos_location_batch, batch): batch for batch in batches}
-            
-            # Collect results as they complete
-            for future in future_to_batch:
-                try:
-                    batch_results = future.result()
-                    batch_id = future_to_batch[future]['batch_id']
-                    
-                    # Count all results (both successful and failed)
-                    batch_total = len(batch_results) if batch_results else 0
-                    batch_successful = 0
-                    batch_failed = 0
-                    
-                    if batch_results and len(batch_results) > 0:
-                        for result in batch_results:
-                            if result.get("request_status") == "success":
-                                batch_successful += 1
-                                total_successful_quotes += 1
-                            else:
-                                batch_failed += 1
-                                total_failed_attempts += 1
-                        total_combinations_processed += batch_total
-                    
-                    logger.info(f"✅ Completed batch {batch_id}: {batch_total} combinations")
-                    logger.info(f"   📈 Success: {batch_successful}, Failed: {batch_failed}")
-                    logger.info(f"   🎯 TOTAL PROGRESS: {total_combinations_processed} combinations processed")
-                    logger.info(f"   📊 Overall Success Rate: {(total_successful_quotes/total_combinations_processed)*100:.1f}%")
-                    
-                except Exception as e:
-                    batch_id = future_to_batch[future]['batch_id']
-                    logger.error(f"❌ Batch {batch_id} failed: {e}")
+        logger.info("🚀 Starting parallel Freightos processing with COMPLETE data saving...")
+        logger.info("   📊 Every combination will be saved (successful + failed)")
+        # Every lane feeds the worker's one pipeline, which keeps the random
+        # delays between Freightos submissions sequential
+        await run_work_queue(
+            units,
+            partial(process_freightos_unit, date=date, delay_range=delay_range),
+            num_processes,
+            commit_unit,
+            lanes=FREIGHTOS_WORK_LANES
+        )
 
     except KeyboardInterrupt:
-        logger.info("🛑 Process interrupted by user - all data already saved via time-based checkpointing")
+        logger.info("🛑 Process interrupted by user - saving checkpoint...")
+        checkpoint_manager.save_checkpoint(force=True)
         raise
     except Exception as e:
         logger.error(f"❌ Parallel processing error: {e}")
+        checkpoint_manager.save_checkpoint(force=True)
         raise
     
+    checkpoint_manager.save_checkpoint(force=True)
+    # Master files with everything logged by this run
+    try:
+        await asyncio.to_thread(materialize_freightos_master)
+        logger.info(f"🧾 Result log: {get_freightos_result_log().stats()}")
+    except Exception as e:
+        logger.warning(f"Final master rebuild failed: {e}")
+    
     # Final summary with complete statistics
     logger.info("🎉 FREIGHTOS MATRIX COMPUTATION COMPLETED!")
     logger.info("=" * 60)
@@ -2955,17 +3594,13 @@ async def compute_freightos_matrix_parallel(
     logger.info(f"   💾 Total combinations processed: {total_combinations_processed}")
     logger.info(f"   ✅ Successful quotes obtained: {total_successful_quotes}")
     logger.info(f"   ⚠️  Failed attempts (with error details): {total_failed_attempts}")
-    logger.info(f"   📈 Overall success rate: {(total_successful_quotes/total_combinations_processed)*100:.1f}%")
+    if total_combinations_processed:
+        logger.info(f"   📈 Overall success rate: {(total_successful_quotes/total_combinations_processed)*100:.1f}%")
     logger.info("=" * 60)
-    logger.info("📁 All data has been automatically saved via time-based checkpointing")
-    logger.info("📄 Check freightos_checkpoints/ directory for:")
-    logger.info("   • Individual batch files (JSON, CSV, Excel)")
-    logger.info("   • Master aggregated files (all results combined)")
-    logger.info("   • Complete dataset with success and error tracking")
+    logger.info(f"📁 All results are checkpointed in {checkpoint_manager.checkpoint_dir}/")
     logger.info("=" * 60)
     
-    # Return empty list since results are already saved in checkpoint files
-    return []
+    return checkpoint_manager.total_results
 
 
 def generate_biased_monthly_dates(
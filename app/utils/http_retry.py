@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Retry Layer
+
+One retry policy for the Searates, Freightos, Kiwi and Booking clients.
+Callers wrap a single attempt in ``request_with_retry(url, send)``; every
+attempt first waits for the host's token bucket, and failures are sorted into
+two classes:
+
+- retryable: timeouts, dropped connections, truncated or non-JSON bodies and
+  HTTP 408/425/429/500/502/503/504
+- fatal: any other HTTP error status and everything else (bad payloads,
+  rejected queries, programming errors), raised at once
+
+Retryable failures wait for the server's ``Retry-After`` when it sends one -
+pausing the host's rate limiter for everyone, not just this request - and
+otherwise back off exponentially with full jitter. Each host has a retry
+budget: HTTP_RETRY_BUDGET_MIN retries in a burst, refilled by
+HTTP_RETRY_BUDGET_RATIO per request, so an outage turns into fast failures
+instead of a retry storm.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from app.utils.rate_limiter import acquire_request_slot, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+HTTP_RETRY_MAX_ATTEMPTS = int(os.getenv("HTTP_RETRY_MAX_ATTEMPTS", "4"))
+HTTP_RETRY_BASE_DELAY = float(os.getenv("HTTP_RETRY_BASE_DELAY", "1.0"))
+HTTP_RETRY_MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", "60"))
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "300"))  # Longer Retry-After values are capped
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.2"))
+HTTP_RETRY_BUDGET_MIN = int(os.getenv("HTTP_RETRY_BUDGET_MIN", "10"))
+
+
+class HTTPStatusFailure(Exception):
+    """An HTTP response with an error status."""
+
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status} from {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUSES
+
+
+class RetryBudgetExhausted(Exception):
+    """A retryable failure that was not retried because the host's retry budget is spent."""
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header (delay in seconds or an HTTP date) into seconds to wait.
+
+    Returns:
+        Seconds, capped at HTTP_RETRY_AFTER_MAX, or None if absent or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - (now if now is not None else time.time())
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), HTTP_RETRY_AFTER_MAX)
+
+
+def check_status(url: str, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+    """
+    Raise ``HTTPStatusFailure`` for a 4xx/5xx response, carrying its Retry-After.
+
+    Args:
+        url: Requested URL (for the error message and host)
+        status: Response status code
+        headers: Response headers
+    """
+    if status >= 400:
+        raise HTTPStatusFailure(url, status, parse_retry_after((headers or {}).get("Retry-After")))
+
+
+def classify_failure(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Sort a failed attempt into retryable or fatal.
+
+    Returns:
+        (retryable, seconds the server asked us to wait or None)
+    """
+    if isinstance(error, HTTPStatusFailure):
+        return error.retryable, error.retry_after
+    if HTTPX_AVAILABLE:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status in RETRYABLE_STATUSES, parse_retry_after(error.response.headers.get("Retry-After"))
+        if isinstance(error, httpx.TransportError):
+            return True, None
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, ConnectionError)):
+        return True, None
+    if isinstance(error, (json.JSONDecodeError, aiohttp.ContentTypeError)):
+        # Truncated bodies and HTML error pages from proxies in front of the API
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt: int, base_delay: float = HTTP_RETRY_BASE_DELAY, max_delay: float = HTTP_RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """
+    Per-host retry allowance.
+
+    Holds up to ``minimum`` retries; every request adds ``ratio`` of a retry
+    back, so sustained retries stay at ``ratio`` of the request rate.
+    """
+
+    def __init__(self, ratio: float = HTTP_RETRY_BUDGET_RATIO, minimum: int = HTTP_RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.capacity = max(1.0, float(minimum))
+        self._balance = self.capacity
+
+        # Stats
+        self.requests = 0
+        self.retries = 0
+        self.denied = 0
+        self.retry_after_waits = 0
+
+    def on_request(self) -> None:
+        self.requests += 1
+        self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False when it is spent."""
+        if self._balance < 1.0:
+            self.denied += 1
+            return False
+        self._balance -= 1.0
+        self.retries += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "denied": self.denied,
+            "retry_after_waits": self.retry_after_waits,
+        }
+
+
+# Per-process budgets by host
+_budgets: Dict[str, RetryBudget] = {}
+
+
+def get_retry_budget(url: str) -> RetryBudget:
+    """Return the retry budget of ``url``'s host."""
+    host = (urlsplit(url).hostname or url).lower()
+    budget = _budgets.get(host)
+    if budget is None:
+        budget = _budgets[host] = RetryBudget()
+    return budget
+
+
+def retry_stats() -> Dict[str, Dict[str, Any]]:
+    """Return retry counters of every host this process talked to."""
+    return {host: budget.stats() for host, budget in _budgets.items()}
+
+
+async def request_with_retry(
+    url: str,
+    send: Callable[[], Awaitable[T]],
+    max_attempts: Optional[int] = None,
+    base_delay: Optional[float] = None,
+    max_retry_after: Optional[float] = None
+) -> T:
+    """
+    Run ``send()`` - one complete HTTP attempt - until it succeeds or fails for good.
+
+    ``send`` must raise on failure: call ``check_status`` (aiohttp) or
+    ``raise_for_status()`` (httpx) before reading the body.
+
+    Args:
+        url: Requested URL; its host selects the rate limiter and retry budget
+        send: Coroutine function performing one attempt
+        max_attempts: Attempts in total (default: HTTP_RETRY_MAX_ATTEMPTS)
+        base_delay: First backoff step in seconds (default: HTTP_RETRY_BASE_DELAY)
+        max_retry_after: Longest Retry-After this caller waits for; a longer one
+            raises the failure at once (default: HTTP_RETRY_AFTER_MAX). The host
+            is paused for the full Retry-After either way
+
+    Returns:
+        Whatever ``send`` returned
+
+    Raises:
+        The fatal error, the last retryable error once attempts run out, or
+        RetryBudgetExhausted when the host's retry budget is spent
+    """
+    max_attempts = max(1, max_attempts or HTTP_RETRY_MAX_ATTEMPTS)
+    base_delay = HTTP_RETRY_BASE_DELAY if base_delay is None else base_delay
+    budget = get_retry_budget(url)
+
+    for attempt in range(1, max_attempts + 1):
+        # Per-host token bucket paces retries like any other request
+        await acquire_request_slot(url)
+        budget.on_request()
+        try:
+            return await send()
+        except Exception as e:
+            retryable, retry_after = classify_failure(e)
+            if retryable and retry_after is not None:
+                # The server asked the whole host to slow down, not just this request
+                bucket = get_rate_limiter(url)
+                if bucket is not None:
+                    bucket.pause(retry_after)
+            if not retryable or attempt == max_attempts:
+                raise
+            if retry_after is not None and max_retry_after is not None and retry_after > max_retry_after:
+                # Waiting would outlive the caller's own deadline
+                raise
+            if not budget.try_spend():
+                raise RetryBudgetExhausted(f"Retry budget for {urlsplit(url).hostname} spent, giving up: {e}") from e
+
+            if retry_after is not None:
+                budget.retry_after_waits += 1
+                delay = retry_after + random.uniform(0, base_delay)
+            else:
+                delay = backoff_delay(attempt, base_delay)
+            logger.warning(f"Attempt {attempt}/{max_attempts} for {url} failed, retrying in {delay:.2f}s: {e}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Session for API Calls
+
+One ``aiohttp.ClientSession`` per process and event loop, reused by every
+Searates GraphQL request instead of opening a new session (and a new DNS
+lookup, TCP connection and TLS handshake) for each POST. The connector keeps
+idle connections alive between requests and caches DNS answers.
+
+APIs that need their own connection limits or default headers (Freightos:
+cookie and JSON headers) get a named session from ``get_named_http_session``,
+likewise one per process and event loop.
+
+The sessions are closed by ``release_screenshot_resources`` together with the
+other pooled resources, so worker entry points wrapped in
+``run_with_screenshot_resources`` shut them down cleanly.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+import aiohttp
+from aiohttp.abc import AbstractCookieJar
+
+logger = logging.getLogger(__name__)
+
+# Connector sizing and lifetimes
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))               # Open connections in total
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "0"))         # 0 = only the total limit applies
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "300"))  # aiohttp's default total timeout
+
+
+def make_http_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    per_host: int = HTTP_POOL_PER_HOST,
+    keepalive_seconds: float = HTTP_KEEPALIVE_SECONDS,
+    dns_cache_seconds: int = HTTP_DNS_CACHE_SECONDS,
+    timeout_seconds: float = HTTP_TIMEOUT_SECONDS,
+    headers: Optional[Mapping[str, str]] = None,
+    cookie_jar: Optional[AbstractCookieJar] = None
+) -> aiohttp.ClientSession:
+    """
+    Create a ClientSession with a pooled, keep-alive connector.
+
+    Args:
+        pool_size: Maximum open connections
+        per_host: Maximum open connections per host (0 = no per-host cap)
+        keepalive_seconds: How long idle connections are kept for reuse
+        dns_cache_seconds: How long resolved addresses are cached
+        timeout_seconds: Total timeout per request
+        headers: Default headers sent with every request
+        cookie_jar: Cookie jar (default: a regular jar collecting response cookies)
+
+    Returns:
+        A new ClientSession; the caller owns it and must close it
+    """
+    connector = aiohttp.TCPConnector(
+        limit=pool_size,
+        limit_per_host=per_host,
+        keepalive_timeout=keepalive_seconds,
+        ttl_dns_cache=dns_cache_seconds,
+        use_dns_cache=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout_seconds),
+        headers=headers,
+        cookie_jar=cookie_jar,
+    )
+
+
+# Per-process session, bound to the event loop that created it
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared session for the running event loop, creating it if needed."""
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session_loop is not loop or _session.closed:
+        _session = make_http_session()
+        _session_loop = loop
+        logger.debug(
+            f"Opened shared HTTP session: pool {HTTP_POOL_SIZE} "
+            f"(per host {HTTP_POOL_PER_HOST or 'unlimited'}), keep-alive {HTTP_KEEPALIVE_SECONDS}s"
+        )
+    return _session
+
+
+# Named per-process sessions: name -> (session, event loop that created it)
+_named_sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+
+
+def get_named_http_session(name: str, factory: Callable[[], aiohttp.ClientSession]) -> aiohttp.ClientSession:
+    """
+    Return the session registered under ``name`` for the running event loop.
+
+    Args:
+        name: Session name, e.g. "freightos"
+        factory: Creates the session (typically via ``make_http_session``) when
+            there is none yet for this event loop
+
+    Returns:
+        The shared session; close it with ``close_http_session``
+    """
+    loop = asyncio.get_running_loop()
+    session, session_loop = _named_sessions.get(name, (None, None))
+    if session is None or session_loop is not loop or session.closed:
+        session = factory()
+        _named_sessions[name] = (session, loop)
+        logger.debug(f"Opened HTTP session '{name}'")
+    return session
+
+
+async def close_http_session() -> None:
+    """Close the shared and named sessions owned by the running event loop, if any."""
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is not None and _session_loop is loop and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+    for name, (session, session_loop) in list(_named_sessions.items()):
+        if session_loop is loop and not session.closed:
+            await session.close()
+        del _named_sessions[name]
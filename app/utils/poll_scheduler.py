@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Multiplexed Poll Scheduler
+
+Asynchronous searches (Freightos quotes) hand back a polling URL and fill in
+their results a few seconds later. Instead of one coroutine per search
+sleeping a fixed interval between polls, one scheduler per event loop keeps
+every outstanding URL in a timer heap and fires each poll when it is due, at
+most ``concurrency`` requests at a time, so hundreds of searches can be in
+flight while the caller moves on.
+
+Intervals adapt to how fast results usually arrive: the first poll goes out
+at the POLL_FIRST_QUANTILE of recently observed ready times, later polls aim
+at the median and then back off geometrically (POLL_BACKOFF) between
+POLL_MIN_INTERVAL and POLL_MAX_INTERVAL. A URL that is still not ready after
+POLL_TIMEOUT seconds is finished with its last response.
+
+Finished searches resolve the future returned by ``submit`` and, when an
+output queue is given, are put on it as ``(context, outcome)`` for the next
+stage.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import statistics
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "16"))
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "1.0"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "10.0"))
+POLL_DEFAULT_READY_SECONDS = float(os.getenv("POLL_DEFAULT_READY_SECONDS", "3.0"))  # Until enough samples exist
+POLL_FIRST_QUANTILE = float(os.getenv("POLL_FIRST_QUANTILE", "0.25"))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", "1.5"))
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", "15.0"))
+
+# Ready-time samples kept, and needed before they replace the default
+_SAMPLE_WINDOW = 256
+_MIN_SAMPLES = 5
+
+
+class _PollEntry:
+    __slots__ = ("url", "context", "output", "future", "submitted", "deadline", "interval", "polls", "last")
+
+    def __init__(self, url: str, context: Any, output: Optional[asyncio.Queue], future: asyncio.Future,
+                 submitted: float, deadline: float):
+        self.url = url
+        self.context = context
+        self.output = output
+        self.future = future
+        self.submitted = submitted
+        self.deadline = deadline
+        self.interval = POLL_MIN_INTERVAL
+        self.polls = 0
+        self.last = None
+
+
+class PollScheduler:
+    """
+    Polls many URLs from one timer loop with adaptive per-URL intervals.
+
+    Args:
+        fetch: Coroutine function ``fetch(url) -> response`` doing one poll;
+            it raises when the request failed for good
+        parse: ``parse(response) -> (ready, outcome)``; ``outcome`` is what
+            the search finishes with when ready or timed out
+        concurrency: Polls in flight at most
+        timeout: Seconds after submission before a search is finished with
+            its last outcome
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Any]],
+        parse: Callable[[Any], tuple],
+        concurrency: int = POLL_CONCURRENCY,
+        timeout: float = POLL_TIMEOUT
+    ):
+        self.fetch = fetch
+        self.parse = parse
+        self.timeout = timeout
+        self._loop = asyncio.get_running_loop()
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._ready_times: deque = deque(maxlen=_SAMPLE_WINDOW)
+
+        # Stats
+        self.submitted = 0
+        self.polls = 0
+        self.ready = 0
+        self.timed_out = 0
+        self.failed = 0
+
+    @property
+    def outstanding(self) -> int:
+        return self.submitted - self.ready - self.timed_out - self.failed
+
+    def submit(
+        self,
+        url: str,
+        context: Any = None,
+        output: Optional[asyncio.Queue] = None,
+        timeout: Optional[float] = None
+    ) -> asyncio.Future:
+        """
+        Start polling ``url``.
+
+        Args:
+            url: Polling URL
+            context: Passed through to ``output`` with the outcome
+            output: Queue that receives ``(context, outcome)`` when the search finishes
+            timeout: Seconds until the search is finished with its last response
+                (default: the scheduler's timeout)
+
+        Returns:
+            Future resolving to the outcome, or None if polling failed
+        """
+        now = self._loop.time()
+        deadline = now + (self.timeout if timeout is None else timeout)
+        entry = _PollEntry(url, context, output, self._loop.create_future(), now, deadline)
+        self.submitted += 1
+        # A deadline shorter than the first delay still gets its one poll at the deadline
+        self._schedule(entry, now + min(self._first_delay(), deadline - now))
+        return entry.future
+
+    async def poll(self, url: str, timeout: Optional[float] = None) -> Any:
+        """Poll ``url`` until it is ready or times out and return its outcome."""
+        return await self.submit(url, timeout=timeout)
+
+    def _quantile(self, q: float) -> float:
+        if len(self._ready_times) < _MIN_SAMPLES:
+            return POLL_DEFAULT_READY_SECONDS
+        samples = sorted(self._ready_times)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def _first_delay(self) -> float:
+        return min(POLL_MAX_INTERVAL, max(POLL_MIN_INTERVAL, self._quantile(POLL_FIRST_QUANTILE)))
+
+    def _next_delay(self, entry: _PollEntry, now: float) -> float:
+        elapsed = now - entry.submitted
+        expected = self._quantile(0.5)
+        if elapsed < expected:
+            # Most searches are ready by the median - poll again then
+            delay = expected - elapsed
+        else:
+            entry.interval = min(POLL_MAX_INTERVAL, entry.interval * POLL_BACKOFF)
+            delay = entry.interval
+        delay = min(POLL_MAX_INTERVAL, max(POLL_MIN_INTERVAL, delay))
+        # Always get one last poll in at the deadline
+        return min(delay, max(0.0, entry.deadline - now))
+
+    def _schedule(self, entry: _PollEntry, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._order), entry))
+        if self._runner is None or self._runner.done():
+            self._runner = self._loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self._heap:
+            due = self._heap[0][0]
+            wait = due - self._loop.time()
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, entry = heapq.heappop(self._heap)
+            await self._slots.acquire()
+            task = self._loop.create_task(self._poll_once(entry))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _poll_once(self, entry: _PollEntry) -> None:
+        entry.polls += 1
+        self.polls += 1
+        try:
+            response = await self.fetch(entry.url)
+        except Exception as e:
+            logger.warning(f"Polling {entry.url} failed after {entry.polls} polls: {e}")
+            self.failed += 1
+            self._finish(entry, entry.last)
+            return
+        finally:
+            self._slots.release()
+
+        try:
+            ready, outcome = self.parse(response)
+        except Exception as e:
+            logger.warning(f"Could not read poll response of {entry.url}: {e}")
+            ready, outcome = False, entry.last
+        entry.last = outcome if outcome is not None else entry.last
+
+        now = self._loop.time()
+        if ready:
+            self.ready += 1
+            self._ready_times.append(now - entry.submitted)
+            self._finish(entry, outcome)
+        elif now >= entry.deadline:
+            self.timed_out += 1
+            logger.info(f"Polling {entry.url} timed out after {entry.polls} polls - finishing with the last response")
+            self._finish(entry, entry.last)
+        else:
+            self._schedule(entry, now + self._next_delay(entry, now))
+
+    def _finish(self, entry: _PollEntry, outcome: Any) -> None:
+        if not entry.future.done():
+            entry.future.set_result(outcome)
+        if entry.output is not None:
+            try:
+                entry.output.put_nowait((entry.context, outcome))
+            except asyncio.QueueFull:
+                # A bounded downstream queue: wait for room without holding up the timer loop
+                task = self._loop.create_task(entry.output.put((entry.context, outcome)))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and the ready-time estimates polls are timed with."""
+        return {
+            "submitted": self.submitted,
+            "outstanding": self.outstanding,
+            "polls": self.polls,
+            "ready": self.ready,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "polls_per_search": round(self.polls / max(1, self.submitted - self.outstanding), 2),
+            "median_ready_seconds": round(statistics.median(self._ready_times), 2) if self._ready_times else None,
+        }
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Per-Host Token Bucket Rate Limiter
+
+Paces API requests per host instead of sleeping a fixed 2-5 seconds between
+them. Each host has a request rate and a burst size; callers ``await
+acquire()`` before every request and are released in arrival order as
+tokens refill, so any number of concurrent tasks together stay at the rate.
+
+Hosts with a rate of 0 are not paced, but still get a bucket so a
+Retry-After from the server pauses every request to the host.
+
+Rates are host-wide budgets. When the work is split over several processes,
+each one takes an equal share (``configure_rate_limits(share=1 / processes)``),
+so the host still sees the configured total.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Host-wide request budgets: host -> (requests per second, burst); a rate of 0 only pauses
+HOST_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "rates.searates.com": (
+        float(os.getenv("SEARATES_RATE_PER_SECOND", "2.0")),
+        int(os.getenv("SEARATES_RATE_BURST", "4")),
+    ),
+    "ship.freightos.com": (
+        float(os.getenv("FREIGHTOS_RATE_PER_SECOND", "0")),
+        int(os.getenv("FREIGHTOS_RATE_BURST", "4")),
+    ),
+    "api.tequila.kiwi.com": (
+        float(os.getenv("KIWI_RATE_PER_SECOND", "0")),
+        int(os.getenv("KIWI_RATE_BURST", "4")),
+    ),
+    "flights.booking.com": (
+        float(os.getenv("BOOKING_RATE_PER_SECOND", "0")),
+        int(os.getenv("BOOKING_RATE_BURST", "4")),
+    ),
+}
+
+# Fraction of each host budget used by this process
+RATE_LIMIT_SHARE = float(os.getenv("RATE_LIMIT_SHARE", "1.0"))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second, holding at most ``burst``.
+
+    A rate of 0 or less disables pacing; ``pause`` still holds every caller.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+        # Stats
+        self.acquired = 0
+        self.waited_seconds = 0.0
+        self.pauses = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hand out no tokens for ``seconds`` (e.g. the host's Retry-After).
+
+        Banked tokens are dropped and refilling restarts when the pause ends,
+        so waiters resume at the normal rate instead of in one burst.
+        """
+        until = time.monotonic() + seconds
+        if until <= self._paused_until:
+            return
+        self._paused_until = until
+        self._tokens = 0.0
+        self._updated = until
+        self.pauses += 1
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Wait until ``tokens`` are available and take them.
+
+        Returns:
+            Seconds spent waiting
+        """
+        self.acquired += 1
+        started = time.monotonic()
+        if self.rate <= 0:
+            # Pause-only bucket: wait out a Retry-After, otherwise go straight through
+            paused = self._paused_until - started
+            if paused <= 0:
+                return 0.0
+            await asyncio.sleep(paused)
+            waited = time.monotonic() - started
+            self.waited_seconds += waited
+            return waited
+
+        # The lock queues waiters so tokens are handed out first come, first served
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                paused = self._paused_until - time.monotonic()
+                await asyncio.sleep(max(paused, 0.0) + (tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+        waited = time.monotonic() - started
+        self.waited_seconds += waited
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        """Return bucket configuration and usage."""
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.capacity,
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited_seconds, 2),
+            "pauses": self.pauses,
+        }
+
+
+def configure_rate_limits(share: Optional[float] = None) -> None:
+    """
+    Set this process's share of every host budget, for this process and any
+    worker processes started afterwards.
+
+    Values are exported as environment variables so that ProcessPoolExecutor
+    workers pick up the same configuration.
+    """
+    global RATE_LIMIT_SHARE
+
+    if share is not None:
+        RATE_LIMIT_SHARE = max(0.0, min(1.0, share))
+        os.environ["RATE_LIMIT_SHARE"] = str(RATE_LIMIT_SHARE)
+
+
+# Per-process buckets, bound to the event loop that created them
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_rate_limiter(url: str) -> Optional[TokenBucket]:
+    """
+    Return the token bucket for ``url``'s host, or None if the host is not limited.
+
+    Args:
+        url: Any URL on the host (or the bare host name)
+    """
+    global _buckets, _buckets_loop
+
+    loop = asyncio.get_running_loop()
+    if _buckets_loop is not loop:
+        _buckets = {}
+        _buckets_loop = loop
+
+    host = (urlsplit(url).hostname or url).lower()
+    if host not in HOST_RATE_LIMITS:
+        return None
+
+    bucket = _buckets.get(host)
+    if bucket is None:
+        rate, burst = HOST_RATE_LIMITS[host]
+        bucket = TokenBucket(rate * RATE_LIMIT_SHARE, max(1, round(burst * RATE_LIMIT_SHARE)))
+        _buckets[host] = bucket
+        logger.debug(f"Rate limiter for {host}: {bucket.rate:.2f} requests/s, burst {bucket.capacity:.0f}")
+    return bucket
+
+
+async def acquire_request_slot(url: str) -> float:
+    """Wait for the rate limiter of ``url``'s host, if it has one. Returns seconds waited."""
+    bucket = get_rate_limiter(url)
+    if bucket is None:
+        return 0.0
+    return await bucket.acquire()
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Return stats of every bucket created on the current event loop."""
+    return {host: bucket.stats() for host, bucket in _buckets.items()}
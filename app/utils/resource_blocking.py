@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Resource Blocking Profiles for Screenshot Capture
+
+Per-provider ``page.route`` rules that abort requests the screenshot does not
+need: analytics and ad trackers, chat widgets, video/audio and web fonts.
+First-party images and stylesheets are always allowed so the captured page
+looks the same as in a browser.
+
+Warm (reused) contexts cannot use ``context.route`` without losing their HTTP
+cache, so they get the same rules as ``Network.setBlockedURLs`` patterns on
+each page; fonts and media are then matched by file extension.
+
+Every profile can be switched off on its own (``SCREENSHOT_BLOCK_<PROVIDER>=0``)
+or all at once (``SCREENSHOT_BLOCKING_ENABLED=0``).
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_ENABLED = os.getenv("SCREENSHOT_BLOCKING_ENABLED", "1") != "0"
+
+# Analytics, ads, session recording and chat widgets seen on the provider pages
+TRACKER_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "hotjar.io",
+    "clarity.ms",
+    "bat.bing.com",
+    "snap.licdn.com",
+    "ads.linkedin.com",
+    "analytics.tiktok.com",
+    "criteo.com",
+    "criteo.net",
+    "taboola.com",
+    "segment.io",
+    "cdn.segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "fullstory.com",
+    "optimizely.com",
+    "js-agent.newrelic.com",
+    "bam.nr-data.net",
+    "intercom.io",
+    "intercomcdn.com",
+    "widget.intercom.io",
+    "zdassets.com",
+    "driftt.com",
+    "hs-analytics.net",
+    "hs-scripts.com",
+    "hubspot.com",
+    "quantserve.com",
+    "scorecardresearch.com",
+]
+
+BLOCKING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "searates": {
+        "domains": ["searates.com"],
+        "resource_types": {"media", "font"},
+        "blocked_domains": TRACKER_DOMAINS + ["tawk.to", "embed.tawk.to"],
+    },
+    "freightos": {
+        "domains": ["freightos.com"],
+        "resource_types": {"media", "font"},
+        "blocked_domains": TRACKER_DOMAINS + ["heapanalytics.com", "cdn.heapanalytics.com"],
+    },
+    "kiwi": {
+        "domains": ["kiwi.com"],
+        "resource_types": {"media", "font"},
+        "blocked_domains": TRACKER_DOMAINS + ["exponea.com", "api.exponea.com"],
+    },
+    "booking": {
+        "domains": ["booking.com"],
+        "resource_types": {"media", "font"},
+        "blocked_domains": TRACKER_DOMAINS,
+    },
+}
+
+
+# Extensions standing in for the "font" and "media" resource types in URL patterns
+RESOURCE_TYPE_EXTENSIONS = {
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "m3u8", "mp3", "ogg"],
+}
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+def provider_for_url(url: str) -> Optional[str]:
+    """Return the blocking profile name for the provider serving ``url``, if any."""
+    host = (urlsplit(url).hostname or "").lower()
+    for name, profile in BLOCKING_PROFILES.items():
+        if any(_host_matches(host, domain) for domain in profile["domains"]):
+            return name
+    return None
+
+
+def blocking_profile_enabled(provider: str) -> bool:
+    """Return True unless blocking is disabled globally or for ``provider``."""
+    return BLOCKING_ENABLED and os.getenv(f"SCREENSHOT_BLOCK_{provider.upper()}", "1") != "0"
+
+
+def should_block(profile: Dict[str, Any], resource_type: str, request_url: str) -> bool:
+    """Decide whether a request is blocked under ``profile``."""
+    if resource_type in profile["resource_types"]:
+        return True
+    host = (urlsplit(request_url).hostname or "").lower()
+    return any(_host_matches(host, domain) for domain in profile["blocked_domains"])
+
+
+async def apply_resource_blocking(context, url: str, provider: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """
+    Install the provider's blocking rules on a browser context.
+
+    Args:
+        context: Playwright BrowserContext the capture runs in
+        url: Page that is about to be captured (used to pick the profile)
+        provider: Explicit profile name, overriding detection from ``url``
+
+    Returns:
+        Live ``{"blocked", "allowed"}`` request counters, or None when no
+        profile applies or it is switched off
+    """
+    provider = provider or provider_for_url(url)
+    if not provider or not blocking_profile_enabled(provider):
+        return None
+
+    profile = BLOCKING_PROFILES[provider]
+    counters = {"blocked": 0, "allowed": 0}
+
+    async def handle(route):
+        request = route.request
+        if should_block(profile, request.resource_type, request.url):
+            counters["blocked"] += 1
+            await route.abort()
+        else:
+            counters["allowed"] += 1
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    return counters
+
+
+def blocked_url_patterns(profile: Dict[str, Any]) -> List[str]:
+    """Translate a blocking profile into ``Network.setBlockedURLs`` wildcard patterns."""
+    patterns = []
+    for domain in profile["blocked_domains"]:
+        patterns.extend([f"*://{domain}/*", f"*://*.{domain}/*"])
+    for resource_type in sorted(profile["resource_types"]):
+        for ext in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+            patterns.extend([f"*.{ext}", f"*.{ext}?*"])
+    return patterns
+
+
+async def apply_resource_blocking_cdp(page, url: str, provider: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Block the provider's unwanted requests on one page without routing.
+
+    Unlike ``apply_resource_blocking`` this leaves the context's HTTP cache on.
+    Must be called before the page navigates.
+
+    Returns:
+        The blocked URL patterns, or None when no profile applies or it is switched off
+    """
+    provider = provider or provider_for_url(url)
+    if not provider or not blocking_profile_enabled(provider):
+        return None
+
+    patterns = blocked_url_patterns(BLOCKING_PROFILES[provider])
+    session = await page.context.new_cdp_session(page)
+    await session.send("Network.enable")
+    await session.send("Network.setBlockedURLs", {"urls": patterns})
+    return patterns
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Searates Response Cache
+
+Stores raw Searates ``rates`` responses in a local SQLite database shared by
+all worker processes, keyed on the normalized GraphQL query. Re-runs, resumed
+runs and overlapping city samples then answer repeated
+``(pointIdFrom, pointIdTo, date, container)`` lookups without a request.
+
+An entry lives until the earliest ``validityTo`` among its rates, capped at
+SEARATES_CACHE_MAX_TTL_HOURS. Responses without rates use the shorter
+SEARATES_CACHE_EMPTY_TTL_HOURS, so routes that gain rates are picked up again.
+
+Modes (``SEARATES_CACHE_MODE`` or ``--cache-mode``):
+
+- ``use``: answer from the cache when possible and store new responses
+- ``refresh``: always query the API and overwrite the cached responses
+- ``off``: neither read nor write the cache
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("use", "refresh", "off")
+
+CACHE_MODE = os.getenv("SEARATES_CACHE_MODE", "use")
+CACHE_DB_PATH = os.getenv("SEARATES_CACHE_DB", "cache/searates_responses.sqlite3")
+CACHE_MAX_TTL_HOURS = float(os.getenv("SEARATES_CACHE_MAX_TTL_HOURS", "24"))
+CACHE_EMPTY_TTL_HOURS = float(os.getenv("SEARATES_CACHE_EMPTY_TTL_HOURS", "6"))
+
+
+def request_key(query: str) -> str:
+    """Return the cache key of a GraphQL query: SHA-256 of the whitespace-normalized document."""
+    return hashlib.sha256(" ".join(query.split()).encode("utf-8")).hexdigest()
+
+
+def _parse_validity(value: Any) -> Optional[float]:
+    """Parse a ``validityTo`` value (ISO date or datetime) into a timestamp at the end of its validity."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if len(value) <= 10:
+        # A bare date is valid for the whole day
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def expires_at(rates: Optional[List[Dict[str, Any]]], now: Optional[float] = None) -> float:
+    """
+    Return when a cached ``rates`` list goes stale.
+
+    The earliest ``general.validityTo`` wins, capped at the maximum TTL;
+    empty responses use the empty-response TTL.
+    """
+    now = now if now is not None else time.time()
+    if not rates:
+        return now + CACHE_EMPTY_TTL_HOURS * 3600
+
+    expiry = now + CACHE_MAX_TTL_HOURS * 3600
+    for rate in rates:
+        general = rate.get("general") if isinstance(rate, dict) else None
+        validity = _parse_validity((general or {}).get("validityTo"))
+        if validity is not None:
+            expiry = min(expiry, validity)
+    return expiry
+
+
+class ResponseCache:
+    """SQLite-backed cache of raw Searates ``rates`` lists keyed by normalized query."""
+
+    def __init__(self, db_path: str = CACHE_DB_PATH, mode: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: SQLite database file (shared across processes)
+            mode: "use", "refresh" or "off" (default: SEARATES_CACHE_MODE)
+        """
+        mode = mode or CACHE_MODE
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Available: {', '.join(CACHE_MODES)}")
+        self.mode = mode
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    request_key TEXT PRIMARY KEY,
+                    rates TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; lookups run via asyncio.to_thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def reads_enabled(self) -> bool:
+        return self.mode == "use"
+
+    @property
+    def writes_enabled(self) -> bool:
+        return self.mode in ("use", "refresh")
+
+    def lookup(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached ``rates`` list for ``query`` if it has not expired."""
+        if not self.reads_enabled:
+            return None
+
+        row = self._connect().execute(
+            "SELECT rates, expires_at FROM responses WHERE request_key = ?", (request_key(query),)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if row[1] < time.time():
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def store(self, query: str, rates: Optional[List[Dict[str, Any]]]) -> None:
+        """Cache the raw ``rates`` list returned for ``query``."""
+        if not self.writes_enabled:
+            return
+
+        now = time.time()
+        expiry = expires_at(rates, now)
+        if expiry <= now:
+            # Already past its validity - nothing worth keeping
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (request_key, rates, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (request_key(query), json.dumps(rates or []), now, expiry)
+            )
+        self.stores += 1
+
+    def purge_expired(self) -> int:
+        """Delete expired entries."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def configure_response_cache(mode: Optional[str] = None) -> None:
+    """
+    Set the cache mode for this process and any worker processes started afterwards.
+
+    Values are exported as environment variables so that ProcessPoolExecutor
+    workers pick up the same configuration.
+    """
+    global CACHE_MODE, _cache
+
+    if mode is not None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Available: {', '.join(CACHE_MODES)}")
+        CACHE_MODE = mode
+        os.environ["SEARATES_CACHE_MODE"] = mode
+        with _cache_lock:
+            _cache = None
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None when the cache mode is "off"."""
+    global _cache
+
+    if CACHE_MODE == "off":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
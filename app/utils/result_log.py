@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Append-Only Result Log
+
+Checkpoints used to rebuild the combined result set from scratch: every batch
+re-read every checkpoint file ever written, deduplicated them and wrote a new
+master file, so the work grew with the square of the run length and every
+process repeated it.
+
+The log keeps result rows in JSON-lines segments. Each process appends to its
+own segment, rolled over every RESULT_LOG_SEGMENT_ROWS rows. A persistent
+dedup index in SQLite, shared by all processes, holds the key of every row
+already written, so a checkpoint only appends the rows it has not logged
+before. The append is cheap and independent of how much has been logged.
+
+Building the combined view (reading every segment) is left to a compactor.
+``claim_compaction`` hands out a lease to one process at a time, at most once
+per interval and only when new rows were logged. The caller writes the view
+and calls ``finish_compaction``.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+RESULT_LOG_SEGMENT_ROWS = int(os.getenv("RESULT_LOG_SEGMENT_ROWS", "5000"))
+RESULT_LOG_COMPACTION_LEASE = float(os.getenv("RESULT_LOG_COMPACTION_LEASE", "600"))  # Seconds a crashed compactor blocks others
+
+_INDEX_FILE = "index.sqlite3"
+_SEGMENT_GLOB = "segment_*.jsonl"
+
+
+class ResultLog:
+    """Segmented JSON-lines result log with a persistent dedup index."""
+
+    def __init__(self, directory: str, key_fields: Sequence[str], segment_rows: int = RESULT_LOG_SEGMENT_ROWS):
+        """
+        Initialize the log.
+
+        Args:
+            directory: Directory holding the segments and the index (shared across processes and runs)
+            key_fields: Row fields that identify a row for deduplication
+            segment_rows: Rows per segment before a process starts a new one
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.key_fields = tuple(key_fields)
+        self.segment_rows = max(1, segment_rows)
+        self._local = threading.local()
+        self._segment: Optional[Path] = None
+        self._segment_count = 0
+
+        # Stats
+        self.appended = 0
+        self.duplicates = 0
+
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, segment TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.directory / _INDEX_FILE, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def row_key(self, row: Dict[str, Any]) -> str:
+        """Return the dedup key of ``row``."""
+        return json.dumps([row.get(field) for field in self.key_fields], default=str)
+
+    def _next_segment(self) -> Path:
+        if self._segment is None or self._segment_count >= self.segment_rows:
+            self._segment = self.directory / f"segment_{time.time_ns()}_{os.getpid()}.jsonl"
+            self._segment_count = 0
+        return self._segment
+
+    def append(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append the rows whose key is not in the log yet.
+
+        Args:
+            rows: Result rows; rows already logged (by any process) are skipped
+
+        Returns:
+            Number of rows appended
+        """
+        rows = [row for row in rows if isinstance(row, dict)]
+        if not rows:
+            return 0
+
+        segment = self._next_segment()
+        with self._connect() as conn:
+            # Index and segment change together; other processes wait on the lock
+            conn.execute("BEGIN IMMEDIATE")
+            new_rows = []
+            for row in rows:
+                cursor = conn.execute("INSERT OR IGNORE INTO rows (key, segment) VALUES (?, ?)", (self.row_key(row), segment.name))
+                if cursor.rowcount:
+                    new_rows.append(row)
+
+            if new_rows:
+                # A crash after this write leaves rows the index doesn't know;
+                # readers deduplicate again, so they never show up twice
+                with open(segment, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(row, default=str) + "\n" for row in new_rows))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        self._segment_count += len(new_rows)
+        self.appended += len(new_rows)
+        self.duplicates += len(rows) - len(new_rows)
+        return len(new_rows)
+
+    def row_count(self) -> int:
+        """Return the number of distinct rows logged by all processes."""
+        return self._connect().execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def read_rows(self) -> List[Dict[str, Any]]:
+        """Read every logged row, oldest segment first, without duplicates."""
+        seen = set()
+        rows = []
+        for segment in sorted(self.directory.glob(_SEGMENT_GLOB)):
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line of a segment whose writer died mid-append
+                        logger.warning(f"Skipping unreadable line in {segment.name}")
+                        continue
+                    key = self.row_key(row)
+                    if key not in seen:
+                        seen.add(key)
+                        rows.append(row)
+        return rows
+
+    def _get_meta(self, conn: sqlite3.Connection, name: str, default: Any = None) -> Any:
+        row = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, conn: sqlite3.Connection, name: str, value: Any) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    def claim_compaction(self, min_interval: float = 0.0, skip_unchanged: bool = True) -> bool:
+        """
+        Try to become the process that materializes the combined view.
+
+        Args:
+            min_interval: Seconds that must have passed since the last compaction
+            skip_unchanged: Decline when no rows were logged since the last compaction
+
+        Returns:
+            True if this process holds the compaction lease and should call
+            ``finish_compaction`` (or ``release_compaction`` on failure)
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self._get_meta(conn, "compacting_until", 0.0) > now:
+                return False
+            if now - self._get_meta(conn, "compacted_at", 0.0) < min_interval:
+                return False
+            rows = self.row_count()
+            if skip_unchanged and self._get_meta(conn, "compacted_rows") == rows:
+                return False
+            self._set_meta(conn, "compacting_until", now + RESULT_LOG_COMPACTION_LEASE)
+            # Rows logged while the view is written are picked up next time
+            self._set_meta(conn, "claimed_rows", rows)
+        return True
+
+    def finish_compaction(self, outputs: Dict[str, str]) -> Dict[str, str]:
+        """
+        Record a finished compaction and release the lease.
+
+        Args:
+            outputs: Files of the new view by type
+
+        Returns:
+            Files of the previous view, which the caller may delete
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            previous = self._get_meta(conn, "outputs", {})
+            self._set_meta(conn, "compacted_at", time.time())
+            self._set_meta(conn, "compacted_rows", self._get_meta(conn, "claimed_rows"))
+            self._set_meta(conn, "outputs", outputs)
+            self._set_meta(conn, "compacting_until", 0.0)
+        return previous
+
+    def release_compaction(self) -> None:
+        """Release the compaction lease after a failed compaction."""
+        with self._connect() as conn:
+            self._set_meta(conn, "compacting_until", 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return logged rows, segments and this process's append counters."""
+        return {
+            "rows": self.row_count(),
+            "segments": sum(1 for _ in self.directory.glob(_SEGMENT_GLOB)),
+            "appended": self.appended,
+            "duplicates": self.duplicates,
+        }
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Route Health Store
+
+Many Searates city pairs never return rates, yet every run still spends a
+GraphQL call and a fallback-page screenshot on them. This store records the
+outcome of every (origin, destination, container) combination - ``success``,
+``empty`` or ``error`` - in a local SQLite database shared by all worker
+processes, across runs and shipping dates.
+
+A route that came back empty ROUTE_EMPTY_STREAK times in a row is treated as
+chronically empty: it is not probed again for ROUTE_REPROBE_HOURS, an interval
+that doubles with every further empty probe up to ROUTE_REPROBE_MAX_HOURS.
+When a re-probe is due the route is scheduled after all healthy routes. Any
+success clears the streak; errors are transient and leave it unchanged.
+
+``--force-all`` (or ``ROUTE_HEALTH_FORCE_ALL=1``) schedules every combination
+in its original order, while outcomes are still recorded.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("success", "empty", "error")
+
+ROUTE_HEALTH_ENABLED = os.getenv("ROUTE_HEALTH_ENABLED", "1") == "1"
+ROUTE_HEALTH_DB_PATH = os.getenv("ROUTE_HEALTH_DB", "cache/route_health.sqlite3")
+ROUTE_HEALTH_FORCE_ALL = os.getenv("ROUTE_HEALTH_FORCE_ALL", "0") == "1"
+ROUTE_EMPTY_STREAK = int(os.getenv("ROUTE_EMPTY_STREAK", "3"))
+ROUTE_REPROBE_HOURS = float(os.getenv("ROUTE_REPROBE_HOURS", "72"))
+ROUTE_REPROBE_MAX_HOURS = float(os.getenv("ROUTE_REPROBE_MAX_HOURS", "720"))
+
+
+def reprobe_after(empty_streak: int) -> float:
+    """Return the seconds until a route with ``empty_streak`` empty probes in a row is probed again."""
+    if empty_streak < ROUTE_EMPTY_STREAK:
+        return 0.0
+    hours = ROUTE_REPROBE_HOURS * 2 ** (empty_streak - ROUTE_EMPTY_STREAK)
+    return min(hours, ROUTE_REPROBE_MAX_HOURS) * 3600
+
+
+class RouteHealthStore:
+    """SQLite-backed outcome history per (origin, destination, container) route."""
+
+    def __init__(self, db_path: str = ROUTE_HEALTH_DB_PATH):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: SQLite database file (shared across processes and runs)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        # Stats
+        self.recorded = {outcome: 0 for outcome in OUTCOMES}
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS routes (
+                    origin TEXT NOT NULL,
+                    destination TEXT NOT NULL,
+                    container TEXT NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    empties INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0,
+                    empty_streak INTEGER NOT NULL DEFAULT 0,
+                    last_outcome TEXT,
+                    last_seen REAL,
+                    next_probe_at REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (origin, destination, container)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; records are written via asyncio.to_thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, origin: str, destination: str, container: str, outcome: str) -> None:
+        """
+        Record the outcome of one probe of a route.
+
+        Args:
+            origin: Origin city
+            destination: Destination city
+            container: Container type
+            outcome: "success", "empty" or "error"
+        """
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown route outcome '{outcome}'. Available: {', '.join(OUTCOMES)}")
+
+        now = time.time()
+        with self._connect() as conn:
+            # Read-modify-write of the streak; other worker processes wait on the lock
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT empty_streak, next_probe_at FROM routes WHERE origin = ? AND destination = ? AND container = ?",
+                (origin, destination, container)
+            ).fetchone()
+            empty_streak, next_probe_at = row if row else (0, 0.0)
+
+            if outcome == "success":
+                empty_streak, next_probe_at = 0, 0.0
+            elif outcome == "empty":
+                empty_streak += 1
+                delay = reprobe_after(empty_streak)
+                next_probe_at = now + delay if delay else 0.0
+
+            conn.execute("""
+                INSERT INTO routes (origin, destination, container, successes, empties, errors,
+                                    empty_streak, last_outcome, last_seen, next_probe_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (origin, destination, container) DO UPDATE SET
+                    successes = successes + excluded.successes,
+                    empties = empties + excluded.empties,
+                    errors = errors + excluded.errors,
+                    empty_streak = excluded.empty_streak,
+                    last_outcome = excluded.last_outcome,
+                    last_seen = excluded.last_seen,
+                    next_probe_at = excluded.next_probe_at
+            """, (
+                origin, destination, container,
+                int(outcome == "success"), int(outcome == "empty"), int(outcome == "error"),
+                empty_streak, outcome, now, next_probe_at
+            ))
+        self.recorded[outcome] += 1
+
+    def chronic_routes(self) -> Dict[Tuple[str, str, str], float]:
+        """Return ``{(origin, destination, container): next_probe_at}`` of chronically empty routes."""
+        rows = self._connect().execute(
+            "SELECT origin, destination, container, next_probe_at FROM routes WHERE empty_streak >= ?",
+            (ROUTE_EMPTY_STREAK,)
+        ).fetchall()
+        return {(origin, destination, container): next_probe_at for origin, destination, container, next_probe_at in rows}
+
+    def plan(self, combinations: Iterable[tuple], force_all: Optional[bool] = None) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Order ``combinations`` by route health.
+
+        Healthy and unknown routes keep their order and come first, chronically
+        empty routes that are due for a re-probe follow, and the ones that are
+        not due yet are deferred to a later run. Date-sweep combinations are
+        judged by their route: a due route is re-probed on its first date only
+        and its other dates wait until it returns rates again.
+
+        Args:
+            combinations: (origin, destination, container[, date]) tuples
+            force_all: Schedule everything in its original order (default: ROUTE_HEALTH_FORCE_ALL)
+
+        Returns:
+            (scheduled, deferred) combinations
+        """
+        combinations = list(combinations)
+        if ROUTE_HEALTH_FORCE_ALL if force_all is None else force_all:
+            return combinations, []
+
+        chronic = self.chronic_routes()
+        now = time.time()
+        healthy, reprobe, deferred = [], [], []
+        probed = set()
+        for combination in combinations:
+            route = tuple(combination[:3])
+            next_probe_at = chronic.get(route)
+            if next_probe_at is None:
+                healthy.append(combination)
+            elif next_probe_at <= now and route not in probed:
+                # One date per due route is enough to tell whether it has rates again
+                probed.add(route)
+                reprobe.append(combination)
+            else:
+                deferred.append(combination)
+        return healthy + reprobe, deferred
+
+    def summary(self) -> Dict[str, Any]:
+        """Return route counts by health and this process's recorded outcomes."""
+        total, chronic = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(empty_streak >= ?), 0) FROM routes", (ROUTE_EMPTY_STREAK,)
+        ).fetchone()
+        return {"routes": total, "chronically_empty": chronic, "recorded": dict(self.recorded)}
+
+
+def configure_route_health(force_all: Optional[bool] = None, enabled: Optional[bool] = None) -> None:
+    """
+    Set route health options for this process and any worker processes started afterwards.
+
+    Values are exported as environment variables so that worker processes
+    pick up the same configuration.
+    """
+    global ROUTE_HEALTH_FORCE_ALL, ROUTE_HEALTH_ENABLED, _store
+
+    if force_all is not None:
+        ROUTE_HEALTH_FORCE_ALL = force_all
+        os.environ["ROUTE_HEALTH_FORCE_ALL"] = "1" if force_all else "0"
+    if enabled is not None:
+        ROUTE_HEALTH_ENABLED = enabled
+        os.environ["ROUTE_HEALTH_ENABLED"] = "1" if enabled else "0"
+        with _store_lock:
+            _store = None
+
+
+_store: Optional[RouteHealthStore] = None
+_store_lock = threading.Lock()
+
+
+def get_route_health() -> Optional[RouteHealthStore]:
+    """Return the process-wide store, or None when route health tracking is disabled."""
+    global _store
+
+    if not ROUTE_HEALTH_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RouteHealthStore()
+    return _store
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Screenshot Cache
+
+Content-addressed index of captured screenshots, stored in a local SQLite
+database shared by all worker processes:
+
+- ``url_index`` maps a normalized target URL to the screenshot URL captured for
+  it, so a page seen within the TTL is not opened in a browser again.
+- ``blobs`` maps the SHA-256 of the image bytes to the stored object and its
+  thumbnail, so identical images are uploaded only once.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("SCREENSHOT_CACHE_ENABLED", "1") != "0"
+CACHE_DB_PATH = os.getenv("SCREENSHOT_CACHE_DB", "cache/screenshot_cache.sqlite3")
+CACHE_TTL_HOURS = float(os.getenv("SCREENSHOT_CACHE_TTL_HOURS", "24"))
+
+# Query parameters that never change what the page shows
+IGNORED_QUERY_PARAMS = {"utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "gclid", "fbclid"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a target URL for use as a cache key.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the query string and strips trailing slashes so that
+    ``.../results/<id>/`` and ``.../results/<id>`` share one entry.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in IGNORED_QUERY_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def _url_key(url: str, variant: str = "") -> str:
+    key = normalize_url(url)
+    return f"{key} [{variant}]" if variant else key
+
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest of the image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ScreenshotCache:
+    """SQLite-backed screenshot index keyed by normalized URL and image hash."""
+
+    def __init__(self, db_path: str = CACHE_DB_PATH, ttl_hours: float = CACHE_TTL_HOURS):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: SQLite database file (shared across processes)
+            ttl_hours: How long a URL entry may be reused before recapturing
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_hours * 3600
+        self._local = threading.local()
+
+        # Stats
+        self.url_hits = 0
+        self.url_misses = 0
+        self.blob_hits = 0
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_index (
+                    url_key TEXT PRIMARY KEY,
+                    screenshot_url TEXT NOT NULL,
+                    content_hash TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    screenshot_url TEXT NOT NULL,
+                    size INTEGER,
+                    created_at REAL NOT NULL
+                )
+            """)
+            # Databases created before thumbnails were recorded
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(blobs)")}
+            if "thumbnail_url" not in columns:
+                conn.execute("ALTER TABLE blobs ADD COLUMN thumbnail_url TEXT")
+            if "thumbnail_size" not in columns:
+                conn.execute("ALTER TABLE blobs ADD COLUMN thumbnail_size INTEGER")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; callers may run lookups via asyncio.to_thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup_url(self, url: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        """Return the cached record for ``url`` if it is within the TTL.
+
+        ``variant`` separates captures of the same page made with different
+        capture profiles. The record holds ``screenshot_url``, ``size``,
+        ``thumbnail_url`` and ``thumbnail_size``; the last three are None when
+        they were never recorded.
+        """
+        row = self._connect().execute(
+            """
+            SELECT u.screenshot_url, u.created_at, b.size, b.thumbnail_url, b.thumbnail_size
+            FROM url_index u LEFT JOIN blobs b ON b.content_hash = u.content_hash
+            WHERE u.url_key = ?
+            """,
+            (_url_key(url, variant),)
+        ).fetchone()
+
+        if row and time.time() - row[1] <= self.ttl_seconds:
+            self.url_hits += 1
+            return {"screenshot_url": row[0], "size": row[2], "thumbnail_url": row[3], "thumbnail_size": row[4]}
+        self.url_misses += 1
+        return None
+
+    def lookup_blob(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return the stored record for an image with this content hash, if any."""
+        row = self._connect().execute(
+            "SELECT screenshot_url, size, thumbnail_url, thumbnail_size FROM blobs WHERE content_hash = ?", (digest,)
+        ).fetchone()
+        if row:
+            self.blob_hits += 1
+            return {"screenshot_url": row[0], "size": row[1], "thumbnail_url": row[2], "thumbnail_size": row[3]}
+        return None
+
+    def record(
+        self,
+        url: str,
+        screenshot_url: str,
+        digest: Optional[str] = None,
+        size: Optional[int] = None,
+        variant: str = "",
+        thumbnail_url: Optional[str] = None,
+        thumbnail_size: Optional[int] = None
+    ) -> None:
+        """Remember ``screenshot_url`` for the target URL and, if given, the image hash.
+
+        A thumbnail is only recorded with the image hash; a later record for the
+        same image fills in a thumbnail the first one did not have.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO url_index (url_key, screenshot_url, content_hash, created_at) VALUES (?, ?, ?, ?)",
+                (_url_key(url, variant), screenshot_url, digest, now)
+            )
+            if digest:
+                conn.execute(
+                    """
+                    INSERT INTO blobs (content_hash, screenshot_url, size, created_at, thumbnail_url, thumbnail_size)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (content_hash) DO UPDATE SET
+                        thumbnail_url = COALESCE(blobs.thumbnail_url, excluded.thumbnail_url),
+                        thumbnail_size = COALESCE(blobs.thumbnail_size, excluded.thumbnail_size)
+                    """,
+                    (digest, screenshot_url, size, now, thumbnail_url, thumbnail_size)
+                )
+
+    def purge_expired(self) -> int:
+        """Delete URL entries older than the TTL. Blob entries are kept."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM url_index WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process."""
+        return {
+            "url_hits": self.url_hits,
+            "url_misses": self.url_misses,
+            "blob_hits": self.blob_hits,
+        }
+
+
+_cache: Optional[ScreenshotCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_screenshot_cache() -> Optional[ScreenshotCache]:
+    """Return the process-wide cache, or None when SCREENSHOT_CACHE_ENABLED=0."""
+    global _cache
+
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScreenshotCache()
+    return _cache
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Screenshot Capture Profiles
+
+Named settings for what part of the page is captured and how it is encoded:
+
+- ``full``: full-page PNG at a random device scale factor (the original behaviour)
+- ``full_webp``: full page at 1x, encoded to WebP, with a thumbnail
+- ``viewport``: visible viewport at 1x, WebP, with a thumbnail
+- ``price_region``: clip to the provider's price/results element (falls back
+  to the viewport when it cannot be found), WebP, with a thumbnail
+- ``jpeg``: full page at 1x, JPEG, with a thumbnail
+
+Re-encoding and thumbnailing use Pillow in a small process pool so the event
+loop never blocks on image work. Without Pillow the PNG from Playwright is
+kept (or Playwright's own JPEG encoder is used for JPEG profiles) and no
+thumbnail is produced.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+try:
+    from PIL import Image
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_PROFILE = os.getenv("SCREENSHOT_PROFILE", "full")
+ENCODE_WORKERS = int(os.getenv("SCREENSHOT_ENCODE_WORKERS", "2"))
+
+CAPTURE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "full": {
+        "full_page": True,
+        "clip_to_price_region": False,
+        "format": "png",
+        "quality": None,
+        "device_scale_factor": None,  # random, as before
+        "max_width": None,
+        "thumbnail_width": None,
+    },
+    "full_webp": {
+        "full_page": True,
+        "clip_to_price_region": False,
+        "format": "webp",
+        "quality": 80,
+        "device_scale_factor": 1,
+        "max_width": 1920,
+        "thumbnail_width": 400,
+    },
+    "viewport": {
+        "full_page": False,
+        "clip_to_price_region": False,
+        "format": "webp",
+        "quality": 80,
+        "device_scale_factor": 1,
+        "max_width": 1920,
+        "thumbnail_width": 400,
+    },
+    "price_region": {
+        "full_page": False,
+        "clip_to_price_region": True,
+        "format": "webp",
+        "quality": 85,
+        "device_scale_factor": 1,
+        "max_width": 1920,
+        "thumbnail_width": 400,
+    },
+    "jpeg": {
+        "full_page": True,
+        "clip_to_price_region": False,
+        "format": "jpeg",
+        "quality": 75,
+        "device_scale_factor": 1,
+        "max_width": 1920,
+        "thumbnail_width": 400,
+    },
+}
+
+# Element holding the quoted prices on each provider's results page
+PRICE_REGION_SELECTORS = {
+    "searates.com": "main",
+    "freightos.com": "main",
+    "kiwi.com": "[data-test='ResultList']",
+    "booking.com": "main",
+}
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+_warned_no_pillow = False
+
+
+def get_capture_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Return the named profile (default: SCREENSHOT_PROFILE) with its name included."""
+    name = name or SCREENSHOT_PROFILE
+    if name not in CAPTURE_PROFILES:
+        raise ValueError(f"Unknown screenshot profile '{name}'. Available: {', '.join(CAPTURE_PROFILES)}")
+    return {"name": name, **CAPTURE_PROFILES[name]}
+
+
+def price_region_selector(url: str) -> Optional[str]:
+    """Return the price-region selector for the provider serving ``url``, if known."""
+    host = (urlsplit(url).hostname or "").lower()
+    for domain, selector in PRICE_REGION_SELECTORS.items():
+        if host == domain or host.endswith("." + domain):
+            return selector
+    return None
+
+
+def _encode(image: "Image.Image", fmt: str, quality: Optional[int]) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality or 75, optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, format="WEBP", quality=quality or 80, method=4)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def encode_screenshot(
+    image_bytes: bytes,
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    max_width: Optional[int] = None,
+    thumbnail_width: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Re-encode a PNG screenshot and optionally build a thumbnail.
+
+    Runs in a worker process; arguments and results are plain bytes/ints so
+    they pickle cheaply.
+
+    Args:
+        image_bytes: PNG bytes from Playwright
+        fmt: Target format ("png", "webp" or "jpeg")
+        quality: Encoder quality for lossy formats
+        max_width: Downscale wider images to this width
+        thumbnail_width: Width of the thumbnail, or None for no thumbnail
+
+    Returns:
+        Dictionary with ``image`` and ``thumbnail`` (bytes or None)
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.load()
+        if max_width and image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        encoded = _encode(image, fmt, quality)
+
+        thumbnail = None
+        if thumbnail_width:
+            thumb = image.copy()
+            # Thumbnails show the top of the page where the rates are
+            crop_height = min(thumb.height, round(thumb.width * 0.75))
+            thumb = thumb.crop((0, 0, thumb.width, crop_height))
+            thumb.thumbnail((thumbnail_width, thumbnail_width))
+            thumbnail = _encode(thumb, fmt, quality)
+
+    return {"image": encoded, "thumbnail": thumbnail}
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, ENCODE_WORKERS))
+    return _executor
+
+
+def shutdown_encode_pool() -> None:
+    """Stop the encoder processes, if any were started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def playwright_screenshot_options(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``page.screenshot`` options for a profile.
+
+    Without Pillow, JPEG profiles are encoded by Playwright directly.
+    """
+    if profile["format"] == "jpeg" and not PILLOW_AVAILABLE:
+        return {"type": "jpeg", "quality": profile["quality"] or 75}
+    return {"type": "png"}
+
+
+async def encode_for_profile(image_bytes: bytes, profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode captured bytes for ``profile`` off the event loop.
+
+    Returns:
+        Dictionary with ``image``, ``thumbnail`` (bytes or None), ``ext`` and ``content_type``
+    """
+    global _warned_no_pillow
+
+    fmt = profile["format"]
+    if fmt == "png" and not profile["max_width"] and not profile["thumbnail_width"]:
+        return {"image": image_bytes, "thumbnail": None, "ext": "png", "content_type": CONTENT_TYPES["png"]}
+
+    if not PILLOW_AVAILABLE:
+        if not _warned_no_pillow:
+            logger.warning("Pillow is not installed - screenshots are stored without re-encoding or thumbnails")
+            _warned_no_pillow = True
+        fmt = "jpeg" if fmt == "jpeg" else "png"
+        return {"image": image_bytes, "thumbnail": None, "ext": fmt, "content_type": CONTENT_TYPES[fmt]}
+
+    args = (image_bytes, fmt, profile["quality"], profile["max_width"], profile["thumbnail_width"])
+    if mp.current_process().daemon:
+        # multiprocessing.Pool workers cannot start child processes
+        encoded = await asyncio.to_thread(encode_screenshot, *args)
+    else:
+        encoded = await asyncio.get_running_loop().run_in_executor(_get_executor(), encode_screenshot, *args)
+    encoded.update({"ext": fmt, "content_type": CONTENT_TYPES[fmt]})
+    return encoded
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Durable Screenshot Queue
+
+Moves screenshot capture out of the scraping loops. With SCREENSHOT_MODE=queue
+the scrapers record ``(result_key, url, accept_cookies)`` jobs in a local
+SQLite database and carry on with the next rate request; separate worker
+processes (``python screenshot_worker.py work``) capture the pages, and a
+reconciliation step patches ``screenshot_url`` into checkpointed results once
+the capture has finished.
+
+Result keys are the page URL stored on the result (``website_link`` for
+Searates rows, ``website_url`` for Freightos rows, ``booking_url`` for flight
+quotes), so a checkpoint can be reconciled without any extra bookkeeping
+columns.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_MODE = os.getenv("SCREENSHOT_MODE", "inline")  # "inline" or "queue"
+QUEUE_DB_PATH = os.getenv("SCREENSHOT_QUEUE_DB", "cache/screenshot_queue.sqlite3")
+QUEUE_MAX_ATTEMPTS = int(os.getenv("SCREENSHOT_QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_LEASE_SECONDS = int(os.getenv("SCREENSHOT_QUEUE_LEASE_SECONDS", "600"))
+
+# Result fields that hold the page URL used as the result key
+RESULT_KEY_FIELDS = ("website_link", "website_url", "booking_url")
+
+
+def queue_mode_enabled() -> bool:
+    """Return True when scrapers should enqueue screenshots instead of capturing inline."""
+    return SCREENSHOT_MODE == "queue"
+
+
+class ScreenshotQueue:
+    """
+    SQLite-backed screenshot job queue shared by scrapers and workers.
+
+    Jobs move ``pending`` -> ``running`` -> ``done`` (or back to ``pending``
+    on failure until ``max_attempts`` is reached, then ``failed``). A running
+    job whose lease expires - for example because its worker died - is handed
+    out again.
+    """
+
+    def __init__(
+        self,
+        db_path: str = QUEUE_DB_PATH,
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+        lease_seconds: int = QUEUE_LEASE_SECONDS
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            db_path: SQLite database file (shared across processes)
+            max_attempts: Capture attempts per job before it is marked failed
+            lease_seconds: How long a claimed job is reserved for its worker
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    result_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    accept_cookies INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    screenshot_url TEXT,
+                    error TEXT,
+                    leased_until REAL,
+                    enqueued_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, result_key: str, url: str, accept_cookies: bool = False) -> None:
+        """
+        Add a capture job. Re-enqueueing a finished key is a no-op unless the
+        URL changed or the previous job failed.
+        """
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT INTO jobs (result_key, url, accept_cookies, status, attempts, enqueued_at, updated_at)
+            VALUES (?, ?, ?, 'pending', 0, ?, ?)
+            ON CONFLICT(result_key) DO UPDATE SET
+                url = excluded.url,
+                accept_cookies = excluded.accept_cookies,
+                status = 'pending',
+                attempts = 0,
+                error = NULL,
+                updated_at = excluded.updated_at
+            WHERE jobs.url != excluded.url OR jobs.status = 'failed'
+            """,
+            (result_key, url, int(accept_cookies), now, now)
+        )
+
+    def claim(self, limit: int = 1) -> List[Dict[str, Any]]:
+        """Reserve up to ``limit`` jobs for the calling worker."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """
+                SELECT result_key, url, accept_cookies, attempts FROM jobs
+                WHERE status = 'pending' OR (status = 'running' AND leased_until < ?)
+                ORDER BY enqueued_at
+                LIMIT ?
+                """,
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, leased_until = ?, updated_at = ? WHERE result_key = ?",
+                [(now + self.lease_seconds, now, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [
+            {"result_key": row[0], "url": row[1], "accept_cookies": bool(row[2]), "attempts": row[3] + 1}
+            for row in rows
+        ]
+
+    def complete(self, result_key: str, screenshot_url: str) -> None:
+        """Mark a job done with its screenshot URL."""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'done', screenshot_url = ?, error = NULL, leased_until = NULL, updated_at = ? WHERE result_key = ?",
+            (screenshot_url, time.time(), result_key)
+        )
+
+    def fail(self, result_key: str, error: str) -> None:
+        """Record a failed attempt; the job is retried until ``max_attempts``."""
+        self._connect().execute(
+            """
+            UPDATE jobs SET
+                status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                error = ?, leased_until = NULL, updated_at = ?
+            WHERE result_key = ?
+            """,
+            (self.max_attempts, error[:500], time.time(), result_key)
+        )
+
+    def completed_urls(self, result_keys: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Return ``{result_key: screenshot_url}`` for finished jobs, optionally limited to ``result_keys``."""
+        conn = self._connect()
+        if result_keys is None:
+            rows = conn.execute("SELECT result_key, screenshot_url FROM jobs WHERE status = 'done'").fetchall()
+            return dict(rows)
+
+        found = {}
+        keys = list(dict.fromkeys(result_keys))
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f"SELECT result_key, screenshot_url FROM jobs WHERE status = 'done' AND result_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of jobs per status."""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+
+_queue: Optional[ScreenshotQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_screenshot_queue() -> ScreenshotQueue:
+    """Return the process-wide screenshot queue."""
+    global _queue
+
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = ScreenshotQueue()
+    return _queue
+
+
+async def enqueue_screenshot(result_key: str, url: str, accept_cookies: bool = False) -> None:
+    """Enqueue a capture job from async code without blocking the event loop."""
+    await asyncio.to_thread(get_screenshot_queue().enqueue, result_key, url, accept_cookies)
+
+
+def result_key_for(result: Dict[str, Any]) -> Optional[str]:
+    """Return the result key (page URL) stored on a result row, if any."""
+    for field in RESULT_KEY_FIELDS:
+        value = result.get(field)
+        if value:
+            return value
+    return None
+
+
+def reconcile_results(results: Sequence[Dict[str, Any]], queue: Optional[ScreenshotQueue] = None) -> int:
+    """
+    Patch ``screenshot_url`` into results whose capture has finished.
+
+    Args:
+        results: Result rows, updated in place
+        queue: Queue to read from (default: the process-wide queue)
+
+    Returns:
+        Number of rows patched
+    """
+    pending = [r for r in results if isinstance(r, dict) and not r.get("screenshot_url") and result_key_for(r)]
+    if not pending:
+        return 0
+
+    queue = queue or get_screenshot_queue()
+    done = queue.completed_urls(result_key_for(r) for r in pending)
+
+    patched = 0
+    for result in pending:
+        screenshot_url = done.get(result_key_for(result))
+        if screenshot_url:
+            result["screenshot_url"] = screenshot_url
+            patched += 1
+    return patched
+
+
+def _result_rows(data: Any) -> List[Dict[str, Any]]:
+    """Collect every dict carrying a ``screenshot_url`` field from nested JSON data."""
+    rows = []
+    if isinstance(data, dict):
+        if "screenshot_url" in data:
+            rows.append(data)
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                rows.extend(_result_rows(value))
+    elif isinstance(data, list):
+        for item in data:
+            rows.extend(_result_rows(item))
+    return rows
+
+
+def reconcile_json_file(path: str, queue: Optional[ScreenshotQueue] = None) -> int:
+    """
+    Reconcile a JSON results file and rewrite it if anything changed.
+
+    Handles plain result lists (shipping/Freightos checkpoints) as well as the
+    nested batch files written by the flight matrix scraper.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    patched = reconcile_results(_result_rows(data), queue)
+    if patched:
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        logger.info(f"🖼️ Patched {patched} screenshot URLs into {path}")
+    return patched
+
+
+async def run_screenshot_worker(
+    concurrency: int = 3,
+    poll_interval: float = 2.0,
+    exit_when_idle: bool = False
+) -> Dict[str, int]:
+    """
+    Capture queued screenshots until stopped (or until the queue is empty).
+
+    Run inside ``run_with_screenshot_resources`` so the browser pool and
+    upload service are released on exit.
+
+    Args:
+        concurrency: Jobs captured at the same time by this worker
+        poll_interval: Seconds to wait when the queue is empty
+        exit_when_idle: Return once no pending jobs are left
+
+    Returns:
+        Counts of captured and failed jobs
+    """
+    from app.tasks import _go
+
+    queue = get_screenshot_queue()
+    counts = {"captured": 0, "failed": 0}
+
+    async def process(job: Dict[str, Any]) -> None:
+        try:
+            result = await _go(job["url"], accept_cookies=job["accept_cookies"])
+            screenshot_url = result.get("screenshot_url") if isinstance(result, dict) else None
+            if screenshot_url:
+                await asyncio.to_thread(queue.complete, job["result_key"], screenshot_url)
+                counts["captured"] += 1
+                return
+            error = result.get("error", "no screenshot URL returned") if isinstance(result, dict) else str(result)
+        except Exception as e:
+            error = str(e)
+
+        await asyncio.to_thread(queue.fail, job["result_key"], error)
+        counts["failed"] += 1
+        logger.warning(f"⚠️ Screenshot job failed (attempt {job['attempts']}) for {job['url']}: {error}")
+
+    in_flight = set()
+    while True:
+        free_slots = concurrency - len(in_flight)
+        jobs = await asyncio.to_thread(queue.claim, free_slots) if free_slots > 0 else []
+        in_flight.update(asyncio.create_task(process(job)) for job in jobs)
+
+        if not in_flight:
+            if exit_when_idle:
+                break
+            await asyncio.sleep(poll_interval)
+            continue
+
+        # Refill as soon as any capture finishes; poll for new jobs meanwhile
+        done, in_flight = await asyncio.wait(in_flight, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        if done and (counts["captured"] + counts["failed"]) % 10 == 0:
+            logger.info(f"🖼️ Screenshot worker: {counts['captured']} captured, {counts['failed']} failed, queue {queue.stats()}")
+
+    logger.info(f"🖼️ Screenshot worker finished: {counts}")
+    return counts
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Fast-Path Decoder for Searates Rate Responses
+
+``SearatesResponsePayload(**body)`` validates every nested model of every rate
+(points, loads, tariffs, CO2, transit times...), while the matrix only reads
+about twenty fields of it in ``create_result_entry``. This decoder parses the
+raw response bytes with orjson (falling back to the standard json module) and
+copies just those fields into small slotted objects with the same attribute
+names, so callers keep using ``response.data.rates[i].general.totalPrice``.
+
+Set ``SEARATES_FULL_VALIDATION=1`` to build the full pydantic models instead,
+e.g. when debugging a schema change on the Searates side.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from app.utils.model import SearatesResponsePayload
+
+FULL_VALIDATION = os.getenv("SEARATES_FULL_VALIDATION", "0") == "1"
+
+
+def loads(raw: bytes) -> Any:
+    """Parse a JSON document from raw bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class _Record:
+    """Attribute container; missing fields read as None like the pydantic models."""
+
+    __slots__ = ()
+
+    def __init__(self, source: Optional[Dict[str, Any]]):
+        source = source if isinstance(source, dict) else {}
+        for name in self.__slots__:
+            setattr(self, name, source.get(name))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class RateLocation(_Record):
+    __slots__ = ("name", "country")
+
+
+class RateCo2(_Record):
+    __slots__ = ("amount", "price")
+
+
+class RatePoint(_Record):
+    __slots__ = ("location", "provider", "rateId", "distance", "pointTotal", "routeTotal")
+
+    def __init__(self, source: Optional[Dict[str, Any]]):
+        super().__init__(source)
+        if self.location is not None:
+            self.location = RateLocation(self.location)
+
+
+class RateGeneral(_Record):
+    __slots__ = (
+        "shipmentId", "validityFrom", "validityTo", "totalPrice", "totalCurrency",
+        "totalTransitTime", "totalCo2", "expired",
+    )
+
+    def __init__(self, source: Optional[Dict[str, Any]]):
+        super().__init__(source)
+        if self.totalCo2 is not None:
+            self.totalCo2 = RateCo2(self.totalCo2)
+
+
+class RateSummary:
+    """The parts of one Searates rate used to build a matrix row."""
+
+    __slots__ = ("points", "general")
+
+    def __init__(self, source: Dict[str, Any]):
+        self.points = [RatePoint(point) for point in source.get("points") or []]
+        general = source.get("general")
+        self.general = RateGeneral(general) if general is not None else None
+
+
+class RatesData:
+    __slots__ = ("rates",)
+
+    def __init__(self, rates: List[RateSummary]):
+        self.rates = rates
+
+
+class SearatesRates:
+    """Lightweight stand-in for ``SearatesResponsePayload`` (``.data.rates``)."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Optional[RatesData]):
+        self.data = data
+
+
+def rates_response(rates: Optional[List[Dict[str, Any]]], full_validation: Optional[bool] = None):
+    """
+    Build a response object from a raw ``rates`` list.
+
+    Args:
+        rates: ``data.rates`` of a Searates response (or of one batched alias)
+        full_validation: Build pydantic models (default: SEARATES_FULL_VALIDATION)
+
+    Returns:
+        SearatesRates, or SearatesResponsePayload with full validation
+    """
+    if FULL_VALIDATION if full_validation is None else full_validation:
+        return SearatesResponsePayload(data={"rates": rates})
+    return SearatesRates(RatesData([RateSummary(rate) for rate in rates or [] if isinstance(rate, dict)]))
+
+
+def decode_response(body: Dict[str, Any], full_validation: Optional[bool] = None):
+    """
+    Build a response object from a parsed single-query response body.
+
+    Args:
+        body: Parsed JSON body (``{"data": {"rates": [...]}}``)
+        full_validation: Build pydantic models (default: SEARATES_FULL_VALIDATION)
+
+    Returns:
+        SearatesRates, or SearatesResponsePayload with full validation
+    """
+    if FULL_VALIDATION if full_validation is None else full_validation:
+        return SearatesResponsePayload(**body)
+    data = body.get("data")
+    if not isinstance(data, dict):
+        return SearatesRates(None)
+    return rates_response(data.get("rates"), full_validation=False)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Deterministic Sharding of Matrix Runs
+
+Splits one matrix job across several hosts. Every host builds the same
+combination list - cities or locations are sampled with a shared ``--seed``
+from a sorted list - and keeps the combinations whose stable hash falls into
+its shard (``--shard i/N``, ``0 <= i < N``). The hash is BLAKE2b over the
+combination key, so the split does not depend on Python's per-process hash
+salt, the host or the order the combinations were generated in.
+
+Each shard checkpoints into its own ``<checkpoint-dir>/shard_<i>_of_<N>``
+namespace; ``merge_shard_checkpoints`` combines them into one checkpoint
+that resumes and exports like an unsharded run.
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seed used when --shard is given without --seed, so every shard samples the same cities
+DEFAULT_SHARD_SEED = 0
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse an ``i/N`` shard spec.
+
+    Raises:
+        ValueError: If the spec is malformed or ``i`` is outside ``0..N-1``
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}'. Use i/N, e.g. 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}': index must be between 0 and {count - 1}")
+    return index, count
+
+
+def stable_hash(key: Sequence[Any]) -> int:
+    """Return a 64-bit hash of a combination key that is identical on every host and run."""
+    encoded = "\x1f".join(str(part) for part in key).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big")
+
+
+def shard_of(key: Sequence[Any], count: int) -> int:
+    """Return the shard index (``0..count-1``) a combination key belongs to."""
+    return stable_hash(key) % count
+
+
+def shard_combinations(combinations: Iterable[tuple], shard: Optional[Tuple[int, int]]) -> List[tuple]:
+    """Keep the combinations of ``shard`` (all of them when ``shard`` is None), in their original order."""
+    if shard is None:
+        return list(combinations)
+    index, count = shard
+    return [combination for combination in combinations if shard_of(combination, count) == index]
+
+
+def sample_keys(keys: Iterable[str], percentage: float, seed: Optional[int] = None) -> List[str]:
+    """
+    Pick ``percentage`` of ``keys``.
+
+    With a seed the sample is drawn from the sorted keys by a private RNG, so
+    every host that uses the same seed picks the same cities in the same
+    order. Without one the global RNG is used as before.
+    """
+    keys = list(keys)
+    count = int(len(keys) * percentage)
+    if seed is None:
+        return random.sample(keys, count)
+    return random.Random(seed).sample(sorted(keys), count)
+
+
+def shard_checkpoint_dir(checkpoint_dir: str, shard: Optional[Tuple[int, int]]) -> str:
+    """Return the checkpoint namespace of ``shard`` below ``checkpoint_dir``."""
+    if shard is None:
+        return checkpoint_dir
+    index, count = shard
+    return str(Path(checkpoint_dir) / f"shard_{index}_of_{count}")
+
+
+def merge_shard_checkpoints(checkpoint_dir: str, output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Combine every ``shard_*_of_*`` checkpoint below ``checkpoint_dir``.
+
+    Results are concatenated in shard order; a combination finished by more
+    than one shard (e.g. after re-sharding) keeps the rows of the first
+    shard that completed it.
+
+    Args:
+        checkpoint_dir: Base checkpoint directory the shards were run with
+        output_dir: Where to write the merged checkpoint (default: ``checkpoint_dir``)
+
+    Returns:
+        Summary with the merged shard names, result and combination counts,
+        the merged checkpoint directory and whether it is keyed by date
+    """
+    from app.utils.checkpoint_manager import CheckpointManager
+
+    shard_dirs = sorted(
+        (path for path in Path(checkpoint_dir).glob("shard_*_of_*") if path.is_dir()),
+        key=lambda path: [int(part) for part in path.name.split("_")[1::2]]
+    )
+    if not shard_dirs:
+        raise FileNotFoundError(f"No shard checkpoints found in {checkpoint_dir}")
+
+    counts = {int(path.name.split("_")[-1]) for path in shard_dirs}
+    if len(counts) > 1:
+        logger.warning(f"⚠️ Merging shards of different splits: {sorted(counts)}")
+
+    results: List[Dict[str, Any]] = []
+    completed = set()
+    include_date = False
+    for shard_dir in shard_dirs:
+        metadata_file = shard_dir / "metadata.json"
+        if metadata_file.exists():
+            metadata = json.loads(metadata_file.read_text(encoding="utf-8"))
+            include_date = include_date or metadata.get("format") == "city_container_date_combinations"
+
+        shard_results = []
+        results_file = shard_dir / "results.json"
+        if results_file.exists():
+            shard_results = json.loads(results_file.read_text(encoding="utf-8"))
+
+        shard_pairs = set()
+        pairs_file = shard_dir / "completed_pairs.pkl"
+        if pairs_file.exists():
+            with open(pairs_file, "rb") as f:
+                shard_pairs = pickle.load(f) or set()
+
+        dated = len(next(iter(shard_pairs), ())) == 4
+        include_date = include_date or dated
+        for result in shard_results:
+            key = (result.get("city_of_origin"), result.get("city_of_destination"), result.get("container_type"))
+            if dated:
+                key += (result.get("date_of_shipping"),)
+            # Rows of combinations an earlier shard already finished are dropped
+            if key not in completed:
+                results.append(result)
+        completed |= shard_pairs
+        logger.info(f"📦 {shard_dir.name}: {len(shard_results)} results, {len(shard_pairs)} completed combinations")
+
+    manager = CheckpointManager(
+        checkpoint_dir=output_dir or checkpoint_dir,
+        include_date=include_date
+    )
+    manager.total_results = results
+    manager.completed_pairs = completed
+    manager.save_checkpoint(force=True)
+
+    logger.info(f"✅ Merged {len(shard_dirs)} shards: {len(results)} results, {len(completed)} completed combinations")
+    return {
+        "shards": [path.name for path in shard_dirs],
+        "results": len(results),
+        "completed_combinations": len(completed),
+        "checkpoint_dir": str(manager.checkpoint_dir),
+        "include_date": include_date,
+    }
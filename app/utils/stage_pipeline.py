@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Staged Async Pipeline
+
+Runs items through a chain of stages - e.g. submit, poll, capture, transform,
+persist for Freightos searches - connected by bounded ``asyncio.Queue``s.
+Every stage has its own number of workers, so a slow stage only limits
+itself: new searches keep being submitted while earlier ones are still being
+polled or captured, and a full queue pushes back on the stages before it
+instead of letting work pile up in memory.
+
+A stage handler takes an item and returns what is handed to the next stage;
+returning None drops the item. An exception is logged and drops the item as
+well, so handlers that must not lose items should turn failures into results
+themselves.
+
+Per-stage queue depth (current and peak), items in flight, time spent
+waiting in the queue and handler latency are exposed through ``stats()``,
+logged every PIPELINE_LOG_INTERVAL seconds while the pipeline runs and, when
+prometheus_client is installed, published as Prometheus gauges labelled by
+pipeline and stage.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+from collections import deque
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    from prometheus_client import Gauge
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+PIPELINE_LOG_INTERVAL = float(os.getenv("PIPELINE_LOG_INTERVAL", "60"))
+
+# Latency samples kept per stage
+_SAMPLE_WINDOW = 512
+
+# Marks the end of a stage's input
+_DONE = object()
+
+if PROMETHEUS_AVAILABLE:
+    QUEUE_DEPTH_GAUGE = Gauge("pipeline_stage_queue_depth", "Items waiting for a pipeline stage", ["pipeline", "stage"])
+    IN_FLIGHT_GAUGE = Gauge("pipeline_stage_in_flight", "Items a pipeline stage is working on", ["pipeline", "stage"])
+    P95_GAUGE = Gauge("pipeline_stage_p95_seconds", "p95 handler latency of a pipeline stage", ["pipeline", "stage"])
+
+
+class Stage:
+    """
+    One pipeline stage: a bounded input queue served by ``concurrency`` workers.
+
+    Args:
+        name: Stage name used in stats and logs
+        handler: Coroutine function ``handler(item) -> item for the next stage or None``
+        concurrency: Items handled at the same time
+        queue_size: Items that may wait in the stage's input queue
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], concurrency: int = 1,
+                 queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(1, queue_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self.in_flight = 0
+        self._latencies: deque = deque(maxlen=_SAMPLE_WINDOW)
+        self._waits: deque = deque(maxlen=_SAMPLE_WINDOW)
+
+        # Stats
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, items in flight, counters and latency of this stage."""
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait_seconds": round(statistics.mean(self._waits), 3) if self._waits else None,
+            "avg_seconds": round(statistics.mean(latencies), 3) if latencies else None,
+            "p95_seconds": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3) if latencies else None,
+        }
+
+
+class StagedPipeline:
+    """
+    Chain of stages connected by bounded queues.
+
+    Args:
+        stages: ``Stage`` objects or ``(name, handler, concurrency)`` tuples, in order
+        name: Pipeline name used in logs and metrics
+        queue_size: Default input queue size of tuple-defined stages
+        log_interval: Seconds between stats log lines while running (0 disables them)
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Union[Stage, Tuple[str, Callable[[Any], Awaitable[Any]], int]]],
+        name: str = "pipeline",
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        log_interval: float = PIPELINE_LOG_INTERVAL
+    ):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.name = name
+        self.log_interval = log_interval
+        self.stages: List[Stage] = [
+            stage if isinstance(stage, Stage) else Stage(*stage, queue_size=queue_size)
+            for stage in stages
+        ]
+        self.fed = 0
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]]) -> Dict[str, Any]:
+        """
+        Feed ``items`` into the first stage and wait until every stage has drained.
+
+        Returns:
+            Stats of the finished run (see ``stats``)
+        """
+        loop = asyncio.get_running_loop()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+
+        async def put(stage: Stage, item: Any) -> None:
+            await stage.queue.put((loop.time(), item))
+            stage.max_queue_depth = max(stage.max_queue_depth, stage.queue.qsize())
+
+        async def feed() -> None:
+            first = self.stages[0]
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    self.fed += 1
+                    await put(first, item)
+            else:
+                for item in items:
+                    self.fed += 1
+                    await put(first, item)
+            for _ in range(first.concurrency):
+                await first.queue.put((loop.time(), _DONE))
+
+        async def work(index: int) -> None:
+            stage = self.stages[index]
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            while True:
+                enqueued, item = await stage.queue.get()
+                if item is _DONE:
+                    return
+                started = loop.time()
+                stage._waits.append(started - enqueued)
+                stage.in_flight += 1
+                try:
+                    output = await stage.handler(item)
+                except Exception as e:
+                    stage.failed += 1
+                    logger.error(f"Pipeline {self.name} - stage '{stage.name}' failed on {item!r}: {e}")
+                    continue
+                finally:
+                    stage.in_flight -= 1
+                    stage._latencies.append(loop.time() - started)
+                stage.processed += 1
+                if output is None:
+                    if downstream is not None:
+                        stage.dropped += 1
+                elif downstream is not None:
+                    # Blocks while the next stage is backed up
+                    await put(downstream, output)
+
+        async def run_stage(index: int) -> None:
+            stage = self.stages[index]
+            await asyncio.gather(*(work(index) for _ in range(stage.concurrency)))
+            if index + 1 < len(self.stages):
+                downstream = self.stages[index + 1]
+                for _ in range(downstream.concurrency):
+                    await downstream.queue.put((loop.time(), _DONE))
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(self.log_interval)
+                logger.info(f"🔀 Pipeline {self.name}: {self.stats()}")
+
+        reporter = asyncio.create_task(report()) if self.log_interval > 0 else None
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(run_stage(i)) for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if reporter is not None:
+                reporter.cancel()
+
+        stats = self.stats()
+        logger.info(f"🔀 Pipeline {self.name} finished: {stats}")
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Return items fed and the stats of every stage by name."""
+        stages = {stage.name: stage.stats() for stage in self.stages}
+        if PROMETHEUS_AVAILABLE:
+            for stage_name, stage_stats in stages.items():
+                QUEUE_DEPTH_GAUGE.labels(self.name, stage_name).set(stage_stats["queue_depth"])
+                IN_FLIGHT_GAUGE.labels(self.name, stage_name).set(stage_stats["in_flight"])
+                if stage_stats["p95_seconds"] is not None:
+                    P95_GAUGE.labels(self.name, stage_name).set(stage_stats["p95_seconds"])
+        return {"fed": self.fed, "stages": stages}
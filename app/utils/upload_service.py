@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Upload Service for Screenshot Storage
+
+This module moves screenshot uploads off the event loop. Uploads are queued on
+a bounded asyncio queue and executed by a fixed-size worker thread pool that
+shares a single boto3 client. Callers receive a future for the resulting URL.
+A local-filesystem backend is available for offline runs and testing.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import boto3
+from botocore.exceptions import NoCredentialsError
+
+logger = logging.getLogger(__name__)
+
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION")
+DEFAULT_BUCKET = "oracle-fpl-bot-predictions"
+
+UPLOAD_BACKEND = os.getenv("SCREENSHOT_UPLOAD_BACKEND", "s3")  # "s3" or "local"
+UPLOAD_LOCAL_DIR = os.getenv("SCREENSHOT_UPLOAD_DIR", "local_uploads")
+UPLOAD_WORKERS = int(os.getenv("SCREENSHOT_UPLOAD_WORKERS", "4"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("SCREENSHOT_UPLOAD_QUEUE_SIZE", "32"))
+UPLOAD_MAX_RETRIES = int(os.getenv("SCREENSHOT_UPLOAD_MAX_RETRIES", "3"))
+
+UploadBody = Union[bytes, bytearray, memoryview, BinaryIO]
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the process-wide boto3 S3 client, creating it on first use.
+
+    boto3 clients are thread-safe once created, but creating them is not, so
+    construction is guarded by a lock.
+    """
+    global _s3_client
+
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION
+                )
+    return _s3_client
+
+
+def _as_fileobj(body: UploadBody) -> BinaryIO:
+    """Wrap raw bytes in a file object, rewinding file objects for retries."""
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return io.BytesIO(body)
+    if hasattr(body, "seek"):
+        body.seek(0)
+    return body
+
+
+class S3UploadBackend:
+    """Uploads to S3 through the shared boto3 client."""
+
+    def __init__(self, bucket: str = DEFAULT_BUCKET):
+        self.bucket = bucket
+
+    def upload(self, body: UploadBody, key: str, content_type: Optional[str] = None) -> Optional[str]:
+        extra_args = {"ContentType": content_type} if content_type else {}
+        try:
+            get_s3_client().upload_fileobj(_as_fileobj(body), self.bucket, key, ExtraArgs=extra_args)
+        except NoCredentialsError:
+            logger.error("Credentials not available")
+            return None
+
+        file_url = f"https://{self.bucket}.s3.amazonaws.com/{key}"
+        logger.info(f"Uploaded image to S3: {file_url}")
+        return file_url
+
+
+class LocalUploadBackend:
+    """Writes uploads under a local directory and returns ``file://`` URLs."""
+
+    def __init__(self, root_dir: str = UPLOAD_LOCAL_DIR):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+    def upload(self, body: UploadBody, key: str, content_type: Optional[str] = None) -> Optional[str]:
+        path = self.root_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fileobj = _as_fileobj(body)
+        with open(path, "wb") as f:
+            while True:
+                chunk = fileobj.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+        file_url = path.resolve().as_uri()
+        logger.info(f"Saved upload locally: {file_url}")
+        return file_url
+
+
+def make_upload_backend(backend: str = None):
+    """Create the backend named by ``backend`` (default: SCREENSHOT_UPLOAD_BACKEND)."""
+    backend = (backend or UPLOAD_BACKEND).lower()
+    if backend == "local":
+        return LocalUploadBackend()
+    if backend == "s3":
+        return S3UploadBackend()
+    raise ValueError(f"Unknown upload backend: {backend}")
+
+
+class UploadService:
+    """
+    Non-blocking upload pipeline.
+
+    ``submit`` puts a job on a bounded queue (waiting when the queue is full)
+    and returns a future that resolves to the uploaded file URL. A fixed number
+    of dispatchers run the blocking backend call in a thread pool and retry
+    failed uploads with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        workers: int = UPLOAD_WORKERS,
+        queue_size: int = UPLOAD_QUEUE_SIZE,
+        max_retries: int = UPLOAD_MAX_RETRIES,
+        retry_delay: float = 1.0
+    ):
+        """
+        Initialize the upload service.
+
+        Args:
+            backend: Object with an ``upload(body, key, content_type)`` method
+            workers: Number of upload threads (and concurrent uploads)
+            queue_size: Maximum number of queued uploads before ``submit`` waits
+            max_retries: Retries per upload after the first attempt
+            retry_delay: Base delay in seconds for the exponential backoff
+        """
+        self.backend = backend or make_upload_backend()
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatchers = []
+        self._closed = False
+
+        # Stats
+        self.submitted = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _start(self) -> None:
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def submit(self, body: UploadBody, key: str, content_type: Optional[str] = None) -> asyncio.Future:
+        """
+        Queue an upload and return a future for its URL.
+
+        Waits while the queue is full, which slows producers down to the rate
+        the upload workers can sustain.
+        """
+        if self._closed:
+            raise RuntimeError("Upload service is closed")
+        self._start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((body, key, content_type, future))
+        self.submitted += 1
+        return future
+
+    async def upload(self, body: UploadBody, key: str, content_type: Optional[str] = None) -> Optional[str]:
+        """Queue an upload and wait for its URL."""
+        future = await self.submit(body, key, content_type)
+        return await future
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            body, key, content_type, future = await self._queue.get()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        url = await loop.run_in_executor(self._executor, self.backend.upload, body, key, content_type)
+                        self.uploaded += 1
+                        if not future.done():
+                            future.set_result(url)
+                        break
+                    except Exception as e:
+                        if attempt == self.max_retries:
+                            self.failed += 1
+                            logger.error(f"Upload of {key} failed after {self.max_retries} retries: {e}")
+                            if not future.done():
+                                future.set_exception(e)
+                            break
+
+                        self.retries += 1
+                        delay = self.retry_delay * (2 ** attempt) + random.uniform(0, 1)
+                        logger.warning(f"Upload attempt {attempt + 1} for {key} failed, retrying in {delay:.2f}s: {e}")
+                        await asyncio.sleep(delay)
+            finally:
+                self._queue.task_done()
+
+    async def close(self) -> None:
+        """Wait for queued uploads to finish, then stop the workers."""
+        self._closed = True
+        if self._executor is None:
+            return
+
+        await self._queue.join()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info(f"Upload service closed: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return upload statistics."""
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+
+# Per-process service, bound to the event loop that created it
+_service: Optional[UploadService] = None
+_service_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_upload_service() -> UploadService:
+    """Return the upload service for the running event loop, creating it if needed."""
+    global _service, _service_loop
+
+    loop = asyncio.get_running_loop()
+    if _service is None or _service_loop is not loop or _service._closed:
+        _service = UploadService()
+        _service_loop = loop
+    return _service
+
+
+async def close_upload_service() -> None:
+    """Flush and close the upload service owned by the running event loop, if any."""
+    global _service, _service_loop
+
+    if _service is not None and _service_loop is asyncio.get_running_loop():
+        await _service.close()
+    _service = None
+    _service_loop = None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Work-Stealing Task Queue for Matrix Runs
+
+Instead of cutting the remaining combinations into one fixed slice per
+process, the work is split into small units on a shared queue. Long-lived
+worker processes pull the next unit whenever one of their lanes is free, so a
+worker stuck on slow or timing-out routes only holds the units it is working
+on while the others take over the tail.
+
+Each worker keeps one event loop (and with it the HTTP session, rate limiter,
+browser pool and upload service) for its whole life, and runs ``lanes`` units
+concurrently. Finished units are streamed back to the parent as they
+complete, so results can be checkpointed immediately.
+"""
+
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Combinations per queued unit and units each worker runs concurrently
+WORK_UNIT_SIZE = int(os.getenv("WORK_UNIT_SIZE", "4"))
+WORK_LANES_PER_WORKER = int(os.getenv("WORK_LANES_PER_WORKER", "2"))
+
+# Seconds between liveness checks of the workers while waiting for results
+_POLL_SECONDS = 1.0
+
+
+def make_units(items: Sequence[Any], unit_size: int = WORK_UNIT_SIZE) -> List[List[Any]]:
+    """Split ``items`` into consecutive units of at most ``unit_size`` items."""
+    unit_size = max(1, unit_size)
+    return [list(items[i:i + unit_size]) for i in range(0, len(items), unit_size)]
+
+
+def worker_count(num_workers: int, num_units: int) -> int:
+    """Return how many worker processes ``run_work_queue`` starts for ``num_units`` units."""
+    return max(1, min(num_workers, num_units))
+
+
+def _worker_main(handler: Callable[[List[Any]], Awaitable[List[Any]]], tasks, results, lanes: int) -> None:
+    """Process entry point: serve units until the queue hands out a stop marker per lane."""
+    # Imported here so the parent does not need the screenshot stack to build the queue
+    from app.tasks import run_with_screenshot_resources
+
+    asyncio.run(run_with_screenshot_resources(_serve(handler, tasks, results, lanes)))
+
+
+async def _serve(handler, tasks, results, lanes: int) -> None:
+    pid = os.getpid()
+
+    async def lane() -> None:
+        while True:
+            item = await asyncio.to_thread(tasks.get)
+            if item is None:
+                return
+            unit_id, unit = item
+            try:
+                unit_results = await handler(unit)
+                results.put((unit_id, pid, unit_results, None))
+            except Exception as e:
+                results.put((unit_id, pid, None, repr(e)))
+
+    await asyncio.gather(*(lane() for _ in range(max(1, lanes))))
+
+
+async def run_work_queue(
+    units: List[List[Any]],
+    handler: Callable[[List[Any]], Awaitable[List[Any]]],
+    num_workers: int,
+    on_result: Callable[[List[Any], List[Any]], None],
+    lanes: int = WORK_LANES_PER_WORKER,
+    on_failure: Optional[Callable[[List[Any], str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Run ``handler`` over ``units`` in ``num_workers`` processes pulling from a shared queue.
+
+    Args:
+        units: Work units; each is passed to ``handler`` as one call
+        handler: Module-level coroutine function ``handler(unit) -> results``
+        num_workers: Worker processes
+        on_result: Called in this process with ``(unit, results)`` as units finish,
+            one call at a time in a worker thread
+        lanes: Units each worker runs concurrently
+        on_failure: Called with ``(unit, error)`` for units that raised or whose
+            worker died; failures are logged either way
+
+    Returns:
+        Stats: units done and failed, units per worker, elapsed seconds
+    """
+    num_workers = worker_count(num_workers, len(units))
+    ctx = mp.get_context()
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+
+    for unit_id, unit in enumerate(units):
+        tasks.put((unit_id, unit))
+    for _ in range(num_workers * max(1, lanes)):
+        tasks.put(None)
+
+    workers = [ctx.Process(target=_worker_main, args=(handler, tasks, results, lanes), daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    logger.info(f"🧵 Work queue: {len(units)} units over {num_workers} workers × {lanes} lanes")
+
+    started = time.monotonic()
+    pending = set(range(len(units)))
+    units_per_worker: Dict[int, int] = {}
+    failed = 0
+
+    def fail(unit_id: int, error: str) -> None:
+        nonlocal failed
+        failed += 1
+        logger.error(f"❌ Work unit {unit_id} failed: {error}")
+        if on_failure:
+            on_failure(units[unit_id], error)
+
+    try:
+        while pending:
+            try:
+                unit_id, pid, unit_results, error = await asyncio.to_thread(results.get, True, _POLL_SECONDS)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    # Every worker is gone but units are unaccounted for: they died mid-unit
+                    for unit_id in sorted(pending):
+                        fail(unit_id, "worker process exited before finishing the unit")
+                    pending.clear()
+                continue
+
+            pending.discard(unit_id)
+            units_per_worker[pid] = units_per_worker.get(pid, 0) + 1
+            if error is not None:
+                fail(unit_id, error)
+            else:
+                # Checkpoint writes happen here; keep them off the event loop
+                await asyncio.to_thread(on_result, units[unit_id], unit_results)
+    except BaseException:
+        # Interrupted or on_result failed: don't wait for the units still in flight
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join(timeout=30)
+            if worker.is_alive():
+                worker.terminate()
+
+    stats = {
+        "units": len(units),
+        "done": len(units) - failed,
+        "failed": failed,
+        "units_per_worker": sorted(units_per_worker.values(), reverse=True),
+        "elapsed_seconds": round(time.monotonic() - started, 1),
+    }
+    logger.info(f"🧵 Work queue finished: {stats}")
+    return stats
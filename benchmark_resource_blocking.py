@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Time-to-Screenshot Benchmark: resource blocking on vs off
+
+Loads saved result pages of each provider and measures the time from
+navigation start to finished screenshot, with the provider's blocking profile
+switched off and on. Saved pages keep their third-party script, font and media
+references, so trackers and fonts are still fetched from the network exactly
+as on the live site.
+
+Save each provider's results page ("Save Page As... > Webpage, Complete") as
+``<pages-dir>/<provider>.html`` (searates, freightos, kiwi, booking), next to
+its ``<provider>_files`` folder.
+
+Usage:
+    python benchmark_resource_blocking.py --pages-dir saved_pages
+    python benchmark_resource_blocking.py --pages-dir saved_pages --runs 10 --wait-until load
+    python benchmark_resource_blocking.py --url freightos=https://ship.freightos.com/results/<id>/
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from app.utils.browser_pool import BrowserPool
+from app.utils.resource_blocking import BLOCKING_PROFILES, apply_resource_blocking
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory: str) -> str:
+    """Serve ``directory`` on a random local port and return the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+async def time_to_screenshot(pool: BrowserPool, url: str, provider: str, blocking: bool, wait_until: str) -> dict:
+    async with pool.lease(viewport={"width": 1440, "height": 900}) as context:
+        counters = await apply_resource_blocking(context, url, provider=provider) if blocking else None
+        page = await context.new_page()
+
+        started = time.perf_counter()
+        await page.goto(url, wait_until=wait_until, timeout=150000)
+        data = await page.screenshot(full_page=True)
+        elapsed = time.perf_counter() - started
+
+    return {"seconds": elapsed, "bytes": len(data), "blocked": counters["blocked"] if counters else 0}
+
+
+async def bench_provider(pool: BrowserPool, provider: str, url: str, runs: int, wait_until: str) -> None:
+    print(f"\n{provider}: {url}")
+    medians = {}
+    for blocking in (False, True):
+        samples = []
+        blocked = 0
+        for _ in range(runs):
+            try:
+                result = await time_to_screenshot(pool, url, provider, blocking, wait_until)
+            except Exception as e:
+                print(f"   ⚠️  run failed (blocking={'on' if blocking else 'off'}): {e}")
+                continue
+            samples.append(result["seconds"])
+            blocked = result["blocked"]
+
+        label = "blocking on " if blocking else "blocking off"
+        if not samples:
+            print(f"   {label}: no successful runs")
+            continue
+        medians[blocking] = statistics.median(samples)
+        print(
+            f"   {label}: median {medians[blocking]:.2f}s, min {min(samples):.2f}s, max {max(samples):.2f}s"
+            + (f", {blocked} requests blocked" if blocking else "")
+        )
+
+    if False in medians and True in medians and medians[True] > 0:
+        print(f"   Speedup: {medians[False] / medians[True]:.2f}x")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-to-screenshot with and without resource blocking")
+    parser.add_argument("--pages-dir", help="Directory with saved <provider>.html pages")
+    parser.add_argument("--url", action="append", default=[], metavar="PROVIDER=URL",
+                        help="Benchmark a live page instead (repeatable)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per provider and mode (default: 5)")
+    parser.add_argument("--wait-until", default="domcontentloaded", choices=["domcontentloaded", "load", "networkidle"],
+                        help="Navigation milestone before the screenshot (default: domcontentloaded, as in _go)")
+    args = parser.parse_args()
+
+    targets = []
+    if args.pages_dir:
+        base_url = serve_directory(args.pages_dir)
+        for provider in BLOCKING_PROFILES:
+            if (Path(args.pages_dir) / f"{provider}.html").exists():
+                targets.append((provider, f"{base_url}{provider}.html"))
+    for item in args.url:
+        provider, _, url = item.partition("=")
+        if provider not in BLOCKING_PROFILES or not url:
+            parser.error(f"--url expects PROVIDER=URL with PROVIDER in {', '.join(BLOCKING_PROFILES)}")
+        targets.append((provider, url))
+
+    if not targets:
+        parser.error("No pages to benchmark: pass --pages-dir with saved <provider>.html files or --url")
+
+    print("=" * 60)
+    print("TIME-TO-SCREENSHOT BENCHMARK (resource blocking)")
+    print("=" * 60)
+    print(f"Runs per mode: {args.runs}, wait until: {args.wait_until}")
+
+    pool = BrowserPool(browsers=1, contexts_per_browser=1)
+    try:
+        for provider, url in targets:
+            await bench_provider(pool, provider, url, args.runs, args.wait_until)
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Screenshot Throughput Benchmark: cold start vs browser pool
+
+Captures the same page repeatedly, first launching a new Playwright + Chromium
+instance for every screenshot (the old ``_go`` behaviour) and then leasing
+contexts from the long-lived BrowserPool. Reports screenshots/minute for both.
+
+Usage:
+    python benchmark_screenshot_pool.py
+    python benchmark_screenshot_pool.py --captures 30 --concurrency 3 --browsers 1 --contexts 3
+    python benchmark_screenshot_pool.py --url https://www.searates.com/logistics-explorer/
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from playwright.async_api import async_playwright
+
+from app.utils.browser_pool import CHROMIUM_ARGS, BrowserPool, make_stealth
+
+SAMPLE_PAGE = """<!doctype html>
+<html><head><title>Benchmark</title></head>
+<body style="font-family: sans-serif">
+<h1>Shipping rates</h1>
+<table>{rows}</table>
+</body></html>
+""".format(rows="".join(f"<tr><td>Route {i}</td><td>${i * 37 % 4000}</td></tr>" for i in range(200)))
+
+
+class _SamplePageHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        body = SAMPLE_PAGE.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_sample_server() -> str:
+    """Serve SAMPLE_PAGE on a random local port and return its URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SamplePageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+async def capture_page(context, url: str) -> int:
+    page = await context.new_page()
+    await page.goto(url, wait_until="domcontentloaded", timeout=150000)
+    data = await page.screenshot(full_page=True)
+    return len(data)
+
+
+async def cold_capture(url: str) -> int:
+    """Launch Playwright and Chromium for a single screenshot, like the old ``_go``."""
+    stealth = make_stealth()
+    async with stealth.use_async(async_playwright()) as p:
+        browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+        try:
+            context = await browser.new_context(viewport={"width": 1280, "height": 900})
+            size = await capture_page(context, url)
+            await context.close()
+            return size
+        finally:
+            await browser.close()
+
+
+async def pooled_capture(pool: BrowserPool, url: str) -> int:
+    async with pool.lease(viewport={"width": 1280, "height": 900}) as context:
+        return await capture_page(context, url)
+
+
+async def run_mode(name: str, capture, url: str, captures: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            try:
+                await capture(url)
+            except Exception as e:
+                failures += 1
+                print(f"   ⚠️  {name} capture failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(captures)))
+    elapsed = time.perf_counter() - started
+
+    per_minute = (captures - failures) / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"{name:<8} {captures - failures}/{captures} screenshots in {elapsed:.1f}s -> {per_minute:.1f} screenshots/minute")
+    return per_minute
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start vs pooled screenshot capture")
+    parser.add_argument("--url", help="Page to capture (default: built-in local sample page)")
+    parser.add_argument("--captures", type=int, default=20, help="Screenshots per mode (default: 20)")
+    parser.add_argument("--concurrency", type=int, default=3, help="Concurrent captures (default: 3)")
+    parser.add_argument("--browsers", type=int, default=1, help="Pooled browsers (default: 1)")
+    parser.add_argument("--contexts", type=int, default=3, help="Contexts per pooled browser (default: 3)")
+    parser.add_argument("--recycle-after", type=int, default=50, help="Pages per browser before recycling (default: 50)")
+    args = parser.parse_args()
+
+    url = args.url or start_sample_server()
+
+    print("=" * 60)
+    print("SCREENSHOT THROUGHPUT BENCHMARK")
+    print("=" * 60)
+    print(f"URL: {url}")
+    print(f"Captures per mode: {args.captures}, concurrency: {args.concurrency}")
+    print(f"Pool: {args.browsers} browsers × {args.contexts} contexts, recycle after {args.recycle_after} pages")
+    print()
+
+    cold_rate = await run_mode("cold", cold_capture, url, args.captures, args.concurrency)
+
+    pool = BrowserPool(
+        browsers=args.browsers,
+        contexts_per_browser=args.contexts,
+        recycle_after=args.recycle_after
+    )
+    try:
+        pooled_rate = await run_mode("pooled", partial(pooled_capture, pool), url, args.captures, args.concurrency)
+    finally:
+        await pool.close()
+
+    print()
+    if cold_rate > 0:
+        print(f"Speedup: {pooled_rate / cold_rate:.2f}x")
+    print(f"Pool stats: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
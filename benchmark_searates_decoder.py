@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Searates Response Decoding Benchmark: full pydantic validation vs fast path
+
+Decodes recorded Searates responses both ways - ``json`` +
+``SearatesResponsePayload(**body)`` (the old path) and raw bytes through
+``app/utils/searates_decoder.py`` - and reports responses/second for each.
+Before timing, every payload is run through ``create_result_entry`` with both
+decoders to check that they produce the same matrix rows.
+
+Recorded payloads come from the response cache (``SEARATES_CACHE_DB``, filled
+by any matrix run) or from ``--payloads`` files holding a response body or a
+list of bodies. Without either, synthetic responses shaped like the GraphQL
+query are used.
+
+Usage:
+    python benchmark_searates_decoder.py
+    python benchmark_searates_decoder.py --payloads recorded/*.json --rounds 20
+    python benchmark_searates_decoder.py --synthetic 500 --rates 8
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.utils.helpers import create_result_entry
+from app.utils.model import SearatesResponsePayload
+from app.utils.response_cache import CACHE_DB_PATH
+from app.utils.searates_decoder import ORJSON_AVAILABLE, decode_response, loads
+
+
+def recorded_from_cache(db_path: str, limit: int) -> List[Dict[str, Any]]:
+    """Load cached ``rates`` lists as response bodies."""
+    if not Path(db_path).exists():
+        return []
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT rates FROM responses WHERE rates != '[]' LIMIT ?", (limit,)).fetchall()
+    return [{"data": {"rates": json.loads(row[0])}} for row in rows]
+
+
+def recorded_from_files(paths: List[str]) -> List[Dict[str, Any]]:
+    """Load response bodies saved as JSON files."""
+    bodies = []
+    for path in paths:
+        content = json.loads(Path(path).read_text())
+        bodies.extend(content if isinstance(content, list) else [content])
+    return bodies
+
+
+def synthetic_response(index: int, rates: int) -> Dict[str, Any]:
+    """A response with every field the GraphQL query asks for."""
+    def point(n: int, name: str) -> Dict[str, Any]:
+        return {
+            "id": f"p{index}-{n}", "rateId": f"rate-{index}", "shippingType": "FCL",
+            "provider": "MAERSK", "providerLogo": "https://example.com/logo.png",
+            "location": {"id": n, "name": name, "country": "GB", "lat": 51.5, "lng": -0.12,
+                         "code": "GBLON", "inaccessible": False, "pointType": "port", "dry": False},
+            "loads": [{"id": 1, "unit": "ST40", "amount": "1", "shortCode": "40ST", "type": "container"}],
+            "pointTariff": [{"name": f"THC {i}", "abbr": "THC", "price": 120.5 + i, "currency": "USD", "profileId": 7}
+                            for i in range(4)],
+            "routeTariff": [{"name": f"Ocean {i}", "abbr": "OF", "price": 900 + i, "currency": "USD"} for i in range(3)],
+            "lumpsumTariff": {"price": 50, "currency": "USD"},
+            "co2": {"amount": 1.5, "price": 20, "placeAmount": 0.2, "placePrice": 3,
+                    "lumpsumAmount": 0.1, "lumpsumPrice": 1},
+            "transitTime": {"rate": 20, "port": 2, "route": 18},
+            "profileId": "7", "distance": "11000 km", "totalPrice": 1500, "totalCurrency": "USD",
+            "pointTotal": 480, "routeTotal": 1020, "terms": "CY/CY",
+        }
+
+    return {"data": {"rates": [
+        {
+            "points": [point(0, "LONDON"), point(1, "Transit"), point(2, "SHANGHAI")],
+            "general": {
+                "shipmentId": f"s{index}-{r}", "validityFrom": "2025-09-01", "validityTo": "2025-09-30",
+                "individual": False, "totalPrice": 1500 + r, "totalCurrency": "USD", "totalTransitTime": 30,
+                "totalCo2": {"amount": 2.5, "price": 40}, "dfaRate": False, "alternative": False,
+                "expired": False, "spaceGuarantee": False, "spot": True, "indicative": False,
+                "standard": True, "rateOwner": False, "queryShippingType": "FCL",
+                "promotionObligations": False, "shipmentCreatedAt": "2025-08-30T10:00:00Z",
+            },
+            "request": {"request_key": f"k{index}"},
+        }
+        for r in range(rates)
+    ]}}
+
+
+def rows(response) -> List[Dict[str, Any]]:
+    """Matrix rows for a decoded response, without the scrape timestamp."""
+    result = []
+    for rate in response.data.rates if response.data else []:
+        row = create_result_entry("LONDON", "SHANGHAI", rate, "2025-09-01", "ST40", None, None, rate.general.expired)
+        row.pop("datetime_of_scraping")
+        result.append(row)
+    return result
+
+
+def time_decoder(name: str, decode, raw_payloads: List[bytes], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for raw in raw_payloads:
+            decode(raw)
+    elapsed = time.perf_counter() - started
+    per_second = len(raw_payloads) * rounds / elapsed if elapsed > 0 else 0.0
+    print(f"{name:<10} {len(raw_payloads) * rounds} responses in {elapsed:.3f}s -> {per_second:,.0f} responses/sec")
+    return per_second
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full pydantic validation vs the fast Searates decoder")
+    parser.add_argument("--payloads", nargs="*", default=[], help="JSON files with recorded response bodies")
+    parser.add_argument("--cache-db", default=CACHE_DB_PATH, help=f"Response cache to read recordings from [default: {CACHE_DB_PATH}]")
+    parser.add_argument("--limit", type=int, default=1000, help="Recorded responses to load at most (default: 1000)")
+    parser.add_argument("--synthetic", type=int, default=200, help="Synthetic responses when nothing is recorded (default: 200)")
+    parser.add_argument("--rates", type=int, default=5, help="Rates per synthetic response (default: 5)")
+    parser.add_argument("--rounds", type=int, default=10, help="Passes over the payloads per decoder (default: 10)")
+    args = parser.parse_args()
+
+    bodies = recorded_from_files(args.payloads) or recorded_from_cache(args.cache_db, args.limit)
+    source = "recorded"
+    if not bodies:
+        bodies = [synthetic_response(i, args.rates) for i in range(args.synthetic)]
+        source = "synthetic"
+    raw_payloads = [json.dumps(body).encode() for body in bodies]
+
+    print("=" * 60)
+    print("SEARATES RESPONSE DECODING BENCHMARK")
+    print("=" * 60)
+    print(f"Payloads: {len(raw_payloads)} {source}, "
+          f"{sum(len(raw) for raw in raw_payloads) / len(raw_payloads) / 1024:.1f} KiB average")
+    print(f"JSON parser: {'orjson' if ORJSON_AVAILABLE else 'json (orjson not installed)'}")
+    print()
+
+    def full(raw: bytes):
+        return SearatesResponsePayload(**json.loads(raw))
+
+    def fast(raw: bytes):
+        return decode_response(loads(raw), full_validation=False)
+
+    mismatches = sum(rows(full(raw)) != rows(fast(raw)) for raw in raw_payloads)
+    if mismatches:
+        print(f"⚠️  {mismatches} payloads produce different matrix rows")
+    else:
+        print("✅ Both decoders produce identical matrix rows")
+    print()
+
+    before = time_decoder("pydantic", full, raw_payloads, args.rounds)
+    after = time_decoder("fast", fast, raw_payloads, args.rounds)
+
+    print()
+    if before > 0:
+        print(f"Speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Searates GraphQL Throughput Benchmark: session per request vs shared session
+
+Sends the same GraphQL POST to a local stub server, first opening a new
+``aiohttp.ClientSession`` for every request (the old ``make_request``) and
+then through ``make_request`` with the shared pooled session. Reports
+requests/second for both.
+
+The stub speaks plain HTTP, so the numbers cover TCP connection and DNS
+reuse only; against the real HTTPS endpoint the old path also repeats a TLS
+handshake per request. Use ``--url`` to point at any other endpoint.
+
+Usage:
+    python benchmark_searates_session.py
+    python benchmark_searates_session.py --requests 2000 --concurrency 50 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+# make_request sends the bearer token header; the stub ignores its value
+os.environ.setdefault("SEARATES_BEARER_TOKEN", "benchmark")
+
+from app.utils.helpers import BEARER_TOKEN, build_searates_payload, make_request
+from app.utils.http_session import close_http_session
+from app.utils.model import SearatesRequestPayload, SearatesResponsePayload
+
+STUB_RESPONSE = {
+    "data": {
+        "rates": [
+            {
+                "general": {
+                    "shipmentId": f"bench-{i}",
+                    "validityFrom": "2025-09-01",
+                    "validityTo": "2025-09-30",
+                    "totalPrice": 1500 + i,
+                    "totalCurrency": "USD",
+                    "totalTransitTime": 30,
+                },
+                "points": [],
+            }
+            for i in range(5)
+        ]
+    }
+}
+
+
+def start_stub_server(latency_ms: float) -> str:
+    """Run a GraphQL stub on a random local port in a background thread and return its URL."""
+    started = threading.Event()
+    address = {}
+
+    async def graphql(request):
+        await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return web.json_response(STUB_RESPONSE)
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_post("/graphql", graphql)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        address["port"] = site._server.sockets[0].getsockname()[1]
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{address['port']}/graphql"
+
+
+async def session_per_request(url: str, payload: SearatesRequestPayload) -> SearatesResponsePayload:
+    """The old ``make_request``: a fresh ClientSession for every POST."""
+    async with aiohttp.ClientSession() as session:
+        async with session.request("POST", url, headers={"Authorization": BEARER_TOKEN}, json=build_searates_payload(payload)) as response:
+            return SearatesResponsePayload(**await response.json())
+
+
+async def run_mode(name: str, request, url: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = SearatesRequestPayload(pointIdFrom="C_120812", pointIdTo="C_120941", date="2025-09-01", container="ST40")
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            try:
+                response = await request(url, payload)
+                if not response or not response.data:
+                    failures += 1
+            except Exception as e:
+                failures += 1
+                print(f"   ⚠️  {name} request failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    per_second = (requests - failures) / elapsed if elapsed > 0 else 0.0
+    print(f"{name:<10} {requests - failures}/{requests} requests in {elapsed:.2f}s -> {per_second:.1f} requests/sec")
+    return per_second
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request vs shared aiohttp sessions for GraphQL POSTs")
+    parser.add_argument("--url", help="GraphQL endpoint (default: built-in local stub)")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per mode (default: 1000)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight (default: 20)")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub server latency per request (default: 5)")
+    args = parser.parse_args()
+
+    url = args.url or start_stub_server(args.latency_ms)
+
+    print("=" * 60)
+    print("SEARATES GRAPHQL SESSION BENCHMARK")
+    print("=" * 60)
+    print(f"URL: {url}")
+    print(f"Requests per mode: {args.requests}, concurrency: {args.concurrency}")
+    print()
+
+    before = await run_mode("per-call", session_per_request, url, args.requests, args.concurrency)
+    try:
+        after = await run_mode("shared", make_request, url, args.requests, args.concurrency)
+    finally:
+        await close_http_session()
+
+    print()
+    if before > 0:
+        print(f"Speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Rebuild the Freightos master result files from the append-only result log.
+
+Freightos runs append the new rows of every finished work unit to the result
+log and rebuild the MASTER_ALL_RESULTS files at most every
+FREIGHTOS_MASTER_INTERVAL seconds and at the end of the run. Run this script to get an up-to-date
+master view right away, e.g. while a long run is still going. Checkpoint files
+written before the result log existed can be imported first.
+
+Usage:
+    python compact_freightos_results.py
+    python compact_freightos_results.py --import-checkpoints
+    python compact_freightos_results.py --log-dir freightos_checkpoints/result_log --output-dir exports
+"""
+
+import argparse
+import glob
+import json
+import logging
+
+from app.utils.helpers import FREIGHTOS_MASTER_KEY_FIELDS, FREIGHTOS_RESULT_LOG_DIR, materialize_freightos_master
+from app.utils.result_log import ResultLog
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the Freightos master result files from the result log",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    parser.add_argument(
+        "--log-dir",
+        default=FREIGHTOS_RESULT_LOG_DIR,
+        help=f"Result log directory (default: {FREIGHTOS_RESULT_LOG_DIR})"
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        default="freightos_checkpoints",
+        help="Directory for the master files (default: freightos_checkpoints)"
+    )
+
+    parser.add_argument(
+        "--import-checkpoints",
+        action="store_true",
+        help="First append the rows of existing freightos_checkpoints/batch_*.json files to the log"
+    )
+
+    args = parser.parse_args()
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        result_log = ResultLog(args.log_dir, FREIGHTOS_MASTER_KEY_FIELDS)
+
+        if args.import_checkpoints:
+            files = sorted(glob.glob("freightos_checkpoints/batch_*_checkpoint_*.json") + glob.glob("freightos_checkpoints/batch_*_FINAL_*.json"))
+            imported = 0
+            for path in files:
+                try:
+                    with open(path, 'r') as f:
+                        batch_data = json.load(f)
+                    if isinstance(batch_data, list):
+                        imported += result_log.append(batch_data)
+                except Exception as e:
+                    print(f"⚠️ Could not import {path}: {e}")
+            print(f"📥 Imported {imported} new rows from {len(files)} checkpoint files")
+
+        print(f"🧾 Result log: {result_log.stats()}")
+        outputs = materialize_freightos_master(skip_unchanged=False, output_dir=args.output_dir, result_log=result_log)
+        if outputs is None:
+            print("⏳ Another process is rebuilding the master files right now - try again shortly")
+            return
+
+        print("\n📁 Files created:")
+        for file_type, filename in outputs.items():
+            print(f"  📄 {file_type.upper()}: {filename}")
+
+    except Exception as e:
+        print(f"❌ Error while compacting: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    main()
@@ -68,7 +68,8 @@ export const ScreenshotGallery: React.FC<ScreenshotGalleryProps> = ({ search, on
                       </div>
                     ) : (
                       <img
-                        src={screenshot.screenshot_url}
+                        src={screenshot.thumbnail_url || screenshot.screenshot_url}
+                        loading="lazy"
                         alt={`Flight screenshot for quote ${screenshot.quote_id}`}
                         className="w-full h-full object-cover cursor-pointer hover:scale-105 transition-transform"
                         onClick={() => window.open(screenshot.screenshot_url, '_blank')}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Merge the checkpoints of a sharded matrix run into one result set.
+
+Each host of a sharded run (``--shard i/N --seed S``) checkpoints into
+``<checkpoint-dir>/shard_<i>_of_<N>``. Copy those directories onto one
+machine under the same base directory and run this script: the shards are
+combined into a regular checkpoint in the base directory (or ``--output-dir``),
+which resumes like an unsharded run, and exported to CSV/JSON.
+
+Usage:
+    python merge_shard_checkpoints.py --checkpoint-dir checkpoints
+    python merge_shard_checkpoints.py --checkpoint-dir freightos_checkpoints --output-prefix freightos_matrix
+    python merge_shard_checkpoints.py --checkpoint-dir checkpoints --output-dir merged_checkpoints --no-export
+"""
+
+import argparse
+import logging
+
+from app.utils.checkpoint_manager import CheckpointManager
+from app.utils.sharding import merge_shard_checkpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge shard checkpoints into one result set",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    parser.add_argument(
+        "--checkpoint-dir",
+        default="checkpoints",
+        help="Base checkpoint directory holding shard_<i>_of_<N> folders (default: checkpoints)"
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        help="Directory for the merged checkpoint (default: --checkpoint-dir)"
+    )
+
+    parser.add_argument(
+        "--output-prefix",
+        default="shipping_matrix_merged",
+        help="Prefix for exported files (default: shipping_matrix_merged)"
+    )
+
+    parser.add_argument(
+        "--no-export",
+        action="store_true",
+        help="Only write the merged checkpoint, skip the CSV/JSON export"
+    )
+
+    args = parser.parse_args()
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        print(f"🧩 Merging shard checkpoints from {args.checkpoint_dir}...")
+        summary = merge_shard_checkpoints(args.checkpoint_dir, args.output_dir)
+
+        print(f"\n✅ Merged {len(summary['shards'])} shards: {', '.join(summary['shards'])}")
+        print(f"  • Results: {summary['results']}")
+        print(f"  • Completed combinations: {summary['completed_combinations']}")
+        print(f"  • Merged checkpoint: {summary['checkpoint_dir']}")
+
+        if not args.no_export:
+            checkpoint_manager = CheckpointManager(
+                checkpoint_dir=summary['checkpoint_dir'],
+                include_date=summary['include_date']
+            )
+            checkpoint_manager.load_existing_checkpoint()
+            exported_files = checkpoint_manager.finalize_and_export(args.output_prefix)
+
+            print("\n📁 Files created:")
+            for file_type, filename in exported_files.items():
+                print(f"  📄 {file_type.upper()}: {filename}")
+
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+    except Exception as e:
+        print(f"❌ Error while merging: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    main()
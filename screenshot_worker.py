@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Screenshot Queue Worker
+
+Captures the screenshots queued by the scrapers when they run with
+SCREENSHOT_MODE=queue, and patches the finished screenshot URLs back into
+checkpointed results.
+
+Usage:
+    python screenshot_worker.py work                       # One worker process, runs until stopped
+    python screenshot_worker.py work --processes 2 --concurrency 3
+    python screenshot_worker.py work --exit-when-idle      # Drain the queue and exit
+    python screenshot_worker.py reconcile                  # Patch checkpoint JSON files
+    python screenshot_worker.py reconcile --files "freightos_checkpoints/*.json"
+    python screenshot_worker.py status
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from app.tasks import run_with_screenshot_resources
+from app.utils.capture_limiter import get_capture_limiter
+from app.utils.screenshot_queue import get_screenshot_queue, reconcile_json_file, run_screenshot_worker
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_FILES = [
+    "checkpoints/results.json",
+    "freightos_checkpoints/*.json",
+    "flight_matrix_results/*.json",
+]
+
+
+def worker_process(concurrency: int, poll_interval: float, exit_when_idle: bool) -> dict:
+    """Entry point for a single worker process."""
+    return asyncio.run(run_with_screenshot_resources(
+        run_screenshot_worker(concurrency=concurrency, poll_interval=poll_interval, exit_when_idle=exit_when_idle)
+    ))
+
+
+def cmd_work(args) -> None:
+    logger.info(f"🖼️ Starting {args.processes} screenshot worker(s) × {args.concurrency} concurrent captures")
+    logger.info(f"Queue: {get_screenshot_queue().stats()}")
+
+    if args.processes == 1:
+        worker_process(args.concurrency, args.poll_interval, args.exit_when_idle)
+        return
+
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [
+            executor.submit(worker_process, args.concurrency, args.poll_interval, args.exit_when_idle)
+            for _ in range(args.processes)
+        ]
+        results = [future.result() for future in futures]
+    logger.info(f"Workers finished: {results}")
+
+
+def cmd_reconcile(args) -> None:
+    patterns = args.files or DEFAULT_RESULT_FILES
+    queue = get_screenshot_queue()
+
+    total = 0
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                total += reconcile_json_file(path, queue)
+            except Exception as e:
+                logger.warning(f"Could not reconcile {path}: {e}")
+
+    print(f"✅ Patched {total} screenshot URLs")
+
+
+def cmd_status(args) -> None:
+    status = {
+        "queue": get_screenshot_queue().stats(),
+        "capture_limiter": get_capture_limiter().stats(),
+    }
+    print(json.dumps(status, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screenshot queue worker and reconciliation")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    work = subparsers.add_parser("work", help="Capture queued screenshots")
+    work.add_argument("--processes", type=int, default=1, help="Worker processes (default: 1)")
+    work.add_argument("--concurrency", type=int, default=3, help="Concurrent captures per process (default: 3)")
+    work.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls when idle (default: 2)")
+    work.add_argument("--exit-when-idle", action="store_true", help="Exit once the queue is empty")
+    work.set_defaults(func=cmd_work)
+
+    reconcile = subparsers.add_parser("reconcile", help="Patch finished screenshot URLs into result JSON files")
+    reconcile.add_argument("--files", nargs="+", help="JSON files or glob patterns (default: shipping, Freightos and flight results)")
+    reconcile.set_defaults(func=cmd_reconcile)
+
+    status = subparsers.add_parser("status", help="Show queue counts and the capture limiter state")
+    status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()